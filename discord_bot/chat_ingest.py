@@ -0,0 +1,268 @@
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import struct
+import sys
+import time
+import logging
+
+from persistence import run_io, save_json, load_json
+
+logger = logging.getLogger("aarohi_bot.chat_ingest")
+
+EXPORT_SUFFIXES = (".txt", ".log", ".jsonl")
+BATCH_PAIRS = 500  # pairs handed on, and checkpointed, at a time
+SETTLE_SECONDS = 1.0  # wait for writes to a file to stop before reading it
+POLL_INTERVAL = 10  # seconds between directory scans when inotify is unavailable
+MAX_LINE_BYTES = 64 * 1024  # longer lines are skipped, not buffered
+COMPLETE_SECONDS = 60  # a last line without a newline is read once its file is this old
+
+# inotify(7) event bits
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_IGNORED = 0x8000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+# "[2024-01-02 10:00] Name: message" or "Name: message"
+_TEXT_LINE = re.compile(r"^(?:\[[^\]]*\]\s*)?([^:\[\]]{1,64}?):\s+(.+?)\s*$")
+
+
+def parse_line(line):
+    """(author, message) from one export line, or None if it is not a message
+
+    JSON lines need "author" (a name or {"name": ...}) and "content"; text
+    lines are "Name: message" with an optional [timestamp] in front.
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        author = record.get("author")
+        if isinstance(author, dict):
+            author = author.get("name") or author.get("id")
+        content = record.get("content")
+        if not author or not isinstance(content, str) or not content.strip():
+            return None
+        return str(author), content.strip()
+    found = _TEXT_LINE.match(line)
+    return (found.group(1).strip(), found.group(2)) if found else None
+
+
+def read_pairs(path, offset, previous, max_pairs=BATCH_PAIRS, final=False):
+    """Read (message, reply) pairs from path starting at byte offset
+
+    A reply is the next message by a different author. Lines are read one at
+    a time, so an export is never held in memory. Only lines ending in a
+    newline are read, since the export may still be being written; with
+    final=True a last line without one is read too. Returns (pairs, offset,
+    previous, done) where offset and previous resume the read.
+    """
+    pairs = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while len(pairs) < max_pairs:
+            line = f.readline(MAX_LINE_BYTES + 1)
+            length = len(line)
+            if length > MAX_LINE_BYTES and not line.endswith(b"\n"):
+                # Skip the rest of an oversized line without holding it
+                while line and not line.endswith(b"\n"):
+                    line = f.readline(MAX_LINE_BYTES)
+                    length += len(line)
+                if not line and not final:
+                    return pairs, offset, previous, True
+                offset += length
+                continue
+            if not line.endswith(b"\n") and not (final and line):
+                # End of file, or a line still being written: resume at its start
+                return pairs, offset, previous, True
+            offset += length
+            message = parse_line(line.decode("utf-8", errors="replace"))
+            if message is None:
+                continue
+            if previous is not None and previous[0] != message[0]:
+                pairs.append((previous[1], message[1]))
+            previous = list(message)
+    return pairs, offset, previous, False
+
+
+def _scan_folder(folder):
+    exports = {}
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return exports
+    for entry in entries:
+        if entry.name.endswith(EXPORT_SUFFIXES) and entry.is_file():
+            stat = entry.stat()
+            exports[entry.name] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "inode": stat.st_ino}
+    return exports
+
+
+def _open_inotify(folder):
+    """Non-blocking inotify descriptor watching folder, or None where inotify is unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+        if libc.inotify_add_watch(fd, os.fsencode(folder), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class ChatIngestor:
+    """Feeds (message, reply) pairs from chat exports in a folder to on_pairs
+
+    The folder is watched with inotify where the platform has it, and
+    polled every `poll_interval` seconds otherwise. The manifest records
+    each export's size, mtime and how far it has been read, and is saved
+    after every batch, so an export is read once across restarts, a crash
+    repeats at most one batch, and lines appended later are picked up from
+    where the last read stopped. An export that shrinks or is replaced is
+    read again from the start.
+    """
+
+    def __init__(self, folder, manifest_path, on_pairs, poll_interval=POLL_INTERVAL):
+        self.folder = folder
+        self.manifest_path = manifest_path
+        self.on_pairs = on_pairs  # coroutine taking a list of (message, reply)
+        self.poll_interval = poll_interval
+        self.manifest = {}  # file name -> {"size", "mtime", "inode", "offset", "previous"}
+        self.inotify_fd = None
+        self._changed = asyncio.Event()
+        self._last_seen = {}  # polling only: exports as of the previous scan
+        self._partial = set()  # exports ending in a line that may still be being written
+        self._task = None
+        self.pairs_ingested = 0
+
+    async def start(self):
+        """Load the manifest and start watching; existing exports are read in the background"""
+        self.manifest = await load_json(self.manifest_path, {})
+        await run_io(os.makedirs, self.folder, 0o777, True)
+        self.inotify_fd = _open_inotify(self.folder)
+        if self.inotify_fd is not None:
+            asyncio.get_running_loop().add_reader(self.inotify_fd, self._read_events)
+            logger.info(f"Watching {self.folder} with inotify")
+        else:
+            logger.info(f"Polling {self.folder} every {self.poll_interval}s")
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop_inotify()
+
+    def _stop_inotify(self):
+        if self.inotify_fd is not None:
+            asyncio.get_running_loop().remove_reader(self.inotify_fd)
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+    def _read_events(self):
+        while True:
+            try:
+                data = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, position)
+                position += _EVENT_HEADER.size + length
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    # The folder itself went away; polling notices when it comes back
+                    logger.warning(f"{self.folder} was moved or deleted, falling back to polling")
+                    self._stop_inotify()
+                    self._changed.set()
+                    return
+            if not data:
+                break
+        self._changed.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception as e:
+                logger.error(f"Error ingesting chat exports: {e!r}")
+            if self.inotify_fd is not None:
+                try:
+                    # No event will come for a partial last line that is never finished
+                    await asyncio.wait_for(self._changed.wait(), COMPLETE_SECONDS if self._partial else None)
+                except asyncio.TimeoutError:
+                    pass
+                # Let a burst of writes finish before reading
+                await asyncio.sleep(SETTLE_SECONDS)
+            else:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._changed.clear()
+
+    async def scan(self):
+        """Ingest every export that changed since it was last read"""
+        exports = await run_io(_scan_folder, self.folder)
+        last_seen, self._last_seen = self._last_seen, exports
+        self._partial = set()
+        for name, stat in sorted(exports.items()):
+            entry = self.manifest.get(name)
+            if entry is not None and all(entry.get(field) == stat[field] for field in stat):
+                continue
+            if self.inotify_fd is None and last_seen.get(name) != stat:
+                # Without close events, wait until a file stops changing between polls
+                continue
+            await self._ingest(name, stat, entry)
+
+    async def _ingest(self, name, stat, entry):
+        if entry is None or entry.get("inode") != stat["inode"] or stat["size"] < entry.get("offset", 0):
+            entry = {"offset": 0, "previous": None}
+        entry = dict(entry, inode=stat["inode"])
+        path = os.path.join(self.folder, name)
+        start = entry["offset"]
+        # Nothing has touched the file for a while, so a last line without a newline is complete
+        final = time.time() - stat["mtime"] / 1e9 >= COMPLETE_SECONDS
+        done = False
+        while not done:
+            pairs, offset, previous, done = await run_io(
+                read_pairs, path, entry["offset"], entry["previous"], BATCH_PAIRS, final
+            )
+            if pairs:
+                await self.on_pairs(pairs)
+                self.pairs_ingested += len(pairs)
+            updated = dict(entry, offset=offset, previous=previous)
+            if done:
+                if offset >= stat["size"]:
+                    updated.update(stat)
+                else:
+                    # Left unread until it ends in a newline or the file is old enough
+                    self._partial.add(name)
+            if updated != self.manifest.get(name):
+                self.manifest[name] = updated
+                # Checkpoint so a restart resumes after this batch
+                await save_json(self.manifest_path, dict(self.manifest))
+            entry = updated
+        if entry["offset"] > start:
+            logger.info(f"Ingested {name} up to byte {entry['offset']}")
+
+    def stats(self):
+        return {
+            "exports": len(self.manifest),
+            "pairs_ingested": self.pairs_ingested,
+            "watching": "inotify" if self.inotify_fd is not None else "polling",
+        }
@@ -1,54 +1,58 @@
 import discord
 from discord.ext import commands
-import json
-import os
 import logging
 
+from persistence import load_json, save_json, get_metrics
+import timer_metrics
+
 logger = logging.getLogger("discord_bot.config")
 
+DEFAULT_SETTINGS = {
+    "conversation_cooldown": 1,  # seconds per reply to one user, on average
+    "conversation_burst": 3,  # replies one user can get back to back
+    "conversation_channel_per_minute": 20,  # replies per channel; 0 for no limit
+    "conversation_guild_per_minute": 60,  # replies per guild; 0 for no limit
+    "respond_chance": 10,  # percentage
+    "dm_respond_chance": 100,  # percentage
+    "mention_respond_chance": 100,  # percentage
+    "user_data_flush_interval": 30,  # seconds
+    "user_data_flush_threshold": 50,  # changed profiles
+}
+
 class Config(commands.Cog):
     """Bot configuration commands and settings"""
     
     def __init__(self, bot):
         self.bot = bot
         self.settings = {}
-        self.load_settings()
     
-    def cog_unload(self):
-        self.save_settings()
+    async def cog_load(self):
+        await self.load_settings()
+    
+    async def cog_unload(self):
+        await self.save_settings()
     
-    def load_settings(self):
+    async def load_settings(self):
         """Load settings from JSON file"""
         try:
-            if os.path.exists("data/settings.json"):
-                with open("data/settings.json", "r") as f:
-                    self.settings = json.load(f)
+            settings = await load_json("data/settings.json")
+            if settings is not None:
+                # Settings added since the file was written start at their defaults
+                self.settings = {**DEFAULT_SETTINGS, **settings}
             else:
                 # Default settings
-                self.settings = {
-                    "conversation_cooldown": 1,  # seconds
-                    "respond_chance": 10,  # percentage
-                    "dm_respond_chance": 100,  # percentage
-                    "mention_respond_chance": 100,  # percentage
-                }
-                self.save_settings()
+                self.settings = DEFAULT_SETTINGS.copy()
+                await self.save_settings()
             logger.info("Settings loaded successfully")
         except Exception as e:
             logger.error(f"Error loading settings: {e}")
             # Set defaults if loading fails
-            self.settings = {
-                "conversation_cooldown": 1,
-                "respond_chance": 10,
-                "dm_respond_chance": 100,
-                "mention_respond_chance": 100,
-            }
+            self.settings = DEFAULT_SETTINGS.copy()
     
-    def save_settings(self):
+    async def save_settings(self):
         """Save settings to JSON file"""
         try:
-            os.makedirs("data", exist_ok=True)
-            with open("data/settings.json", "w") as f:
-                json.dump(self.settings, f, indent=4)
+            await save_json("data/settings.json", dict(self.settings), indent=4)
             logger.info("Settings saved successfully")
         except Exception as e:
             logger.error(f"Error saving settings: {e}")
@@ -57,10 +61,10 @@ class Config(commands.Cog):
         """Get a setting value with optional default"""
         return self.settings.get(key, default)
     
-    def set_setting(self, key, value):
+    async def set_setting(self, key, value):
         """Set a setting value"""
         self.settings[key] = value
-        self.save_settings()
+        await self.save_settings()
     
     @commands.group(name="config", aliases=["settings"], invoke_without_command=True)
     @commands.has_permissions(administrator=True)
@@ -101,7 +105,7 @@ class Config(commands.Cog):
             # Keep as string if conversion fails
             pass
         
-        self.set_setting(key, value)
+        await self.set_setting(key, value)
         await ctx.send(f"Setting `{key}` updated to `{value}`")
         logger.info(f"Setting {key} updated to {value} by {ctx.author}")
     
@@ -109,26 +113,80 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def reset_config(self, ctx, key: str = None):
         """Reset configuration to defaults"""
-        default_settings = {
-            "conversation_cooldown": 1,
-            "respond_chance": 10,
-            "dm_respond_chance": 100,
-            "mention_respond_chance": 100,
-        }
-        
         if key:
-            if key not in default_settings:
+            if key not in DEFAULT_SETTINGS:
                 await ctx.send(f"Unknown setting: {key}")
                 return
             
-            self.set_setting(key, default_settings[key])
-            await ctx.send(f"Reset `{key}` to default value: `{default_settings[key]}`")
+            await self.set_setting(key, DEFAULT_SETTINGS[key])
+            await ctx.send(f"Reset `{key}` to default value: `{DEFAULT_SETTINGS[key]}`")
         else:
-            self.settings = default_settings.copy()
-            self.save_settings()
+            self.settings = DEFAULT_SETTINGS.copy()
+            await self.save_settings()
             await ctx.send("All settings reset to default values.")
         
         logger.info(f"Settings reset by {ctx.author}")
+    
+    @config.command(name="io")
+    @commands.has_permissions(administrator=True)
+    async def io_stats(self, ctx):
+        """Show persistence queue depth and write latency"""
+        embed = discord.Embed(
+            title="Storage I/O",
+            color=discord.Color.blue()
+        )
+        
+        for key, value in get_metrics().items():
+            embed.add_field(name=key, value=str(value), inline=True)
+        
+        # Timer notifications batched per channel by the Productivity cog
+        productivity = self.bot.get_cog('Productivity')
+        if productivity:
+            delivery = productivity.notifier.stats()
+            embed.add_field(
+                name="notifications",
+                value=f"{delivery['delivered']} in {delivery['messages_sent']} messages ({delivery['api_calls_saved']} API calls saved)",
+                inline=False
+            )
+        
+        # Conversation reply budgets; bucket counts track recently active users, channels and guilds
+        conversation = self.bot.get_cog('Conversation')
+        if conversation:
+            limits = conversation.limiter.stats()
+            embed.add_field(
+                name="reply limits",
+                value=", ".join(
+                    f"{scope}: {count} buckets, {limits['limited'].get(scope, 0)} limited"
+                    for scope, count in limits["buckets"].items()
+                ) or "no replies yet",
+                inline=False
+            )
+        
+        await ctx.send(embed=embed)
+    
+    @config.command(name="timers")
+    @commands.has_permissions(administrator=True)
+    async def timer_stats(self, ctx):
+        """Show timer fire lag, send latency and delivery lag percentiles"""
+        embed = discord.Embed(
+            title="Timer Accuracy (p50 / p95 / p99)",
+            color=discord.Color.blue()
+        )
+        
+        for kind, stages in timer_metrics.get_metrics().items():
+            embed.add_field(
+                name=kind,
+                value="\n".join(
+                    f"{stage}: {summary['p50_ms']} / {summary['p95_ms']} / {summary['p99_ms']} ms ({summary['count']})"
+                    for stage, summary in stages.items()
+                ),
+                inline=False
+            )
+        
+        if not embed.fields:
+            embed.description = "No timers have fired since startup."
+        
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Config(bot)) 
\ No newline at end of file
@@ -1,33 +1,60 @@
 import discord
 from discord.ext import commands
 import random
-import json
-import os
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from persistence import load_json, save_json
+from profile_store import ProfileStore
+from storage_backends import create_backend
+from data_tables import DataTable
+from intent_matcher import DEFAULT_INTENTS, INTENTS_VERSION, build_matcher
+from mood_table import DEFAULT_MOODS, MOODS_VERSION, build_mood_table
+from rate_limit import RateLimiter
+
 logger = logging.getLogger("discord_bot.conversation")
 
+INTENTS_FILE = "data/responses/intents.json"
+MOODS_FILE = "data/responses/moods.json"
+
+# Embed color per mood category; anything else is blue
+MOOD_COLORS = {
+    "positive": discord.Color.green(),
+    "negative": discord.Color.red(),
+}
+
 class Conversation(commands.Cog):
     """Handles natural conversation with users"""
     
     def __init__(self, bot):
         self.bot = bot
-        self.user_data = {}
-        self.load_responses()
-        self.load_user_data()
-        self.cooldowns = {}
+        # Reply budgets per user, channel and guild; only recently active ones are kept
+        self.limiter = RateLimiter()
+        # Profiles are loaded on first use and changes are written behind in batches
+        self.profiles = ProfileStore(
+            create_backend(getattr(bot, 'storage_config', None), "profiles", "data/user_profiles"),
+            default_factory=self.default_user_data
+        )
+        # Data tables compiled once and rebuilt only when their file changes
+        self.intents = DataTable(INTENTS_FILE, DEFAULT_INTENTS, build_matcher, version=INTENTS_VERSION)
+        self.moods = DataTable(MOODS_FILE, DEFAULT_MOODS, build_mood_table, version=MOODS_VERSION)
+    
+    async def cog_load(self):
+        await self.load_responses()
+        config = self.bot.get_cog('Config')
+        if config:
+            self.profiles.writer.interval = config.get_setting('user_data_flush_interval', 30)
+            self.profiles.writer.max_dirty = config.get_setting('user_data_flush_threshold', 50)
+        await self.profiles.open()
     
-    def cog_unload(self):
-        self.save_user_data()
+    async def cog_unload(self):
+        # Runs on extension unload and on bot.close(), so pending changes are never lost
+        await self.profiles.close()
     
-    def load_responses(self):
+    async def load_responses(self):
         """Load conversation responses from JSON files"""
         try:
-            # Create responses directory if it doesn't exist
-            os.makedirs("data/responses", exist_ok=True)
-            
             # Default responses if files don't exist yet
             self.greetings = ["Hey there!", "Hi!", "Hello!", "What's up?", "How's it going?"]
             self.farewell = ["See you later!", "Bye!", "Take care!", "Catch you later!"]
@@ -43,20 +70,20 @@ class Conversation(commands.Cog):
             }
             
             for filename, attr_name in response_files.items():
-                file_path = f"data/responses/{filename}"
-                if os.path.exists(file_path):
-                    with open(file_path, "r") as f:
-                        setattr(self, attr_name, json.load(f))
+                responses = await load_json(f"data/responses/{filename}")
+                if responses is not None:
+                    setattr(self, attr_name, responses)
+            
+            await self.intents.refresh(force=True)
+            await self.moods.refresh(force=True)
             
             logger.info("Loaded conversation responses")
         except Exception as e:
             logger.error(f"Error loading responses: {e}")
     
-    def save_default_responses(self):
+    async def save_default_responses(self):
         """Save default responses to JSON files"""
         try:
-            os.makedirs("data/responses", exist_ok=True)
-            
             responses = {
                 "greetings.json": self.greetings,
                 "farewell.json": self.farewell,
@@ -65,53 +92,36 @@ class Conversation(commands.Cog):
             }
             
             for filename, data in responses.items():
-                with open(f"data/responses/{filename}", "w") as f:
-                    json.dump(data, f, indent=4)
+                await save_json(f"data/responses/{filename}", list(data), indent=4)
+            
+            # Data tables are only written when missing so edits are never overwritten
+            await self.intents.ensure_file()
+            await self.moods.ensure_file()
             
             logger.info("Saved default responses")
         except Exception as e:
             logger.error(f"Error saving default responses: {e}")
     
-    def load_user_data(self):
-        """Load user interaction data"""
-        try:
-            if os.path.exists("data/user_data.json"):
-                with open("data/user_data.json", "r") as f:
-                    self.user_data = json.load(f)
-            else:
-                self.user_data = {}
-            logger.info("Loaded user data")
-        except Exception as e:
-            logger.error(f"Error loading user data: {e}")
-            self.user_data = {}
-    
-    def save_user_data(self):
-        """Save user interaction data"""
-        try:
-            with open("data/user_data.json", "w") as f:
-                json.dump(self.user_data, f, indent=4)
-            logger.info("Saved user data")
-        except Exception as e:
-            logger.error(f"Error saving user data: {e}")
+    @staticmethod
+    def default_user_data():
+        """Profile for a user we haven't seen before"""
+        return {
+            "name": None,
+            "mood": "neutral",
+            "last_interaction": None,
+            "interaction_count": 0,
+            "topics": [],
+            "relationship_status": None
+        }
     
-    def get_user_data(self, user_id):
+    async def get_user_data(self, user_id):
         """Get user data, creating it if it doesn't exist"""
-        user_id = str(user_id)
-        if user_id not in self.user_data:
-            self.user_data[user_id] = {
-                "name": None,
-                "mood": "neutral",
-                "last_interaction": None,
-                "interaction_count": 0,
-                "topics": [],
-                "relationship_status": None
-            }
-        return self.user_data[user_id]
+        return await self.profiles.get(user_id)
     
-    def update_user_data(self, user_id, **kwargs):
+    async def update_user_data(self, user_id, **kwargs):
         """Update user data with new values"""
         user_id = str(user_id)
-        user_data = self.get_user_data(user_id)
+        user_data = await self.get_user_data(user_id)
         
         for key, value in kwargs.items():
             if key in user_data:
@@ -121,9 +131,9 @@ class Conversation(commands.Cog):
         user_data["last_interaction"] = datetime.now().isoformat()
         user_data["interaction_count"] += 1
         
-        self.save_user_data()
+        self.profiles.mark_dirty(user_id)
     
-    def should_respond(self, message):
+    async def should_respond(self, message):
         """Determine whether to respond to a message"""
         # Always respond to mentions
         if self.bot.user.mentioned_in(message):
@@ -135,7 +145,7 @@ class Conversation(commands.Cog):
         
         # Random chance to respond to messages in servers
         # Higher chance if the user interacts frequently
-        user_data = self.get_user_data(message.author.id)
+        user_data = await self.get_user_data(message.author.id)
         interaction_bonus = min(0.2, user_data["interaction_count"] / 100)
         
         if random.random() < (0.1 + interaction_bonus):
@@ -154,32 +164,42 @@ class Conversation(commands.Cog):
             return
         
         # Check if we should respond
-        if not self.should_respond(message):
+        if not await self.should_respond(message):
             return
         
-        # Check cooldown
+        # Check the user's, channel's and guild's reply budgets
         user_id = message.author.id
-        now = datetime.now().timestamp()
-        cooldown = self.bot.get_cog('Config').get_setting('conversation_cooldown', 1)
-        
-        if user_id in self.cooldowns and now - self.cooldowns[user_id] < cooldown:
+        self.configure_limits()
+        if self.limiter.check(
+            user=user_id,
+            channel=message.channel.id,
+            guild=message.guild.id if message.guild else None
+        ):
             return
         
-        self.cooldowns[user_id] = now
-        
         # Get user data
-        user_data = self.get_user_data(user_id)
+        user_data = await self.get_user_data(user_id)
         
         # Process the message and generate a response
         await self.generate_response(message, user_data)
     
+    def configure_limits(self):
+        """Apply the current rate limit settings; cheap enough to run per message"""
+        config = self.bot.get_cog('Config')
+        cooldown = config.get_setting('conversation_cooldown', 1)
+        self.limiter.configure("user", 1 / cooldown if cooldown > 0 else 0, config.get_setting('conversation_burst', 3))
+        for scope in ("channel", "guild"):
+            per_minute = config.get_setting(f'conversation_{scope}_per_minute', 0)
+            # A burst of up to 10 seconds' worth of replies
+            self.limiter.configure(scope, per_minute / 60, max(1, per_minute // 6))
+    
     async def generate_response(self, message, user_data):
         """Generate a response to a message based on its content and user data"""
-        content = message.content.lower()
+        # One pass over the message; the highest-priority intent found wins
+        intent = (await self.intents.refresh()).best(message.content)
         
         # Check for greetings
-        greeting_words = ["hi", "hello", "hey", "howdy", "sup", "what's up", "yo"]
-        if any(word in content for word in greeting_words):
+        if intent == "greeting":
             response = random.choice(self.greetings)
             if user_data["name"]:
                 response = f"{response} {user_data['name']}!"
@@ -188,14 +208,13 @@ class Conversation(commands.Cog):
             return
         
         # Check for farewells
-        farewell_words = ["bye", "goodbye", "see ya", "cya", "gtg", "got to go", "later"]
-        if any(word in content for word in farewell_words):
+        if intent == "farewell":
             response = random.choice(self.farewell)
             await message.channel.send(response)
             return
         
         # Check for personal questions
-        if "who are you" in content or "what are you" in content:
+        if intent == "identity":
             await message.channel.send(
                 "I'm your friendly Discord assistant! I can help with Pomodoro timers, "
                 "to-do lists, and keeping you company. What can I help you with today?"
@@ -203,8 +222,7 @@ class Conversation(commands.Cog):
             return
         
         # Check for help words
-        help_words = ["help", "can you help", "how do i", "how to"]
-        if any(word in content for word in help_words):
+        if intent == "help":
             await message.channel.send(
                 f"Need help? You can use `{self.bot.command_prefix}help` to see all my commands. "
                 f"I can set timers, manage to-do lists, and chat with you!"
@@ -212,50 +230,15 @@ class Conversation(commands.Cog):
             return
         
         # Check for mood indicators
-        mood_indicators = {
-            "happy": ["happy", "glad", "excited", "joy", "awesome", "great"],
-            "sad": ["sad", "upset", "depressed", "unhappy", "miserable"],
-            "angry": ["angry", "mad", "furious", "annoyed", "irritated"],
-            "tired": ["tired", "exhausted", "sleepy", "fatigued"],
-            "stressed": ["stressed", "anxious", "worried", "nervous"]
-        }
-        
-        for mood, indicators in mood_indicators.items():
-            if any(word in content for word in indicators):
-                user_data["mood"] = mood
-                self.update_user_data(message.author.id, mood=mood)
-                
-                if mood == "happy":
-                    await message.channel.send(random.choice([
-                        "Glad to hear you're doing well!",
-                        "That's awesome! Keep that positive energy going!",
-                        "Nice! Good vibes all around!"
-                    ]))
-                elif mood == "sad":
-                    await message.channel.send(random.choice([
-                        "Sorry to hear that. Things will get better soon.",
-                        "It's okay to feel down sometimes. I'm here if you need someone to talk to.",
-                        "Sending you good vibes. Hope you feel better soon!"
-                    ]))
-                elif mood == "angry":
-                    await message.channel.send(random.choice([
-                        "Take a deep breath. It helps sometimes.",
-                        "I get it, that would frustrate me too.",
-                        "Want to talk about what's bothering you?"
-                    ]))
-                elif mood == "tired":
-                    await message.channel.send(random.choice([
-                        "Maybe you need a break? A short nap can do wonders.",
-                        "Don't forget to rest when you need to!",
-                        "Take care of yourself, ok? Rest is important."
-                    ]))
-                elif mood == "stressed":
-                    await message.channel.send(random.choice([
-                        "Try some deep breathing exercises, they really help with stress.",
-                        "One step at a time. You've got this!",
-                        "Maybe a short break would help clear your mind?"
-                    ]))
-                return
+        if intent and intent.startswith("mood:"):
+            mood = intent.split(":", 1)[1]
+            user_data["mood"] = mood
+            await self.update_user_data(message.author.id, mood=mood)
+            
+            # A mood added to intents.json without replies of its own gets a general response
+            replies = (await self.moods.refresh()).replies.get(mood, self.general_responses)
+            await message.channel.send(random.choice(replies))
+            return
         
         # If nothing specific was detected, send a general response
         await message.channel.send(random.choice(self.general_responses))
@@ -263,7 +246,7 @@ class Conversation(commands.Cog):
     @commands.group(name="profile", invoke_without_command=True)
     async def profile(self, ctx):
         """View or update your user profile"""
-        user_data = self.get_user_data(ctx.author.id)
+        user_data = await self.get_user_data(ctx.author.id)
         
         embed = discord.Embed(
             title=f"Profile for {ctx.author.display_name}",
@@ -284,61 +267,32 @@ class Conversation(commands.Cog):
     @profile.command(name="name")
     async def set_name(self, ctx, *, name: str):
         """Set your preferred name"""
-        self.update_user_data(ctx.author.id, name=name)
+        await self.update_user_data(ctx.author.id, name=name)
         await ctx.send(f"I'll call you {name} from now on!")
     
     @profile.command(name="mood")
     async def set_mood(self, ctx, *, mood: str):
         """Set your current mood"""
-        self.update_user_data(ctx.author.id, mood=mood.lower())
+        await self.update_user_data(ctx.author.id, mood=mood.lower())
         await ctx.send(f"I've updated your mood to {mood}.")
     
     @profile.command(name="status")
     async def set_status(self, ctx, *, status: str):
         """Set your relationship status"""
-        self.update_user_data(ctx.author.id, relationship_status=status)
+        await self.update_user_data(ctx.author.id, relationship_status=status)
         await ctx.send(f"I've updated your relationship status to {status}.")
     
     @commands.command(name="mood")
     async def mood_command(self, ctx, *, emotion: Optional[str] = None):
         """Track your emotional state with visual feedback"""
-        user_data = self.get_user_data(ctx.author.id)
-        
-        # Mood emoji dictionary
-        mood_emojis = {
-            "happy": "😄",
-            "excited": "🤩",
-            "content": "😊",
-            "grateful": "🙏",
-            "calm": "😌",
-            "relaxed": "😎",
-            "proud": "😏",
-            "confident": "💪",
-            "loved": "❤️",
-            "neutral": "😐",
-            "sad": "😢",
-            "depressed": "😞",
-            "anxious": "😰",
-            "stressed": "😫",
-            "angry": "😠",
-            "frustrated": "😤",
-            "overwhelmed": "😩",
-            "tired": "😴",
-            "bored": "🥱",
-            "confused": "🤔"
-        }
+        user_data = await self.get_user_data(ctx.author.id)
         
-        # Group moods into categories for suggestions
-        mood_categories = {
-            "positive": ["happy", "excited", "content", "grateful", "calm", "relaxed", "proud", "confident", "loved"],
-            "neutral": ["neutral", "bored", "confused"],
-            "negative": ["sad", "depressed", "anxious", "stressed", "angry", "frustrated", "overwhelmed", "tired"]
-        }
+        moods = await self.moods.refresh()
         
         if emotion is None:
             # Display current mood and suggestions
             current_mood = user_data.get("mood", "neutral").lower()
-            emoji = mood_emojis.get(current_mood, "😐")
+            emoji = moods.emojis.get(current_mood, "😐")
             
             embed = discord.Embed(
                 title="Your Current Mood",
@@ -347,15 +301,10 @@ class Conversation(commands.Cog):
             )
             
             # Add mood categories with example moods
-            for category, moods in mood_categories.items():
-                formatted_moods = []
-                for m in moods[:5]:  # Limit to 5 examples per category
-                    m_emoji = mood_emojis.get(m, "")
-                    formatted_moods.append(f"{m_emoji} `{m}`")
-                
+            for category, examples in moods.examples.items():
                 embed.add_field(
                     name=f"{category.capitalize()} Moods",
-                    value=" ".join(formatted_moods),
+                    value=examples,
                     inline=False
                 )
             
@@ -365,60 +314,31 @@ class Conversation(commands.Cog):
         
         # Setting a new mood
         emotion = emotion.lower()
-        if emotion in mood_emojis:
+        if emotion in moods.emojis:
             # Direct match to known emotion
-            emoji = mood_emojis[emotion]
+            emoji = moods.emojis[emotion]
         else:
             # Try to find closest match
             closest_match = None
-            for mood in mood_emojis.keys():
+            for mood in moods.emojis:
                 if emotion in mood or mood in emotion:
                     closest_match = mood
                     break
             
             if closest_match:
                 emotion = closest_match
-                emoji = mood_emojis[closest_match]
+                emoji = moods.emojis[closest_match]
             else:
                 # No match found, use neutral
                 emoji = "😐"
         
         # Update the user's mood
-        self.update_user_data(ctx.author.id, mood=emotion)
+        await self.update_user_data(ctx.author.id, mood=emotion)
         
         # Determine category for advice
-        mood_category = None
-        for category, moods in mood_categories.items():
-            if emotion in moods:
-                mood_category = category
-                break
-        
-        # Create embed with appropriate colors and advice
-        if mood_category == "positive":
-            color = discord.Color.green()
-            advice = [
-                "That's wonderful to hear! Keep that positive energy flowing.",
-                "Fantastic! Consider journaling about what's going well to reflect on later.",
-                "Awesome! This is a great time to tackle challenging tasks while your energy is high.",
-                "Great! Maybe share your positive vibes with someone who needs a boost today."
-            ]
-        elif mood_category == "negative":
-            color = discord.Color.red()
-            advice = [
-                "I'm sorry you're feeling this way. Remember that emotions are temporary.",
-                "It's okay to not be okay sometimes. Try some deep breathing exercises.",
-                "Consider taking a short break to reset. A quick walk often helps.",
-                "Have you tried talking to someone you trust about how you're feeling?",
-                "Self-care is important - make sure you're getting enough rest, water, and nutritious food."
-            ]
-        else:  # neutral
-            color = discord.Color.blue()
-            advice = [
-                "Sometimes a neutral state is the perfect time for reflection.",
-                "This might be a good time to plan your next steps without emotional interference.",
-                "Consider trying something new today to shift your energy.",
-                "Neutral moods are great for focused work or decision-making."
-            ]
+        mood_category = moods.category_of.get(emotion, "neutral")
+        advice = moods.advice.get(mood_category, moods.advice["neutral"])
+        color = MOOD_COLORS.get(mood_category, discord.Color.blue())
         
         embed = discord.Embed(
             title="Mood Updated",
@@ -439,13 +359,13 @@ class Conversation(commands.Cog):
         # Add to mood history (keep last 10)
         mood_entry = {
             "mood": emotion,
-            "timestamp": datetime.datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat()
         }
         user_data["mood_history"].append(mood_entry)
         user_data["mood_history"] = user_data["mood_history"][-10:]  # Keep last 10
         
         # Save the updated user data
-        self.update_user_data(ctx.author.id, mood_history=user_data["mood_history"])
+        await self.update_user_data(ctx.author.id, mood_history=user_data["mood_history"])
         
         await ctx.send(embed=embed)
     
@@ -457,13 +377,13 @@ class Conversation(commands.Cog):
             return
         
         # Store the topic in user data
-        user_data = self.get_user_data(ctx.author.id)
+        user_data = await self.get_user_data(ctx.author.id)
         if "topics" not in user_data:
             user_data["topics"] = []
         
         if topic.lower() not in [t.lower() for t in user_data["topics"]]:
             user_data["topics"].append(topic)
-            self.update_user_data(ctx.author.id, topics=user_data["topics"])
+            await self.update_user_data(ctx.author.id, topics=user_data["topics"])
         
         # Simplified resources (placeholder - would be expanded in a real bot)
         resources = {
@@ -667,4 +587,4 @@ async def setup(bot):
     # Create default response files if they don't exist
     convo_cog = bot.get_cog("Conversation")
     if convo_cog:
-        convo_cog.save_default_responses() 
\ No newline at end of file
+        await convo_cog.save_default_responses() 
\ No newline at end of file
@@ -1,11 +1,13 @@
 import discord
 from discord.ext import commands
 import re
-import json
 import os
 import logging
 from datetime import datetime
 
+from persistence import load_json, save_json
+from storage_backends import create_backend
+
 logger = logging.getLogger("discord_bot.introduction_handler")
 
 class IntroductionHandler(commands.Cog):
@@ -14,33 +16,43 @@ class IntroductionHandler(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.user_intros = {}
-        self.load_intros()
+        self.intro_store = create_backend(getattr(bot, 'storage_config', None), "intros", "data/user_intros")
         
         # Channel IDs - update these with your actual channel IDs
         self.intro_channel_id = 1353429400460198032  # Introduction channel
         self.aarohi_channel_id = None  # Update this with your "aarohi" channel ID
         
-    def cog_unload(self):
-        self.save_intros()
+    async def cog_load(self):
+        await self.load_intros()
+        
+    async def cog_unload(self):
+        # Every intro is written when it changes, so there is nothing left to save
+        await self.intro_store.close()
     
-    def load_intros(self):
+    async def load_intros(self):
         """Load saved user introductions"""
         try:
-            if os.path.exists("data/user_intros.json"):
-                with open("data/user_intros.json", "r") as f:
-                    self.user_intros = json.load(f)
+            await self.intro_store.open()
+            
+            # Import the old single-file intros once
+            legacy_path = "data/user_intros.json"
+            if os.path.exists(legacy_path):
+                await self.intro_store.batch(puts=await load_json(legacy_path, {}))
+                # Keep the file while intros only live in memory
+                if self.intro_store.persistent:
+                    os.replace(legacy_path, legacy_path + ".migrated")
+            
+            self.user_intros = await self.intro_store.scan()
             logger.info("Loaded user introductions")
         except Exception as e:
             logger.error(f"Error loading user introductions: {e}")
             self.user_intros = {}
     
-    def save_intros(self):
-        """Save user introductions"""
+    async def save_intros(self, user_ids):
+        """Save the introductions of the given users"""
         try:
-            os.makedirs("data/", exist_ok=True)
-            with open("data/user_intros.json", "w") as f:
-                json.dump(self.user_intros, f, indent=4)
-            logger.info("Saved user introductions")
+            await self.intro_store.batch(puts={user_id: self.user_intros[user_id] for user_id in user_ids})
+            logger.info(f"Saved {len(user_ids)} user introductions")
         except Exception as e:
             logger.error(f"Error saving user introductions: {e}")
     
@@ -87,7 +99,7 @@ class IntroductionHandler(commands.Cog):
                     "info": intro_info,
                     "timestamp": datetime.now().isoformat()
                 }
-                self.save_intros()
+                await self.save_intros([user_id])
                 logger.info(f"Saved introduction for user {message.author.name}")
         
         # Handle "done" messages in aarohi channel
@@ -113,11 +125,11 @@ class IntroductionHandler(commands.Cog):
             if convo_cog:
                 # Update user data with intro info
                 if "name" in intro_info:
-                    convo_cog.update_user_data(user_id, name=intro_info["name"])
+                    await convo_cog.update_user_data(user_id, name=intro_info["name"])
                 if "interests" in intro_info:
                     topics = intro_info["interests"].split(",")
                     topics = [topic.strip() for topic in topics]
-                    convo_cog.update_user_data(user_id, topics=topics)
+                    await convo_cog.update_user_data(user_id, topics=topics)
             
             # Craft a personalized greeting
             greeting = f"Hey there! I noticed you completed your introduction."
@@ -157,6 +169,7 @@ class IntroductionHandler(commands.Cog):
             await ctx.send(f"Scanning message history in {intro_channel.mention}. This may take a while...")
             
             count = 0
+            scanned = set()
             async for message in intro_channel.history(limit=500):  # Adjust limit as needed
                 if not message.author.bot:
                     user_id = str(message.author.id)
@@ -168,9 +181,10 @@ class IntroductionHandler(commands.Cog):
                             "info": intro_info,
                             "timestamp": message.created_at.isoformat()
                         }
+                        scanned.add(user_id)
                         count += 1
             
-            self.save_intros()
+            await self.save_intros(scanned)
             await ctx.send(f"Scan complete! Processed {count} introductions.")
             
         except Exception as e:
@@ -191,13 +205,11 @@ class IntroductionHandler(commands.Cog):
         
         # Save to config
         try:
-            with open("data/settings.json", "r") as f:
-                settings = json.load(f)
+            settings = await load_json("data/settings.json", {})
             
             settings["aarohi_channel_id"] = channel_id
             
-            with open("data/settings.json", "w") as f:
-                json.dump(settings, f, indent=4)
+            await save_json("data/settings.json", settings, indent=4)
             
             await ctx.send(f"Aarohi channel ID set to {channel_id}")
         except Exception as e:
@@ -1,13 +1,19 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import asyncio
 import json
 import os
 import datetime
+import itertools
 from typing import Dict, List, Optional
 import logging
 import random
 
+from todo_store import TodoStore
+from storage_backends import backend_kind, create_backend
+from timing_wheel import TimingWheel
+from notification_batcher import NotificationBatcher
+
 logger = logging.getLogger("discord_bot.productivity")
 
 class Productivity(commands.Cog):
@@ -15,14 +21,66 @@ class Productivity(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.pomodoro_sessions = {}  # User ID: {end_time, channel_id, message}
-        self.alarms = {}  # User ID: List of {time, message, channel_id}
-        self.check_timers.start()
-        self.load_todo_lists()
-        
-    def cog_unload(self):
-        self.check_timers.cancel()
-        self.save_todo_lists()
+        self.pomodoro_sessions = {}  # User ID: {end_time, channel_id, minutes}
+        self.focus_sessions = {}  # User ID (str): {end_time, channel_id, minutes}
+        self.alarms = {}  # User ID: List of {id, time, message, channel_id}
+        self.alarm_ids = itertools.count(1)
+        # Pomodoros, alarms and focus sessions share one timing wheel; nothing runs while idle
+        self.timers = TimingWheel("productivity")
+        # Notifications for timers ending together go out as one message per channel
+        self.notifier = NotificationBatcher(bot)
+        # Todo lists are relational, so they stay on SQLite; "memory" keeps them in RAM only
+        if backend_kind(getattr(bot, 'storage_config', None), "todo") == "memory":
+            self.todo_store = TodoStore(":memory:", legacy_path=None)
+        else:
+            self.todo_store = TodoStore()
+        # Running sessions are stored as absolute deadlines so they survive a restart
+        self.session_store = create_backend(getattr(bot, 'storage_config', None), "sessions", "data/productivity_sessions")
+    
+    async def cog_load(self):
+        await self.todo_store.open()
+        await self.session_store.open()
+        await self.restore_sessions()
+        self.timers.start()
+        
+    async def cog_unload(self):
+        await self.timers.stop()
+        await self.notifier.close()
+        await self.todo_store.close()
+        await self.session_store.close()
+    
+    async def save_session(self, kind, user_id, session):
+        """Persist a running session as its deadline"""
+        await self.session_store.put(f"{kind}:{user_id}", {
+            "end": session["end_time"].timestamp(),
+            "channel_id": session["channel_id"],
+            "minutes": session["minutes"]
+        })
+    
+    async def restore_sessions(self):
+        """Reschedule sessions saved before a restart; ones that ended while offline fire right away"""
+        try:
+            for key, record in (await self.session_store.scan("pomodoro:")).items():
+                user_id = int(key.split(":", 1)[1])
+                self.pomodoro_sessions[user_id] = {
+                    "end_time": datetime.datetime.fromtimestamp(record["end"]),
+                    "channel_id": record["channel_id"],
+                    "minutes": record["minutes"]
+                }
+                self.timers.schedule(("pomodoro", user_id), record["end"], self.complete_pomodoro, user_id)
+            
+            for key, record in (await self.session_store.scan("focus:")).items():
+                user_id = key.split(":", 1)[1]
+                self.focus_sessions[user_id] = {
+                    "end_time": datetime.datetime.fromtimestamp(record["end"]),
+                    "channel_id": record["channel_id"],
+                    "minutes": record["minutes"]
+                }
+                self.timers.schedule(("focus", user_id), record["end"], self.focus_timer, int(user_id), record["channel_id"], record["minutes"])
+            
+            logger.info(f"Restored {len(self.pomodoro_sessions)} Pomodoro and {len(self.focus_sessions)} focus sessions")
+        except Exception as e:
+            logger.error(f"Error restoring sessions: {e}")
     
     # --- Pomodoro Commands ---
     
@@ -44,7 +102,7 @@ class Productivity(commands.Cog):
         end_time = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
         
         # Create a motivational message
-        message = await ctx.send(
+        await ctx.send(
             f"🍅 **Pomodoro started!** You're focusing for {minutes} minutes.\n"
             f"Keep working hard! I'll remind you when it's time for a break."
         )
@@ -53,9 +111,10 @@ class Productivity(commands.Cog):
         self.pomodoro_sessions[ctx.author.id] = {
             "end_time": end_time,
             "channel_id": ctx.channel.id,
-            "minutes": minutes,
-            "message": message
+            "minutes": minutes
         }
+        await self.save_session("pomodoro", ctx.author.id, self.pomodoro_sessions[ctx.author.id])
+        self.timers.schedule(("pomodoro", ctx.author.id), end_time.timestamp(), self.complete_pomodoro, ctx.author.id)
         logger.info(f"Started Pomodoro session for {ctx.author} ({minutes} minutes)")
     
     @pomodoro.command(name="check")
@@ -81,6 +140,8 @@ class Productivity(commands.Cog):
             return await ctx.send("You don't have an active Pomodoro session.")
         
         del self.pomodoro_sessions[ctx.author.id]
+        self.timers.cancel(("pomodoro", ctx.author.id))
+        await self.session_store.delete(f"pomodoro:{ctx.author.id}")
         await ctx.send("Pomodoro session canceled. Ready to start again when you are!")
         logger.info(f"Canceled Pomodoro session for {ctx.author}")
 
@@ -114,11 +175,14 @@ class Productivity(commands.Cog):
             if ctx.author.id not in self.alarms:
                 self.alarms[ctx.author.id] = []
             
-            self.alarms[ctx.author.id].append({
+            alarm = {
+                "id": next(self.alarm_ids),
                 "time": alarm_datetime,
                 "message": message,
                 "channel_id": ctx.channel.id
-            })
+            }
+            self.alarms[ctx.author.id].append(alarm)
+            self.timers.schedule(("alarm", alarm["id"]), alarm_datetime.timestamp(), self.ring_alarm, ctx.author.id, alarm)
             
             # Format time for display
             formatted_time = alarm_datetime.strftime("%I:%M %p")
@@ -163,13 +227,15 @@ class Productivity(commands.Cog):
             return await ctx.send("You don't have any active alarms.")
         
         if alarm_number is None:
-            self.alarms[ctx.author.id] = []
+            for alarm in self.alarms.pop(ctx.author.id):
+                self.timers.cancel(("alarm", alarm["id"]))
             await ctx.send("All your alarms have been cleared.")
             logger.info(f"Cleared all alarms for {ctx.author}")
         else:
             try:
                 if 1 <= alarm_number <= len(self.alarms[ctx.author.id]):
-                    del self.alarms[ctx.author.id][alarm_number - 1]
+                    alarm = self.alarms[ctx.author.id].pop(alarm_number - 1)
+                    self.timers.cancel(("alarm", alarm["id"]))
                     await ctx.send(f"Alarm #{alarm_number} has been cleared.")
                     logger.info(f"Cleared alarm #{alarm_number} for {ctx.author}")
                 else:
@@ -179,29 +245,6 @@ class Productivity(commands.Cog):
     
     # --- Todo List Commands ---
     
-    def load_todo_lists(self):
-        """Load todo lists from JSON file"""
-        self.todo_lists = {}
-        
-        try:
-            if os.path.exists("data/todo_lists.json"):
-                with open("data/todo_lists.json", "r") as f:
-                    self.todo_lists = json.load(f)
-            logger.info("Todo lists loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading todo lists: {e}")
-            self.todo_lists = {}
-    
-    def save_todo_lists(self):
-        """Save todo lists to JSON file"""
-        try:
-            os.makedirs("data", exist_ok=True)
-            with open("data/todo_lists.json", "w") as f:
-                json.dump(self.todo_lists, f)
-            logger.info("Todo lists saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving todo lists: {e}")
-    
     @commands.group(name="todo", invoke_without_command=True)
     async def todo(self, ctx):
         """Manage your to-do list"""
@@ -210,21 +253,7 @@ class Productivity(commands.Cog):
     @todo.command(name="add")
     async def add_todo(self, ctx, *, task: str):
         """Add a task to your to-do list"""
-        user_id = str(ctx.author.id)
-        
-        if user_id not in self.todo_lists:
-            self.todo_lists[user_id] = []
-        
-        # Add the task with timestamp
-        task_entry = {
-            "task": task,
-            "completed": False,
-            "created_at": datetime.datetime.now().isoformat(),
-            "completed_at": None
-        }
-        
-        self.todo_lists[user_id].append(task_entry)
-        self.save_todo_lists()
+        await self.todo_store.add_item(ctx.author.id, task)
         
         await ctx.send(f"📝 Added to your to-do list: **{task}**")
         logger.info(f"Added todo item for {ctx.author}: {task}")
@@ -232,9 +261,9 @@ class Productivity(commands.Cog):
     @todo.command(name="list")
     async def list_todos(self, ctx):
         """List all tasks in your to-do list"""
-        user_id = str(ctx.author.id)
+        tasks = await self.todo_store.get_items(ctx.author.id)
         
-        if user_id not in self.todo_lists or not self.todo_lists[user_id]:
+        if not tasks:
             return await ctx.send("Your to-do list is empty! Add tasks with `!todo add <task>`.")
         
         embed = discord.Embed(
@@ -245,7 +274,7 @@ class Productivity(commands.Cog):
         incomplete_tasks = []
         completed_tasks = []
         
-        for i, task in enumerate(self.todo_lists[user_id], 1):
+        for i, task in enumerate(tasks, 1):
             status = "✅" if task["completed"] else "⬜"
             task_text = f"{status} **{i}.** {task['task']}"
             
@@ -273,113 +302,93 @@ class Productivity(commands.Cog):
     @todo.command(name="complete")
     async def complete_todo(self, ctx, task_number: int):
         """Mark a task as completed"""
-        user_id = str(ctx.author.id)
+        task_count = await self.todo_store.count_items(ctx.author.id)
         
-        if user_id not in self.todo_lists or not self.todo_lists[user_id]:
+        if not task_count:
             return await ctx.send("Your to-do list is empty!")
         
         # Check if task number is valid
-        if task_number < 1 or task_number > len(self.todo_lists[user_id]):
-            return await ctx.send(f"Invalid task number. You have {len(self.todo_lists[user_id])} tasks.")
+        task = await self.todo_store.get_item(ctx.author.id, task_number)
+        if task is None:
+            return await ctx.send(f"Invalid task number. You have {task_count} tasks.")
         
         # Mark task as completed
-        task = self.todo_lists[user_id][task_number - 1]
-        
-        # Remove task from the list
-        self.todo_lists[user_id].pop(task_number - 1)
-        self.save_todo_lists()
+        await self.todo_store.mark_completed(task["id"])
         
-        await ctx.send(f"Task completed: {task}")
+        await ctx.send(f"Task completed: {task['task']}")
         
-        # If this was the last task, congratulate the user
-        if not self.todo_lists[user_id]:
+        # If this was the last open task, congratulate the user
+        remaining = await self.todo_store.get_items(ctx.author.id)
+        if all(item["completed"] for item in remaining):
             await ctx.send("🎉 All tasks completed! Great job! 🎉")
             
     @todo.command(name="delete")
     async def delete_todo(self, ctx, task_number: int):
         """Delete a task from your to-do list"""
-        user_id = str(ctx.author.id)
+        task_count = await self.todo_store.count_items(ctx.author.id)
         
-        if user_id not in self.todo_lists or not self.todo_lists[user_id]:
+        if not task_count:
             return await ctx.send("Your to-do list is empty!")
         
-        try:
-            if 1 <= task_number <= len(self.todo_lists[user_id]):
-                task = self.todo_lists[user_id][task_number - 1]["task"]
-                del self.todo_lists[user_id][task_number - 1]
-                self.save_todo_lists()
-                await ctx.send(f"🗑️ Deleted task #{task_number}: **{task}**")
-                logger.info(f"Deleted todo item #{task_number} for {ctx.author}")
-            else:
-                await ctx.send(f"Please specify a valid task number between 1 and {len(self.todo_lists[user_id])}.")
-        except (ValueError, IndexError):
-            await ctx.send("Please specify a valid task number.")
+        task = await self.todo_store.get_item(ctx.author.id, task_number)
+        if task is None:
+            return await ctx.send(f"Please specify a valid task number between 1 and {task_count}.")
+        
+        await self.todo_store.delete_item(task["id"])
+        await ctx.send(f"🗑️ Deleted task #{task_number}: **{task['task']}**")
+        logger.info(f"Deleted todo item #{task_number} for {ctx.author}")
     
     @todo.command(name="clear")
     async def clear_todos(self, ctx, completed_only: bool = False):
         """Clear all tasks from your to-do list or just completed ones"""
-        user_id = str(ctx.author.id)
-        
-        if user_id not in self.todo_lists or not self.todo_lists[user_id]:
+        if not await self.todo_store.count_items(ctx.author.id):
             return await ctx.send("Your to-do list is already empty!")
         
+        removed = await self.todo_store.clear(ctx.author.id, completed_only=completed_only)
         if completed_only:
-            original_length = len(self.todo_lists[user_id])
-            self.todo_lists[user_id] = [task for task in self.todo_lists[user_id] if not task["completed"]]
-            removed = original_length - len(self.todo_lists[user_id])
             await ctx.send(f"🧹 Cleared {removed} completed tasks from your to-do list.")
             logger.info(f"Cleared {removed} completed todo items for {ctx.author}")
         else:
-            self.todo_lists[user_id] = []
             await ctx.send("🧹 Cleared all tasks from your to-do list.")
             logger.info(f"Cleared all todo items for {ctx.author}")
-        
-        self.save_todo_lists()
     
-    # --- Timer Checking Task ---
+    # --- Timer Callbacks ---
     
-    @tasks.loop(seconds=10)
-    async def check_timers(self):
-        """Check for completed Pomodoro sessions and alarms"""
-        now = datetime.datetime.now()
-        
-        # Check Pomodoro sessions
-        for user_id, session in list(self.pomodoro_sessions.items()):
-            if now >= session["end_time"]:
-                try:
-                    channel = self.bot.get_channel(session["channel_id"])
-                    if channel:
-                        user = self.bot.get_user(user_id)
-                        await channel.send(
-                            f"🍅 **Time's up, {user.mention}!** Your {session['minutes']} minute Pomodoro session is complete.\n"
-                            f"Good job! Take a short break and then start another session with `!pomodoro start`."
-                        )
-                    del self.pomodoro_sessions[user_id]
-                    logger.info(f"Completed Pomodoro session for user {user_id}")
-                except Exception as e:
-                    logger.error(f"Error notifying Pomodoro completion: {e}")
-                    continue
-        
-        # Check alarms
-        for user_id, user_alarms in list(self.alarms.items()):
-            for alarm in user_alarms[:]:
-                if now >= alarm["time"]:
-                    try:
-                        channel = self.bot.get_channel(alarm["channel_id"])
-                        if channel:
-                            user = self.bot.get_user(int(user_id))
-                            await channel.send(
-                                f"⏰ **ALARM, {user.mention}!** {alarm['message']}"
-                            )
-                        self.alarms[user_id].remove(alarm)
-                        logger.info(f"Triggered alarm for user {user_id}")
-                    except Exception as e:
-                        logger.error(f"Error notifying alarm: {e}")
-                        continue
+    async def complete_pomodoro(self, user_id):
+        """Notify the user that their Pomodoro session is over"""
+        session = self.pomodoro_sessions.pop(user_id, None)
+        if session is None:
+            return
+        await self.session_store.delete(f"pomodoro:{user_id}")
+        
+        try:
+            await self.notifier.notify(
+                session["channel_id"], user_id,
+                f"🍅 **Time's up, <@{user_id}>!** Your {session['minutes']} minute Pomodoro session is complete.\n"
+                f"Good job! Take a short break and then start another session with `!pomodoro start`.",
+                kind="pomodoro", due=session["end_time"].timestamp()
+            )
+            logger.info(f"Completed Pomodoro session for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error notifying Pomodoro completion: {e}")
     
-    @check_timers.before_loop
-    async def before_check_timers(self):
-        await self.bot.wait_until_ready()
+    async def ring_alarm(self, user_id, alarm):
+        """Send an alarm and remove it from the user's list"""
+        user_alarms = self.alarms.get(user_id, [])
+        if alarm not in user_alarms:
+            return
+        user_alarms.remove(alarm)
+        if not user_alarms:
+            del self.alarms[user_id]
+        
+        try:
+            await self.notifier.notify(
+                alarm["channel_id"], user_id, f"⏰ **ALARM, <@{user_id}>!** {alarm['message']}",
+                kind="alarm", due=alarm["time"].timestamp()
+            )
+            logger.info(f"Triggered alarm for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error notifying alarm: {e}")
 
     @commands.group(name="focus", invoke_without_command=True)
     async def focus(self, ctx, minutes: Optional[int] = 0):
@@ -387,7 +396,7 @@ class Productivity(commands.Cog):
         user_id = str(ctx.author.id)
         
         # If user has active focus session
-        if hasattr(self, 'focus_sessions') and user_id in self.focus_sessions:
+        if user_id in self.focus_sessions:
             # Check if session is still active
             end_time = self.focus_sessions[user_id]['end_time']
             if datetime.datetime.now() < end_time:
@@ -413,12 +422,10 @@ class Productivity(commands.Cog):
                 await ctx.send(embed=embed)
                 return
             else:
-                # Session expired, remove it
-                del self.focus_sessions[user_id]
-        
-        # Initialize focus_sessions if not exists
-        if not hasattr(self, 'focus_sessions'):
-            self.focus_sessions = {}
+                # Deadline passed but its timer has not fired yet: cancel it and send the completion now
+                self.timers.cancel(("focus", user_id))
+                session = self.focus_sessions[user_id]
+                await self.focus_timer(ctx.author.id, session['channel_id'], session['minutes'])
         
         # If minutes provided, start a timed focus session
         if minutes > 0:
@@ -429,8 +436,10 @@ class Productivity(commands.Cog):
             end_time = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
             self.focus_sessions[user_id] = {
                 'end_time': end_time,
-                'channel_id': ctx.channel.id
+                'channel_id': ctx.channel.id,
+                'minutes': minutes
             }
+            await self.save_session("focus", user_id, self.focus_sessions[user_id])
             
             # Create visually appealing embed
             embed = discord.Embed(
@@ -467,8 +476,8 @@ class Productivity(commands.Cog):
             
             await ctx.send(embed=embed)
             
-            # Schedule task to notify when focus time ends
-            self.bot.loop.create_task(self.focus_timer(ctx.author.id, ctx.channel.id, minutes))
+            # Schedule a deadline to notify when focus time ends
+            self.timers.schedule(("focus", user_id), end_time.timestamp(), self.focus_timer, ctx.author.id, ctx.channel.id, minutes)
         else:
             # Toggle focus mode on/off
             await ctx.send(
@@ -485,11 +494,13 @@ class Productivity(commands.Cog):
         """End a focus session early"""
         user_id = str(ctx.author.id)
         
-        if not hasattr(self, 'focus_sessions') or user_id not in self.focus_sessions:
+        if user_id not in self.focus_sessions:
             await ctx.send("You don't have an active focus session.")
             return
             
         del self.focus_sessions[user_id]
+        self.timers.cancel(("focus", user_id))
+        await self.session_store.delete(f"focus:{user_id}")
         
         # Create embed for ending focus session
         embed = discord.Embed(
@@ -515,31 +526,27 @@ class Productivity(commands.Cog):
         await ctx.send(embed=embed)
     
     async def focus_timer(self, user_id, channel_id, minutes):
-        """Timer for focus sessions"""
+        """Called when a focus session's deadline is reached"""
         user_id = str(user_id)
-        await asyncio.sleep(minutes * 60)
         
         # Check if session still exists (wasn't ended early)
-        if hasattr(self, 'focus_sessions') and user_id in self.focus_sessions:
-            del self.focus_sessions[user_id]
+        if user_id in self.focus_sessions:
+            due = self.focus_sessions.pop(user_id)["end_time"].timestamp()
+            await self.session_store.delete(f"focus:{user_id}")
             
-            channel = self.bot.get_channel(channel_id)
-            if channel:
-                user = await self.bot.fetch_user(int(user_id))
-                
-                embed = discord.Embed(
-                    title="Focus Session Complete! 🎉",
-                    description=f"{user.mention} Your {minutes}-minute focus session is complete!",
-                    color=discord.Color.green()
-                )
-                
-                embed.add_field(
-                    name="Time to Recharge", 
-                    value="Take a 5-minute break before your next session. Stretch, grab water, or rest your eyes.", 
-                    inline=False
-                )
-                
-                await channel.send(embed=embed)
+            embed = discord.Embed(
+                title="Focus Session Complete! 🎉",
+                description=f"<@{user_id}> Your {minutes}-minute focus session is complete!",
+                color=discord.Color.green()
+            )
+            
+            embed.add_field(
+                name="Time to Recharge", 
+                value="Take a 5-minute break before your next session. Stretch, grab water, or rest your eyes.", 
+                inline=False
+            )
+            
+            await self.notifier.notify(channel_id, int(user_id), embed=embed, kind="focus", due=due)
                 
     @commands.command(name="quote")
     async def quote(self, ctx, category: Optional[str] = None):
@@ -587,7 +594,7 @@ class Productivity(commands.Cog):
         # Create embed for the quote
         embed = discord.Embed(
             title=f"{cat_display} Quote",
-            description=f"**"{quote_text}"**",
+            description=f"**\"{quote_text}\"**",
             color=discord.Color.blue()
         )
         embed.set_footer(text=f"— {author}")
@@ -598,5 +605,7 @@ class Productivity(commands.Cog):
             embed.add_field(name="Available Categories", value=f"Try: {categories}")
             
         # Send a single consolidated response
-        await ctx.send(embed=embed)def setup(bot):
+        await ctx.send(embed=embed)
+
+async def setup(bot):
     await bot.add_cog(Productivity(bot)) 
\ No newline at end of file
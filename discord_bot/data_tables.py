@@ -0,0 +1,66 @@
+import time
+import logging
+from types import MappingProxyType
+
+from persistence import load_json, save_json, file_mtime
+
+logger = logging.getLogger("discord_bot.data_tables")
+
+CHECK_INTERVAL = 5  # seconds between mtime checks of a table's file
+
+
+def freeze(value):
+    """Read-only copy of JSON data: dicts become mapping proxies and lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class DataTable:
+    """A JSON data file compiled once into a read-only structure
+
+    `build` turns the file's contents into whatever the caller reads on the
+    hot path and should raise ValueError on bad data. The file's mtime is
+    checked at most every CHECK_INTERVAL seconds and the table is rebuilt only
+    when it changed; a file that fails to load or build leaves the previous
+    table in place. With `version` set, the file must carry a matching
+    top-level "version" so an older or newer layout is never half-read.
+    """
+
+    def __init__(self, path, default, build, version=None):
+        self.path = path
+        self.default = default
+        self.build = build
+        self.version = version
+        self.value = build(default)
+        self.mtime = None
+        self.checked = 0.0
+
+    async def refresh(self, force=False):
+        """Rebuild from the file if it changed since the last load; returns the current table"""
+        now = time.monotonic()
+        if not force and now - self.checked < CHECK_INTERVAL:
+            return self.value
+        self.checked = now
+
+        mtime = await file_mtime(self.path)
+        if mtime is None or mtime == self.mtime:
+            return self.value
+        self.mtime = mtime
+
+        try:
+            data = await load_json(self.path)
+            if self.version is not None and (not isinstance(data, dict) or data.get("version") != self.version):
+                raise ValueError(f"expected version {self.version}")
+            self.value = self.build(data)
+            logger.info(f"Loaded {self.path}")
+        except Exception as e:
+            logger.error(f"Keeping previous table, could not load {self.path}: {e}")
+        return self.value
+
+    async def ensure_file(self):
+        """Write the defaults if the file does not exist; existing edits are never overwritten"""
+        if await file_mtime(self.path) is None:
+            await save_json(self.path, self.default, indent=4)
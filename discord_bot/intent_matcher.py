@@ -0,0 +1,83 @@
+import re
+
+INTENTS_VERSION = 1
+
+# Shipped as data/responses/intents.json; bump INTENTS_VERSION when the layout changes
+DEFAULT_INTENTS = {
+    "version": INTENTS_VERSION,
+    # Keyword tables, highest priority first
+    "intents": {
+        "greeting": ["hi", "hello", "hey", "howdy", "sup", "what's up", "yo"],
+        "farewell": ["bye", "goodbye", "see ya", "cya", "gtg", "got to go", "later"],
+        "identity": ["who are you", "what are you"],
+        "help": ["help", "can you help", "how do i", "how to"],
+        "mood:happy": ["happy", "glad", "excited", "joy", "awesome", "great"],
+        "mood:sad": ["sad", "upset", "depressed", "unhappy", "miserable"],
+        "mood:angry": ["angry", "mad", "furious", "annoyed", "irritated"],
+        "mood:tired": ["tired", "exhausted", "sleepy", "fatigued"],
+        "mood:stressed": ["stressed", "anxious", "worried", "nervous"]
+    }
+}
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lowercase, straighten apostrophes and collapse whitespace"""
+    return _SPACES.sub(" ", text.lower().replace("’", "'")).strip()
+
+
+class IntentMatcher:
+    """Every keyword table compiled into one word-boundary regex
+
+    A message is scanned once; keywords only match as whole words, so "hi"
+    no longer fires inside "this". Where keywords overlap the longest one
+    wins. Build a new matcher when the tables change; instances are never
+    modified after construction.
+    """
+
+    def __init__(self, intents):
+        self.intents = list(intents)  # priority order
+        self.priority = {intent: rank for rank, intent in enumerate(self.intents)}
+        self.keywords = {}  # normalized keyword -> intents it belongs to
+        for intent, words in intents.items():
+            for word in words:
+                keyword = normalize(word)
+                if keyword and intent not in self.keywords.get(keyword, ()):
+                    self.keywords.setdefault(keyword, []).append(intent)
+
+        # Longest first so "see ya" is preferred over a shorter keyword at the same position
+        alternation = "|".join(
+            r"\s+".join(re.escape(part) for part in keyword.split(" "))
+            for keyword in sorted(self.keywords, key=len, reverse=True)
+        )
+        self.pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)") if self.keywords else None
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def match(self, text):
+        """Intents found in text, ranked by priority then hits: [(intent, hits), ...]"""
+        if self.pattern is None:
+            return []
+        hits = {}
+        for found in self.pattern.finditer(text.lower().replace("’", "'")):
+            for intent in self.keywords[_SPACES.sub(" ", found.group())]:
+                hits[intent] = hits.get(intent, 0) + 1
+        return sorted(hits.items(), key=lambda item: (self.priority[item[0]], -item[1]))
+
+    def best(self, text):
+        """The highest-ranked intent in text, or None"""
+        ranked = self.match(text)
+        return ranked[0][0] if ranked else None
+
+
+def build_matcher(data):
+    """Compile intents.json, raising ValueError if it is malformed"""
+    intents = data.get("intents")
+    if not isinstance(intents, dict) or not all(
+        isinstance(words, list) and all(isinstance(word, str) for word in words)
+        for words in intents.values()
+    ):
+        raise ValueError("expected {intent: [keyword, ...]}")
+    return IntentMatcher(intents)
@@ -6,6 +6,8 @@ import logging
 from datetime import datetime
 import random
 
+from startup import StartupPipeline, load_cogs
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,27 +31,35 @@ except FileNotFoundError:
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix=config['prefix'], intents=intents, help_command=None)
 
-# Event: Bot is ready
+class AssistantBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.startup = StartupPipeline("discord_bot")
+        # Which storage backend each store uses; cogs read this when they are created
+        self.storage_config = config.get('storage', {})
+    
+    async def setup_hook(self):
+        # Runs once per process, before the first gateway connection
+        self.start_time = datetime.utcnow()
+        results = await load_cogs(self, self.startup)
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                logger.error(f'Failed to load extension {name}.py: {result}')
+            else:
+                logger.info(f'Loaded extension: {name}.py')
+        self.startup.mark_ready()
+
+bot = AssistantBot(command_prefix=config['prefix'], intents=intents, help_command=None)
+
+# Event: Bot is ready (fires again after every gateway reconnect)
 @bot.event
 async def on_ready():
     logger.info(f'{bot.user.name} has connected to Discord!')
-    # Set start time for uptime tracking
-    bot.start_time = datetime.utcnow()
     await bot.change_presence(activity=discord.Activity(
         type=discord.ActivityType.listening, 
         name=f"{config['prefix']}help"
     ))
-    
-    # Load cogs
-    for filename in os.listdir('./cogs'):
-        if filename.endswith('.py'):
-            try:
-                await bot.load_extension(f'cogs.{filename[:-3]}')
-                logger.info(f'Loaded extension: {filename}')
-            except Exception as e:
-                logger.error(f'Failed to load extension {filename}: {e}')
 
 # Event: Message received
 @bot.event
@@ -71,8 +81,7 @@ async def on_message(message):
         embed.add_field(
             name="📌 Basic Commands",
             value=(
-                f"`{config['prefix']}ping` - Check if I'm online
-"
+                f"`{config['prefix']}ping` - Check if I'm online\n"
                 f"`{config['prefix']}help` - Display this help message"
             ),
             inline=False
@@ -82,12 +91,9 @@ async def on_message(message):
         embed.add_field(
             name="⏱️ Productivity Tools",
             value=(
-                f"`{config['prefix']}pomodoro` - Start a focus session
-"
-                f"`{config['prefix']}todo` - Manage your to-do list
-"
-                f"`{config['prefix']}alarm` - Set or view alarms
-"
+                f"`{config['prefix']}pomodoro` - Start a focus session\n"
+                f"`{config['prefix']}todo` - Manage your to-do list\n"
+                f"`{config['prefix']}alarm` - Set or view alarms\n"
                 f"`{config['prefix']}focus` - Enter distraction-free mode"
             ),
             inline=False
@@ -97,12 +103,9 @@ async def on_message(message):
         embed.add_field(
             name="✨ Personalization",
             value=(
-                f"`{config['prefix']}profile` - View or update your profile
-"
-                f"`{config['prefix']}mood` - Track your emotional state
-"
-                f"`{config['prefix']}resources` - Get helpful resources
-"
+                f"`{config['prefix']}profile` - View or update your profile\n"
+                f"`{config['prefix']}mood` - Track your emotional state\n"
+                f"`{config['prefix']}resources` - Get helpful resources\n"
                 f"`{config['prefix']}quote` - Get an inspirational quote"
             ),
             inline=False
@@ -203,12 +206,6 @@ async def ping(ctx):
     # Send the response
     await ctx.send(embed=embed)
 
-# Simple help command using the standard decorator
-
-    else:
-        # Command-specific help
-        await ctx.send(f"I don't have specific help for `{command}`. Try `!help` to see all available commands.")
-
 # Run the bot
 if __name__ == "__main__":
     bot.run(config['token'], log_handler=None) 
\ No newline at end of file
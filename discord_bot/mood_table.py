@@ -0,0 +1,121 @@
+from typing import Mapping, NamedTuple, Tuple
+
+from data_tables import freeze
+
+MOODS_VERSION = 1
+
+# Shipped as data/responses/moods.json; bump MOODS_VERSION when the layout changes
+DEFAULT_MOODS = {
+    "version": MOODS_VERSION,
+    # Replies when a message shows one of the intent_matcher moods
+    "replies": {
+        "happy": [
+            "Glad to hear you're doing well!",
+            "That's awesome! Keep that positive energy going!",
+            "Nice! Good vibes all around!"
+        ],
+        "sad": [
+            "Sorry to hear that. Things will get better soon.",
+            "It's okay to feel down sometimes. I'm here if you need someone to talk to.",
+            "Sending you good vibes. Hope you feel better soon!"
+        ],
+        "angry": [
+            "Take a deep breath. It helps sometimes.",
+            "I get it, that would frustrate me too.",
+            "Want to talk about what's bothering you?"
+        ],
+        "tired": [
+            "Maybe you need a break? A short nap can do wonders.",
+            "Don't forget to rest when you need to!",
+            "Take care of yourself, ok? Rest is important."
+        ],
+        "stressed": [
+            "Try some deep breathing exercises, they really help with stress.",
+            "One step at a time. You've got this!",
+            "Maybe a short break would help clear your mind?"
+        ]
+    },
+    "emojis": {
+        "happy": "😄",
+        "excited": "🤩",
+        "content": "😊",
+        "grateful": "🙏",
+        "calm": "😌",
+        "relaxed": "😎",
+        "proud": "😏",
+        "confident": "💪",
+        "loved": "❤️",
+        "neutral": "😐",
+        "sad": "😢",
+        "depressed": "😞",
+        "anxious": "😰",
+        "stressed": "😫",
+        "angry": "😠",
+        "frustrated": "😤",
+        "overwhelmed": "😩",
+        "tired": "😴",
+        "bored": "🥱",
+        "confused": "🤔"
+    },
+    # Groups moods for the !mood suggestions and advice
+    "categories": {
+        "positive": ["happy", "excited", "content", "grateful", "calm", "relaxed", "proud", "confident", "loved"],
+        "neutral": ["neutral", "bored", "confused"],
+        "negative": ["sad", "depressed", "anxious", "stressed", "angry", "frustrated", "overwhelmed", "tired"]
+    },
+    "advice": {
+        "positive": [
+            "That's wonderful to hear! Keep that positive energy flowing.",
+            "Fantastic! Consider journaling about what's going well to reflect on later.",
+            "Awesome! This is a great time to tackle challenging tasks while your energy is high.",
+            "Great! Maybe share your positive vibes with someone who needs a boost today."
+        ],
+        "negative": [
+            "I'm sorry you're feeling this way. Remember that emotions are temporary.",
+            "It's okay to not be okay sometimes. Try some deep breathing exercises.",
+            "Consider taking a short break to reset. A quick walk often helps.",
+            "Have you tried talking to someone you trust about how you're feeling?",
+            "Self-care is important - make sure you're getting enough rest, water, and nutritious food."
+        ],
+        "neutral": [
+            "Sometimes a neutral state is the perfect time for reflection.",
+            "This might be a good time to plan your next steps without emotional interference.",
+            "Consider trying something new today to shift your energy.",
+            "Neutral moods are great for focused work or decision-making."
+        ]
+    }
+}
+
+
+class MoodTable(NamedTuple):
+    replies: Mapping[str, Tuple[str, ...]]
+    emojis: Mapping[str, str]
+    categories: Mapping[str, Tuple[str, ...]]
+    advice: Mapping[str, Tuple[str, ...]]
+    category_of: Mapping[str, str]  # mood -> category
+    examples: Mapping[str, str]  # category -> formatted example moods for !mood
+
+
+def build_mood_table(data):
+    """Index moods.json into a read-only MoodTable"""
+    for section in ("replies", "emojis", "categories", "advice"):
+        if not isinstance(data.get(section), dict):
+            raise ValueError(f"missing section {section!r}")
+    if any(not replies for replies in data["replies"].values()) or any(not advice for advice in data["advice"].values()):
+        raise ValueError("every reply and advice list needs at least one entry")
+    if "neutral" not in data["advice"]:
+        raise ValueError("advice needs a 'neutral' list for uncategorized moods")
+
+    emojis = data["emojis"]
+    return MoodTable(
+        replies=freeze(data["replies"]),
+        emojis=freeze(emojis),
+        categories=freeze(data["categories"]),
+        advice=freeze(data["advice"]),
+        category_of=freeze({mood: category for category, moods in data["categories"].items() for mood in moods}),
+        examples=freeze({
+            # Limit to 5 examples per category
+            category: " ".join(f"{emojis.get(mood, '')} `{mood}`" for mood in moods[:5])
+            for category, moods in data["categories"].items()
+        }),
+    )
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import logging
+
+import timer_metrics
+
+logger = logging.getLogger("discord_bot.notification_batcher")
+
+MAX_EMBEDS = 10  # Discord's limit per message
+MAX_CONTENT = 2000
+
+
+class NotificationBatcher:
+    """Groups timer notifications that come due together into one message per channel
+
+    A notification waits up to `window` seconds for others headed to the same
+    channel. A group is sent as one message that mentions every user and
+    carries all their embeds; if that send fails, each user gets their own
+    message as before.
+
+    When a notification carries the epoch time its timer was due, the send
+    latency and the end-to-end delivery lag are recorded in timer_metrics.
+    """
+
+    def __init__(self, bot, window=1.0):
+        self.bot = bot
+        self.window = window
+        self.pending = {}  # channel_id -> [(user_id, content, embed, kind, due)]
+        self._flushes = {}  # channel_id -> flush task
+        self.notifications = 0
+        self.delivered = 0
+        self.messages_sent = 0
+        self.fallbacks = 0
+
+    def stats(self):
+        """Counts since startup; api_calls_saved is delivered notifications minus messages sent"""
+        return {
+            "notifications": self.notifications,
+            "delivered": self.delivered,
+            "messages_sent": self.messages_sent,
+            "api_calls_saved": self.delivered - self.messages_sent,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def notify(self, channel_id, user_id, content=None, embed=None, kind="timer", due=None):
+        """Queue a notification for a user in a channel; due is when its timer was scheduled to fire"""
+        self.pending.setdefault(channel_id, []).append((user_id, content, embed, kind, due))
+        self.notifications += 1
+        if channel_id not in self._flushes:
+            self._flushes[channel_id] = asyncio.create_task(self._flush_later(channel_id))
+
+    async def _flush_later(self, channel_id):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            del self._flushes[channel_id]
+        await self.flush(channel_id)
+
+    async def flush(self, channel_id):
+        """Send everything queued for a channel now"""
+        items = self.pending.pop(channel_id, [])
+        if not items:
+            return
+
+        await self.bot.wait_until_ready()
+        channel = self.bot.get_channel(channel_id)
+        if not channel:
+            logger.error(f"Channel {channel_id} not found for {len(items)} notifications")
+            return
+
+        for group in self._groups(items):
+            if len(group) == 1:
+                await self._send_single(channel, group[0])
+                continue
+            content = "\n".join(
+                item_content or f"<@{user_id}>" for user_id, item_content, *_ in group
+            )
+            embeds = [embed for _, _, embed, *_ in group if embed is not None]
+            try:
+                start = time.perf_counter()
+                await channel.send(content, embeds=embeds)
+                self._record(group, time.perf_counter() - start)
+                self.messages_sent += 1
+                self.delivered += len(group)
+            except Exception as e:
+                logger.error(f"Error sending {len(group)} grouped notifications, sending individually: {e}")
+                self.fallbacks += 1
+                for item in group:
+                    await self._send_single(channel, item)
+
+        if len(items) > 1:
+            logger.info(f"Flushed {len(items)} notifications to channel {channel_id} together")
+
+    def _groups(self, items):
+        # Split so each message stays within Discord's embed and length limits
+        group, embeds, length = [], 0, 0
+        for item in items:
+            user_id, content, embed = item[:3]
+            line = len(content or f"<@{user_id}>") + 1
+            extra = 1 if embed is not None else 0
+            if group and (embeds + extra > MAX_EMBEDS or length + line > MAX_CONTENT):
+                yield group
+                group, embeds, length = [], 0, 0
+            group.append(item)
+            embeds += extra
+            length += line
+        if group:
+            yield group
+
+    def _record(self, group, send_seconds):
+        sent_at = time.time()
+        for kind in {item[3] for item in group}:
+            timer_metrics.record(kind, "send", send_seconds)
+        for _, _, _, kind, due in group:
+            if due is not None:
+                timer_metrics.record(kind, "delivery", sent_at - due)
+
+    async def _send_single(self, channel, item):
+        user_id, content, embed = item[:3]
+        try:
+            start = time.perf_counter()
+            await channel.send(content or f"<@{user_id}>", embed=embed)
+            self._record([item], time.perf_counter() - start)
+            self.messages_sent += 1
+            self.delivered += 1
+        except Exception as e:
+            logger.error(f"Error sending notification to user {user_id}: {e}")
+
+    async def close(self):
+        """Send anything still waiting"""
+        for task in list(self._flushes.values()):
+            task.cancel()
+        for channel_id in list(self.pending):
+            await self.flush(channel_id)
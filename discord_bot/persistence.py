@@ -0,0 +1,174 @@
+import asyncio
+import contextlib
+import json
+import os
+import pickle
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("discord_bot.persistence")
+
+# Serialization and disk access run here so a slow disk never stalls the event loop
+MAX_WORKERS = 2
+MAX_PENDING = 100  # callers wait once this many operations are queued
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="persistence")
+_pending_slots = None  # created lazily inside the running loop
+_path_locks = {}  # path -> [lock, users holding or waiting for it]
+
+
+class PersistenceMetrics:
+    """Queue depth and write latency of the persistence executor"""
+
+    def __init__(self, window=500):
+        self.queue_depth = 0
+        self.writes = 0
+        self.reads = 0
+        self.errors = 0
+        self.max_write_latency = 0.0
+        self.recent_write_latencies = deque(maxlen=window)
+
+    def record_write(self, latency):
+        self.writes += 1
+        self.max_write_latency = max(self.max_write_latency, latency)
+        self.recent_write_latencies.append(latency)
+
+    def snapshot(self):
+        """Return the current metrics as a dict (latencies in milliseconds)"""
+        recent = sorted(self.recent_write_latencies)
+        avg = sum(recent) / len(recent) if recent else 0.0
+        p95 = recent[int(len(recent) * 0.95) - 1] if recent else 0.0
+        return {
+            "queue_depth": self.queue_depth,
+            "writes": self.writes,
+            "reads": self.reads,
+            "errors": self.errors,
+            "avg_write_ms": round(avg * 1000, 2),
+            "p95_write_ms": round(p95 * 1000, 2),
+            "max_write_ms": round(self.max_write_latency * 1000, 2),
+        }
+
+
+metrics = PersistenceMetrics()
+
+
+def get_metrics():
+    """Return a snapshot of the persistence metrics"""
+    return metrics.snapshot()
+
+
+async def run_io(func, *args):
+    """Run a blocking function on the persistence executor"""
+    global _pending_slots
+    if _pending_slots is None:
+        _pending_slots = asyncio.Semaphore(MAX_PENDING)
+
+    metrics.queue_depth += 1
+    try:
+        async with _pending_slots:
+            return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    except Exception:
+        metrics.errors += 1
+        raise
+    finally:
+        metrics.queue_depth -= 1
+
+
+@contextlib.asynccontextmanager
+async def _path_lock(path):
+    # Writes to the same file are applied in the order they were requested;
+    # a path's lock is dropped once nobody holds or waits for it
+    entry = _path_locks.get(path)
+    if entry is None:
+        entry = _path_locks[path] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _path_locks[path]
+
+
+def _write_atomic(path, payload, mode):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _dump_json(path, data, indent):
+    _write_atomic(path, json.dumps(data, indent=indent), "w")
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _read_pickle(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+async def _timed_write(path, func, *args):
+    async with _path_lock(path):
+        start = time.perf_counter()
+        await run_io(func, *args)
+        metrics.record_write(time.perf_counter() - start)
+
+
+async def save_json(path, data, indent=None):
+    """Serialize data and atomically replace path with it
+
+    Serialization happens on the executor, so pass a copy if the caller may
+    mutate data before the write finishes.
+    """
+    await _timed_write(path, _dump_json, path, data, indent)
+
+
+async def load_json(path, default=None):
+    """Read a JSON file, returning default if it does not exist"""
+    metrics.reads += 1
+    return await run_io(_read_json, path, default)
+
+
+async def load_pickle(path, default=None):
+    """Read a pickle file, returning default if it does not exist"""
+    metrics.reads += 1
+    return await run_io(_read_pickle, path, default)
+
+
+async def delete_file(path):
+    """Remove a file if it exists, in order with pending writes to it"""
+    async with _path_lock(path):
+        await run_io(_remove, path)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+async def file_mtime(path):
+    """Modification time of path, or None if it does not exist"""
+    return await run_io(_mtime, path)
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from response_index import ResponseIndex
+
+logger = logging.getLogger("aarohi_bot.pipeline_pool")
+
+RESTART_ATTEMPTS = 3  # tries to bring a dead worker back before giving up
+RESTART_BACKOFF = 1.0  # seconds before the first try, doubled after each failure
+
+# --- Worker process ---
+# The worker owns the training pipeline and the response index, so matching,
+# and teaching all happen off the bot's event loop.
+
+_pipeline = None
+_index = None
+_threshold = 0.5
+_slow_fallback = False
+
+
+def _pipeline_pairs(pipeline):
+    """Every (input, response) pair the pipeline has learned, if it exposes them"""
+    if hasattr(pipeline, "get_training_pairs"):
+        pairs = pipeline.get_training_pairs()
+    else:
+        pairs = getattr(pipeline, "training_pairs", ())
+    if isinstance(pairs, dict):
+        pairs = pairs.items()
+    for pair in pairs:
+        if isinstance(pair, dict):
+            pair = (pair.get("input"), pair.get("output", pair.get("response")))
+        input_text, output_text = pair
+        if isinstance(input_text, str) and isinstance(output_text, str):
+            yield input_text, output_text
+
+
+def _init_worker(pairs, threshold, slow_fallback):
+    global _pipeline, _index, _threshold, _slow_fallback
+    from training_pipeline import TrainingPipeline
+    _pipeline = TrainingPipeline()
+    _index = ResponseIndex()
+    # Pairs the pipeline learned before the index existed first, so taught pairs win on conflicts
+    _index.add_many(list(_pipeline_pairs(_pipeline)) + list(pairs))
+    _threshold = threshold
+    _slow_fallback = slow_fallback
+
+
+def _match_batch(texts):
+    results = []
+    for text in texts:
+        response, confidence = _index.find_response(text)
+        if _slow_fallback and (response is None or confidence <= _threshold):
+            # The pipeline's own linear scan; only for pipelines whose pairs cannot be indexed
+            fallback, fallback_confidence = _pipeline.find_response(text)
+            if fallback is not None and fallback_confidence > confidence:
+                response, confidence = fallback, fallback_confidence
+        results.append((response, confidence))
+    return results
+
+
+def _teach(input_text, output_text):
+    _pipeline.add_training_pair(input_text, output_text)
+    _index.add(input_text, output_text)
+
+
+def _teach_many(pairs):
+    # Pairs from chat exports only go into the index; each one lands in its delta segment
+    for input_text, output_text in pairs:
+        _index.add(input_text, output_text)
+
+
+def _stats():
+    stats = dict(_pipeline.get_training_stats())
+    index_stats = _index.stats()
+    stats["indexed_pairs"] = index_stats["pairs"]
+    stats["unmerged_pairs"] = index_stats["delta_pairs"]
+    return stats
+
+
+# --- Event loop side ---
+
+class PipelinePool:
+    """Async facade over a worker process running the training pipeline
+
+    Messages that arrive within `batch_window` seconds of each other are
+    matched in one round trip. Every call waits at most `timeout` seconds, so
+    a slow match costs that message its reply instead of stalling the gateway.
+    There is a single worker, so teaching and matching reach it in the order
+    they were made. The pipeline's learned pairs are indexed along with the
+    taught ones, so a message is only matched against the index unless
+    `slow_fallback` is set. If the worker dies it is restarted from `load_pairs`,
+    once for all the calls that saw it die, with a few retries and backoff.
+    """
+
+    def __init__(self, load_pairs, threshold=0.5, batch_window=0.01, max_batch=32, timeout=2.0,
+                 slow_fallback=False):
+        self.load_pairs = load_pairs  # coroutine returning every taught (input, response) pair
+        self.threshold = threshold
+        # Ask the pipeline itself when the index has no confident answer: O(pairs) per message
+        self.slow_fallback = slow_fallback
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.executor = None
+        self.generation = 0  # bumped every time a worker starts
+        self._restart_lock = asyncio.Lock()
+        self._pending = []  # [(text, future)]
+        self._flush_task = None
+        self.requests = 0
+        self.batches = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    async def start(self):
+        """Start the worker and index every taught pair in it; raises RuntimeError if it cannot start"""
+        pairs = await self.load_pairs()
+        executor = ProcessPoolExecutor(
+            max_workers=1, initializer=_init_worker, initargs=(pairs, self.threshold, self.slow_fallback)
+        )
+        try:
+            # Wait for the initializer so the first message does not pay for it
+            await asyncio.get_running_loop().run_in_executor(executor, _stats)
+        except BrokenProcessPool as e:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError("Pipeline worker failed to start; its traceback is logged above") from e
+        self.executor = executor
+        self.generation += 1
+        logger.info(f"Pipeline worker started with {len(pairs)} taught pairs")
+
+    async def _restart(self, generation):
+        async with self._restart_lock:
+            if generation != self.generation or self.executor is None:
+                # Another caller already restarted it, or gave up
+                return
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            delay = RESTART_BACKOFF
+            for attempt in range(1, RESTART_ATTEMPTS + 1):
+                await asyncio.sleep(delay)
+                try:
+                    await self.start()
+                    self.restarts += 1
+                    return
+                except Exception as e:
+                    logger.error(f"Pipeline worker restart {attempt}/{RESTART_ATTEMPTS} failed: {e!r}")
+                    delay *= 2
+            logger.error("Pipeline worker could not be restarted; chat matching is off until the bot restarts")
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self):
+        """Request counters since startup"""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+    async def _call(self, func, *args, timeout=-1):
+        timeout = self.timeout if timeout == -1 else timeout
+        if self.executor is None:
+            raise RuntimeError("Pipeline worker is not running")
+        generation = self.generation
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except BrokenProcessPool:
+            logger.error("Pipeline worker died, restarting it")
+            await self._restart(generation)
+            raise
+
+    async def find_response(self, text, default=(None, 0.0)):
+        """Best (response, confidence) for text; default if the worker did not answer in time"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch:
+            await self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        try:
+            return await future
+        except Exception as e:
+            logger.error(f"Error matching message: {e!r}")
+            return default
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.batch_window)
+        finally:
+            self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        try:
+            results = await self._call(_match_batch, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def teach(self, input_text, output_text):
+        """Add a pair to the worker's pipeline and index"""
+        # No timeout: the pair is already stored, and it waits its turn behind any ingestion
+        await self._call(_teach, input_text, output_text, timeout=None)
+
+    async def teach_many(self, pairs):
+        """Add (input, response) pairs from chat exports to the worker's index"""
+        await self._call(_teach_many, pairs, timeout=None)
+
+    async def training_stats(self):
+        """The pipeline's training stats plus the indexed pair count"""
+        return await self._call(_stats)
@@ -0,0 +1,167 @@
+import asyncio
+import copy
+import itertools
+import os
+import time
+import logging
+from collections import OrderedDict
+
+from persistence import load_json
+from storage_backends import JsonFileBackend
+from write_behind import WriteBehindBuffer
+
+logger = logging.getLogger("discord_bot.profile_store")
+
+
+class ProfileStore:
+    """Per-user profiles kept in a storage backend, loaded on first access and cached in a bounded LRU
+
+    Each profile is stored under its user ID; with the default JSON backend
+    that is one file per user under a shard directory. Changed profiles are
+    written behind in batches; a profile is only dropped from memory once it
+    has been written.
+    """
+
+    def __init__(self, backend=None, default_factory=dict, capacity=1000,
+                 idle_seconds=1800, flush_interval=30, flush_threshold=50,
+                 legacy_path="data/user_data.json"):
+        self.backend = backend or JsonFileBackend("data/user_profiles")
+        self.default_factory = default_factory
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.legacy_path = legacy_path
+        self.cache = OrderedDict()  # user_id -> profile, least recently used first
+        self.last_access = {}
+        self.writing = {}  # user_id -> snapshot whose write has not finished yet
+        self.writer = WriteBehindBuffer(
+            self._write_profiles, interval=flush_interval, max_dirty=flush_threshold, name="profiles"
+        )
+        self._sweep_task = None
+
+    async def open(self):
+        """Open the backend, import the legacy single-file profiles and start background flushing"""
+        await self.backend.open()
+        await self.import_legacy()
+        self.writer.start()
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_idle())
+
+    async def close(self):
+        """Stop background work and write every pending profile"""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        await self.writer.stop()
+        await self.backend.close()
+
+    async def get(self, user_id):
+        """Return a user's profile, loading or creating it on first access"""
+        user_id = str(user_id)
+        profile = self.cache.get(user_id)
+        if profile is None:
+            profile = self._pending_write(user_id)
+            if profile is None:
+                profile = await self.backend.get(user_id)
+            # Another coroutine may have loaded it while we were waiting on disk
+            if user_id in self.cache:
+                profile = self.cache[user_id]
+            else:
+                # An eviction may have started writing a newer copy than the one just read
+                pending = self._pending_write(user_id)
+                if pending is not None:
+                    profile = pending
+                elif profile is None:
+                    profile = self.default_factory()
+                self.cache[user_id] = profile
+        self.cache.move_to_end(user_id)
+        self.last_access[user_id] = time.monotonic()
+        await self._evict_over_capacity()
+        return profile
+
+    def _pending_write(self, user_id):
+        # A profile evicted while its write is in flight is newer than what is on disk
+        snapshot = self.writing.get(user_id)
+        return copy.deepcopy(snapshot) if snapshot is not None else None
+
+    def mark_dirty(self, user_id):
+        """Schedule a user's profile to be written"""
+        self.writer.mark_dirty(str(user_id))
+
+    async def _write_profiles(self, user_ids):
+        # Snapshot everything before the first await so evictions cannot race the write
+        snapshots = {
+            user_id: copy.deepcopy(self.cache[user_id])
+            for user_id in user_ids if user_id in self.cache
+        }
+        if snapshots:
+            # Until the write lands, get() serves these instead of the older copies on disk
+            self.writing.update(snapshots)
+            try:
+                await self.backend.batch(puts=snapshots)
+            finally:
+                for user_id, snapshot in snapshots.items():
+                    if self.writing.get(user_id) is snapshot:
+                        del self.writing[user_id]
+
+    async def _evict(self, user_id):
+        """Write a profile if it changed and drop it from memory; returns False if it has to stay"""
+        if user_id in self.writer.dirty:
+            self.writer.dirty.discard(user_id)
+            try:
+                await self._write_profiles([user_id])
+            except Exception as e:
+                # Still cached and dirty, so the next flush retries it
+                self.writer.dirty.add(user_id)
+                logger.error(f"Error writing profile {user_id} before evicting it: {e}")
+                return False
+        # Changed again while it was being written: keep it until that change is written too
+        if user_id in self.writer.dirty or user_id not in self.cache:
+            return False
+        self.cache.pop(user_id)
+        self.last_access.pop(user_id, None)
+        return True
+
+    async def _evict_over_capacity(self):
+        # Each candidate is tried once, so a profile that has to stay cannot stall the caller
+        excess = len(self.cache) - self.capacity
+        if excess > 0:
+            for user_id in list(itertools.islice(self.cache, excess)):
+                await self._evict(user_id)
+
+    async def evict_idle(self):
+        """Drop profiles that have not been used for idle_seconds"""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [user_id for user_id, seen in self.last_access.items() if seen < cutoff]
+        evicted = 0
+        for user_id in idle:
+            # Skip profiles used again while earlier ones were being written
+            if self.last_access.get(user_id, cutoff) < cutoff:
+                evicted += await self._evict(user_id)
+        if evicted:
+            logger.info(f"Evicted {evicted} idle profiles, {len(self.cache)} cached")
+
+    async def _sweep_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_seconds, 300))
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Error evicting idle profiles: {e}")
+
+    async def import_legacy(self):
+        """Split the old data/user_data.json into per-user entries once"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            profiles = await load_json(self.legacy_path, {})
+            await self.backend.batch(puts=profiles)
+            # A backend that keeps nothing across restarts imports the file again next time
+            if self.backend.persistent:
+                os.replace(self.legacy_path, self.legacy_path + ".migrated")
+            logger.info(f"Imported {len(profiles)} profiles from {self.legacy_path}")
+        except Exception as e:
+            logger.error(f"Error importing legacy profiles: {e}")
@@ -0,0 +1,120 @@
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("discord_bot.rate_limit")
+
+MAX_ENTRIES = 10000  # buckets kept per scope; the least recently used go first
+SWEEP_INTERVAL = 60  # seconds between sweeps of idle buckets
+
+
+class TokenBuckets:
+    """Token buckets for one scope (users, channels or guilds), least recently used first
+
+    A bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second; a bucket that has been idle long enough to refill is no
+    different from a new one, so sweep() drops it. Memory therefore follows
+    the keys active in the last burst / rate seconds, capped at max_entries.
+    """
+
+    def __init__(self, rate, burst, max_entries=MAX_ENTRIES):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.buckets = OrderedDict()  # key -> (tokens, updated)
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def tokens(self, key, now):
+        entry = self.buckets.get(key)
+        if entry is None:
+            return self.burst
+        tokens, updated = entry
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def spend(self, key, tokens, now):
+        """Record one token taken from a bucket that had `tokens`"""
+        self.buckets[key] = (tokens - 1, now)
+        self.buckets.move_to_end(key)
+        if len(self.buckets) > self.max_entries:
+            self.buckets.popitem(last=False)
+
+    def sweep(self, now):
+        """Drop buckets idle long enough to be full again; returns how many"""
+        idle = self.burst / self.rate
+        dropped = 0
+        # Buckets are in the order they were last used, so stop at the first recent one
+        while self.buckets:
+            _, updated = next(iter(self.buckets.values()))
+            if now - updated < idle:
+                break
+            self.buckets.popitem(last=False)
+            dropped += 1
+        return dropped
+
+
+class RateLimiter:
+    """Per-user, per-channel and per-guild token buckets checked together
+
+    check() costs a dict lookup per scope. A message is allowed only if every
+    scope has a token, and then takes one from each, so a busy channel or
+    guild is throttled as a whole while a single user can still send a short
+    burst. A scope configured with no rate is not limited.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, sweep_interval=SWEEP_INTERVAL):
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.scopes = {}  # scope name -> TokenBuckets
+        self.next_sweep = 0.0
+        self.limited = {}  # scope name -> messages it turned away
+
+    def configure(self, scope, rate, burst):
+        """Set a scope's refill rate (tokens per second) and burst; a rate of 0 or less disables it"""
+        if not rate or rate <= 0:
+            self.scopes.pop(scope, None)
+            return
+        burst = max(1, burst)
+        buckets = self.scopes.get(scope)
+        if buckets is None:
+            self.scopes[scope] = TokenBuckets(rate, burst, self.max_entries)
+        else:
+            buckets.rate, buckets.burst = rate, burst
+
+    def check(self, now=None, **keys):
+        """Take a token for each scope's key; returns None if allowed, else the scope that is out
+
+        Keys that are None (no guild in DMs) are not limited.
+        """
+        now = time.monotonic() if now is None else now
+        if now >= self.next_sweep:
+            self.sweep(now)
+
+        spends = []
+        for scope, key in keys.items():
+            buckets = self.scopes.get(scope)
+            if buckets is None or key is None:
+                continue
+            tokens = buckets.tokens(key, now)
+            if tokens < 1:
+                self.limited[scope] = self.limited.get(scope, 0) + 1
+                return scope
+            spends.append((buckets, key, tokens))
+        for buckets, key, tokens in spends:
+            buckets.spend(key, tokens, now)
+        return None
+
+    def sweep(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.next_sweep = now + self.sweep_interval
+        dropped = sum(buckets.sweep(now) for buckets in self.scopes.values())
+        if dropped:
+            logger.debug(f"Swept {dropped} idle rate limit buckets")
+        return dropped
+
+    def stats(self):
+        return {
+            "buckets": {scope: len(buckets) for scope, buckets in self.scopes.items()},
+            "limited": dict(self.limited),
+        }
@@ -0,0 +1,131 @@
+import re
+from datetime import datetime, timedelta
+
+import pytz
+
+# Rules are small JSON-safe dicts stored with the alarm:
+#   {"kind": "daily"}
+#   {"kind": "weekdays"}                  Monday to Friday
+#   {"kind": "days", "days": [0, 2, 4]}   specific weekdays, Monday is 0
+#   {"kind": "hours", "every": 4}         every N hours from the first ring
+
+DAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+_FULL_DAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_DAY_WORDS = {name: day for names in (DAY_NAMES, _FULL_DAY_NAMES) for day, name in enumerate(names)}
+MAX_EVERY_HOURS = 168
+
+_EVERY_HOURS = re.compile(r"^(\d+)\s*(?:h|hr|hrs|hour|hours)$")
+
+
+def parse_recurrence(text):
+    """Split a leading recurrence rule off text; returns (rule or None, rest of text)
+
+    A rule has to start with "every" or "repeat" - "every day", "every 4h",
+    "every mon,wed,fri", "repeat weekdays" - so a message that merely begins
+    with a day name ("Monday meeting at 10") is left as it is.
+    """
+    words = text.split()
+    if len(words) < 2 or words[0].lower() not in ("every", "repeat"):
+        return None, text
+    rest = words[1:]
+    if words[0].lower() == "repeat" and rest[0].lower() == "every" and len(rest) > 1:
+        # "repeat every 4h"
+        rest = rest[1:]
+    rule, used = _parse_rule(rest)
+    if rule is None:
+        return None, text
+    return rule, " ".join(rest[used:])
+
+
+def _parse_rule(words):
+    # The rule words after the keyword; returns (rule or None, words used)
+    first = words[0].lower()
+    if first in ("day", "daily", "everyday"):
+        return {"kind": "daily"}, 1
+    if first in ("weekday", "weekdays"):
+        return {"kind": "weekdays"}, 1
+    if first in ("hour", "hourly", "h"):
+        return {"kind": "hours", "every": 1}, 1
+
+    # "4h", "4 hours"
+    match = _EVERY_HOURS.match(first)
+    used = 1
+    if not match and len(words) > 1:
+        match = _EVERY_HOURS.match(f"{words[0]}{words[1]}".lower())
+        used = 2
+    if match:
+        if 1 <= int(match.group(1)) <= MAX_EVERY_HOURS:
+            return {"kind": "hours", "every": int(match.group(1))}, used
+        return None, 0
+
+    # "mon,wed,fri", "sat/sun" or full day names
+    names = [name for name in re.split(r"[,/]", first) if name]
+    if names and all(name in _DAY_WORDS for name in names):
+        days = sorted({_DAY_WORDS[name] for name in names})
+        return {"kind": "days", "days": days}, 1
+
+    return None, 0
+
+
+def describe(rule):
+    """Short human-readable form of a rule"""
+    if not rule:
+        return "once"
+    kind = rule["kind"]
+    if kind == "daily":
+        return "daily"
+    if kind == "weekdays":
+        return "weekdays"
+    if kind == "hours":
+        return "every hour" if rule["every"] == 1 else f"every {rule['every']} hours"
+    return ", ".join(DAY_NAMES[day].capitalize() for day in rule["days"])
+
+
+def _allowed_days(rule):
+    if rule["kind"] == "weekdays":
+        return {0, 1, 2, 3, 4}
+    if rule["kind"] == "days":
+        return set(rule["days"])
+    return set(range(7))
+
+
+def _localize(tz, naive):
+    # pytz needs localize() to pick the right UTC offset on DST changes
+    return tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+
+
+def first_occurrence(rule, candidate, tz=pytz.UTC):
+    """The first allowed ring at or after candidate (an aware datetime)"""
+    if not rule or rule["kind"] == "hours" or candidate.weekday() in _allowed_days(rule):
+        return candidate
+    return next_occurrence(rule, candidate, tz)
+
+
+def next_occurrence(rule, previous, tz=pytz.UTC, after=None):
+    """The next ring after previous (aware), skipping any that are not later than after
+
+    Only the rule and the latest ring time are kept, so a recurring alarm never
+    grows; the one after that is worked out here when it fires.
+    """
+    after = after or previous
+    if rule["kind"] == "hours":
+        step = timedelta(hours=rule["every"])
+        current = previous + step
+        if current <= after:
+            # Skip whole missed periods in one step
+            missed = (after - current) // step + 1
+            current += step * missed
+        return current
+
+    # Calendar rules keep the same wall-clock time in the user's timezone
+    local = previous.astimezone(tz)
+    wall_time = local.replace(tzinfo=None).time()
+    day = local.date()
+    allowed = _allowed_days(rule)
+    while True:
+        day += timedelta(days=1)
+        if day.weekday() not in allowed:
+            continue
+        current = _localize(tz, datetime.combine(day, wall_time))
+        if current > after:
+            return current
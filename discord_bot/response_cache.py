@@ -0,0 +1,107 @@
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+from response_index import text_features
+
+_WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+# Zero-width joiner, variation selector and skin-tone modifiers vary between otherwise equal emoji
+_EMOJI_MODIFIERS = re.compile("[‍️\U0001f3fb-\U0001f3ff]")
+
+
+def cache_key(text):
+    """Fold case, whitespace, punctuation and emoji so "Hi!!", "hi 👋" and " HI " share a key"""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("’", "'")
+    words = _WORD.findall(text)
+    if words:
+        return " ".join(words)
+    # Messages without words ("😂😂", "?!") keep each distinct symbol once, in order
+    symbols = _EMOJI_MODIFIERS.sub("", "".join(text.split()))
+    return "".join(dict.fromkeys(symbols))
+
+
+class ResponseCache:
+    """LRU cache with a TTL for find_response results, keyed by cache_key()
+
+    Each entry also records the index features of its key. Teaching a pair
+    drops only the entries that share a feature with the taught input, since
+    a pair with no feature in common scores zero for that message and cannot
+    change its answer. Pairs ingested from chat exports are invalidated the
+    same way; the TTL bounds how long anything else that changes answers (a
+    restarted worker, a background merge refreshing scores) can be served
+    stale.
+    """
+
+    def __init__(self, capacity=2048, ttl=300):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires, result, features)
+        self.keys_by_feature = {}  # feature -> keys of cached entries containing it
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, text):
+        """Cached (response, confidence) for text, or None"""
+        key = cache_key(text)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, text, result):
+        key = cache_key(text)
+        if not key:
+            return
+        if key in self.entries:
+            self._remove(key)
+        features = tuple(text_features(key))
+        self.entries[key] = (time.monotonic() + self.ttl, result, features)
+        for feature in features:
+            self.keys_by_feature.setdefault(feature, set()).add(key)
+        while len(self.entries) > self.capacity:
+            self._remove(next(iter(self.entries)))
+
+    def invalidate(self, input_text):
+        """Drop cached answers a newly taught input could change; returns how many"""
+        keys = set()
+        for feature in text_features(input_text):
+            keys.update(self.keys_by_feature.get(feature, ()))
+        # A message with no indexable words can only be answered through its exact key
+        keys.add(cache_key(input_text))
+        dropped = 0
+        for key in keys:
+            if key in self.entries:
+                self._remove(key)
+                dropped += 1
+        self.invalidations += dropped
+        return dropped
+
+    def _remove(self, key):
+        _, _, features = self.entries.pop(key)
+        for feature in features:
+            keys = self.keys_by_feature.get(feature)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_feature[feature]
+
+    def stats(self):
+        """Counts since startup"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,337 @@
+import re
+import zlib
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("aarohi_bot.response_index")
+
+# Features are hashed into 2**FEATURE_BITS ids, so no vocabulary has to be kept
+FEATURE_BITS = 22
+_FEATURE_MASK = (1 << FEATURE_BITS) - 1
+_WORDS = re.compile(r"[a-z0-9']+")
+
+# Pairs taught since the last merge before a background merge into the main segment starts
+MERGE_THRESHOLD = 512
+
+
+def normalize_input(text):
+    """Lowercase words only; inputs that normalize the same are the same pair"""
+    return " ".join(_WORDS.findall(text.lower().replace("’", "'")))
+
+
+def text_features(text):
+    """Hashed whole-word and character-trigram features of text: {feature: count}
+
+    Words carry exact matches; trigrams let "thx" and "thanks" or a typo
+    still land near each other.
+    """
+    counts = {}
+    for word in normalize_input(text).split():
+        padded = f" {word} "
+        for feature in [f"w:{word}"] + [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]:
+            feature_id = zlib.crc32(feature.encode()) & _FEATURE_MASK
+            counts[feature_id] = counts.get(feature_id, 0) + 1
+    return counts
+
+
+class _Segment:
+    """Immutable postings of merged pairs as flat NumPy arrays sorted by feature
+
+    Weights are the pairs' log term frequencies; IDF is applied at query time
+    so segments built at different moments stay comparable.
+    """
+
+    def __init__(self, rows, features, weights):
+        order = np.argsort(features, kind="stable")
+        self.rows, self.feature_of, self.weights = rows[order], features[order], weights[order]
+        # Each pair lists a feature once, so the run length of a feature is its document frequency
+        self.features, starts, self.document_frequency = np.unique(
+            self.feature_of, return_index=True, return_counts=True
+        )
+        self.offsets = np.append(starts, len(self.feature_of)).astype(np.int64)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.float32))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, features):
+        """Positions of features in this segment and which of them it has"""
+        if not len(self.features):
+            return np.zeros(len(features), np.int64), np.zeros(len(features), bool)
+        positions = np.searchsorted(self.features, features)
+        positions[positions == len(self.features)] = 0
+        return positions, self.features[positions] == features
+
+    def frequencies(self, features):
+        positions, known = self.lookup(features)
+        if not len(self.features):
+            return np.zeros(len(features), np.int64)
+        return np.where(known, self.document_frequency[positions], 0)
+
+    def postings(self, features, coefficients):
+        """Rows and weighted scores of every posting of features"""
+        positions, known = self.lookup(features)
+        positions, coefficients = positions[known], coefficients[known]
+        starts = self.offsets[positions]
+        lengths = self.offsets[positions + 1] - starts
+        postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return self.rows[postings], self.weights[postings] * np.repeat(coefficients, lengths)
+
+
+class _Delta:
+    """Pairs taught since the last merge, as Python lists per feature
+
+    Adding a pair is a handful of dict appends; searching walks only the
+    query's features, which is cheap while the delta stays small.
+    """
+
+    def __init__(self):
+        self.postings = {}  # feature -> ([rows], [weights])
+        self.pairs = []  # [(row, feature ids, weights)] for the merge
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def add(self, row, features, weights):
+        self.pairs.append((row, features, weights))
+        for feature, weight in zip(features.tolist(), weights.tolist()):
+            posting = self.postings.get(feature)
+            if posting is None:
+                posting = self.postings[feature] = ([], [])
+            posting[0].append(row)
+            posting[1].append(weight)
+
+    def frequencies(self, features):
+        return np.fromiter(
+            (len(self.postings[f][0]) if f in self.postings else 0 for f in features.tolist()),
+            np.int64, len(features),
+        )
+
+    def postings_of(self, features, coefficients):
+        rows, scores = [], []
+        for feature, coefficient in zip(features.tolist(), coefficients.tolist()):
+            posting = self.postings.get(feature)
+            if posting is not None:
+                rows.extend(posting[0])
+                scores.extend(weight * coefficient for weight in posting[1])
+        return np.array(rows, np.int64), np.array(scores, np.float64)
+
+
+class ResponseIndex:
+    """TF-IDF retrieval over taught (input, response) pairs
+
+    Inputs are turned into hashed word and trigram features. Merged pairs
+    live in a main segment: an inverted list per feature stored as flat
+    NumPy arrays, so scoring a message against every pair is one gather and
+    one weighted bincount - a sparse matrix-vector product - followed by
+    argpartition for the top k. Confidence is the cosine similarity, between
+    0 and 1.
+
+    Newly taught pairs go into a small delta segment that is searched along
+    with the main one, so teaching costs microseconds instead of a rebuild.
+    Once the delta holds MERGE_THRESHOLD pairs (or on merge()) it is folded
+    into a new main segment on a background thread while searches carry on
+    against the old one. Document frequencies are summed over the segments
+    at query time; each pair's vector length uses the IDF of when it was
+    added and is refreshed by the next merge. Teaching an input that already
+    exists replaces its response in place.
+    """
+
+    def __init__(self, merge_threshold=MERGE_THRESHOLD):
+        self.merge_threshold = merge_threshold
+        self.inputs = []
+        self.responses = []
+        self.rows_by_input = {}  # normalized input -> row
+        self._main = _Segment.empty()
+        self._delta = _Delta()
+        self._merging = None  # delta being folded into the main segment
+        self._merge_thread = None
+        self._norms = np.ones(1024, np.float64)  # TF-IDF vector length of each row
+        self._lock = threading.Lock()
+        self.merges = 0
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def _segments(self):
+        with self._lock:
+            deltas = [self._delta] if self._merging is None else [self._merging, self._delta]
+            return self._main, deltas, len(self.inputs)
+
+    @staticmethod
+    def _idf(document_frequency, total):
+        return np.log((1 + total) / (1 + document_frequency)) + 1
+
+    def _frequencies(self, features, main, deltas):
+        frequency = main.frequencies(features)
+        for delta in deltas:
+            frequency = frequency + delta.frequencies(features)
+        return frequency
+
+    @staticmethod
+    def _pair_features(input_text):
+        features = text_features(input_text)
+        return (
+            np.fromiter(features.keys(), np.int64, len(features)),
+            (1 + np.log(np.fromiter(features.values(), np.float64, len(features)))).astype(np.float32),
+        )
+
+    def _new_row(self, key, input_text, response):
+        row = len(self.inputs)
+        self.rows_by_input[key] = row
+        self.inputs.append(input_text)
+        self.responses.append(response)
+        if row >= len(self._norms):
+            self._norms = np.concatenate([self._norms, np.ones(len(self._norms), np.float64)])
+        return row
+
+    def add(self, input_text, response):
+        """Teach a pair; returns False if the input has no words to index"""
+        key = normalize_input(input_text)
+        if not key:
+            return False
+        row = self.rows_by_input.get(key)
+        if row is not None:
+            self.responses[row] = response
+            return True
+
+        features, weights = self._pair_features(input_text)
+        with self._lock:
+            row = self._new_row(key, input_text, response)
+            self._delta.add(row, features, weights)
+            deltas = [self._delta] if self._merging is None else [self._merging, self._delta]
+            frequency = self._frequencies(features, self._main, deltas)
+            vector = weights * self._idf(frequency, len(self.inputs))
+            self._norms[row] = np.sqrt(np.dot(vector, vector))
+            start_merge = len(self._delta) >= self.merge_threshold and self._merging is None
+        if start_merge:
+            self._merge_thread = threading.Thread(target=self._merge, name="response-index-merge", daemon=True)
+            self._merge_thread.start()
+        return True
+
+    def add_many(self, pairs):
+        """Teach many (input, response) pairs at once; returns how many were indexed
+
+        Meant for loading and bulk imports: new pairs skip the delta and the
+        main segment is rebuilt once, before this returns.
+        """
+        added = []
+        indexed = 0
+        with self._lock:
+            for input_text, response in pairs:
+                key = normalize_input(input_text)
+                if not key:
+                    continue
+                indexed += 1
+                row = self.rows_by_input.get(key)
+                if row is not None:
+                    self.responses[row] = response
+                    continue
+                features, weights = self._pair_features(input_text)
+                added.append((self._new_row(key, input_text, response), features, weights))
+        if added:
+            self.merge(extra=added)
+        return indexed
+
+    def merge(self, extra=()):
+        """Fold the delta into the main segment now, waiting for any background merge"""
+        while True:
+            thread = self._merge_thread
+            if thread is not None:
+                thread.join()
+            if self._merge(extra):
+                return
+
+    # Kept for callers that rebuilt the index explicitly
+    build = merge
+
+    def _merge(self, extra=()):
+        """Returns False without merging if another merge is running"""
+        with self._lock:
+            if self._merging is not None:
+                return False
+            merging, self._delta = self._delta, _Delta()
+            self._merging = merging
+            main = self._main
+        try:
+            pairs = merging.pairs + list(extra)
+            if pairs:
+                main = _Segment(
+                    np.concatenate([main.rows] + [np.full(len(f), row, np.int32) for row, f, _ in pairs]),
+                    np.concatenate([main.feature_of] + [f for _, f, _ in pairs]),
+                    np.concatenate([main.weights] + [w for _, _, w in pairs]),
+                )
+            # Refresh every merged pair's vector length with the current IDF
+            total = len(self.inputs)
+            idf = np.repeat(self._idf(main.document_frequency, total), np.diff(main.offsets))
+            vectors = main.weights * idf
+            norms = np.sqrt(np.bincount(main.rows, weights=vectors * vectors))
+            merged = np.flatnonzero(norms)
+        except Exception:
+            with self._lock:
+                # Nothing is lost: the pairs go back into the delta
+                for row, features, weights in merging.pairs + list(extra):
+                    self._delta.add(row, features, weights)
+                self._merging = None
+            logger.exception("Merging the response index failed")
+            return True
+        with self._lock:
+            self._main = main
+            self._merging = None
+            self._norms[merged] = norms[merged]
+            self.merges += 1
+        logger.debug(f"Merged {len(pairs)} pairs into the response index ({len(main)} postings)")
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pairs": len(self.inputs),
+                "delta_pairs": len(self._delta) + (len(self._merging) if self._merging is not None else 0),
+                "merges": self.merges,
+            }
+
+    def search(self, text, k=5):
+        """The k best pairs for text as [(score, row), ...], best first"""
+        query = text_features(text)
+        main, deltas, total = self._segments()
+        if not query or not total:
+            return []
+
+        query_features = np.fromiter(query.keys(), np.int64, len(query))
+        query_counts = np.fromiter(query.values(), np.float64, len(query))
+        # Features no pair has still count toward the query's length
+        idf = self._idf(self._frequencies(query_features, main, deltas), total)
+        query_weights = (1 + np.log(query_counts)) * idf
+        query_weights /= np.sqrt(np.dot(query_weights, query_weights))
+        coefficients = query_weights * idf
+
+        # Gather every posting of the query's features in all segments and score them in one pass
+        rows, scores = main.postings(query_features, coefficients)
+        for delta in deltas:
+            delta_rows, delta_scores = delta.postings_of(query_features, coefficients)
+            if len(delta_rows):
+                rows = np.concatenate([rows, delta_rows])
+                scores = np.concatenate([scores, delta_scores])
+        if not len(rows):
+            return []
+        scores = np.bincount(rows, weights=scores)
+        scores /= self._norms[:len(scores)]
+
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(min(1.0, float(scores[row])), int(row)) for row in best if scores[row] > 0]
+
+    def find_response(self, text):
+        """Best response and its confidence, or (None, 0.0)"""
+        results = self.search(text, k=1)
+        if not results:
+            return None, 0.0
+        score, row = results[0]
+        return self.responses[row], score
@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import itertools
+import time
+import logging
+
+import timer_metrics
+
+logger = logging.getLogger("discord_bot.scheduler")
+
+
+class DeadlineScheduler:
+    """Single task that sleeps until the earliest deadline in a min-heap and fires it
+
+    Deadlines are UTC epoch seconds. Scheduling is O(log n); cancelling marks
+    the heap entry dead in O(1) and it is discarded when it reaches the top,
+    with a rebuild once dead entries outnumber live ones.
+    """
+
+    def __init__(self, name="scheduler"):
+        self.name = name
+        self.heap = []  # [when, seq, key, callback, args, alive]
+        self.entries = {}  # key -> heap entry
+        self._seq = itertools.count()
+        self._dead = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._firing = set()  # running callbacks, referenced until they finish
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def schedule(self, key, when, callback, *args):
+        """Run `await callback(*args)` at epoch time `when`, replacing any deadline under key"""
+        self.cancel(key)
+        entry = [when, next(self._seq), key, callback, args, True]
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+        # Only an earlier head changes how long the loop should sleep
+        if self.heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        """Drop the deadline under key; returns False if there was none"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[5] = False
+        self._dead += 1
+        if self._dead > len(self.entries):
+            self._compact()
+        return True
+
+    def next_deadline(self):
+        """Epoch time of the earliest live deadline, or None"""
+        self._drop_dead_head()
+        return self.heap[0][0] if self.heap else None
+
+    def _compact(self):
+        self.heap = [entry for entry in self.heap if entry[5]]
+        heapq.heapify(self.heap)
+        self._dead = 0
+
+    def _drop_dead_head(self):
+        while self.heap and not self.heap[0][5]:
+            heapq.heappop(self.heap)
+            self._dead -= 1
+
+    def _pop_due(self, now):
+        due = []
+        self._drop_dead_head()
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            del self.entries[entry[2]]
+            due.append(entry)
+            self._drop_dead_head()
+        return due
+
+    async def _fire(self, when, key, callback, args):
+        timer_metrics.record(timer_metrics.timer_kind(key, self.name), "fire", time.time() - when)
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.error(f"Error firing {self.name} deadline {key}: {e}")
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            for when, _, key, callback, args, _ in self._pop_due(time.time()):
+                # Each callback runs on its own so a slow one never delays the next deadline
+                task = asyncio.create_task(self._fire(when, key, callback, args))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger("discord_bot.sqlite_journal")
+
+
+async def enable_journal(db):
+    """Switch a connection to append-only write-ahead journaling
+
+    Every commit appends to the -wal file and is fsynced before returning,
+    so an acknowledged command survives a crash. Automatic checkpoints are
+    disabled; JournalCompactor folds the journal into the database instead.
+    Opening the database replays any journal left behind by a crash.
+    """
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA synchronous=FULL")
+    await db.execute("PRAGMA wal_autocheckpoint=0")
+
+
+class JournalCompactor:
+    """Background task that periodically checkpoints a connection's journal"""
+
+    def __init__(self, db, path, interval=300, max_bytes=4 * 1024 * 1024, name="journal"):
+        self.db = db
+        self.journal_path = f"{path}-wal"
+        self.interval = interval  # seconds between compactions
+        self.max_bytes = max_bytes  # journal size that triggers an early compaction
+        self.name = name
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and compact one last time"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.compact()
+
+    def journal_size(self):
+        """Return the size in bytes of the journal waiting to be compacted"""
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    async def compact(self):
+        """Copy the journal into the database file and truncate it"""
+        try:
+            async with self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)") as cursor:
+                busy, _, checkpointed = await cursor.fetchone()
+            if busy:
+                logger.warning(f"{self.name}: compaction skipped, database busy")
+            else:
+                logger.debug(f"{self.name}: compacted {checkpointed} journal pages")
+        except Exception as e:
+            logger.error(f"{self.name}: error compacting journal: {e}")
+
+    async def _run(self):
+        # Check the journal size more often than the full interval so bursts compact early
+        check_every = min(self.interval, 30)
+        waited = 0
+        while True:
+            await asyncio.sleep(check_every)
+            waited += check_every
+            if waited >= self.interval or self.journal_size() >= self.max_bytes:
+                await self.compact()
+                waited = 0
@@ -7,17 +7,28 @@ from datetime import datetime, timedelta
 import random
 import asyncio
 import time
+import itertools
 import pytz
-import pickle
 import re
 from typing import Dict, List, Tuple, Optional, Union
 from flask import Flask
 from threading import Thread
 from keep_alive import keep_alive
-from training_pipeline import TrainingPipeline
 import traceback
 import sys
 from robust_commands import inject_robust_command_handling
+from state_store import StateStore, Namespace
+from timing_wheel import TimingWheel
+from notification_batcher import NotificationBatcher
+from recurrence import parse_recurrence, first_occurrence, next_occurrence, describe
+from storage_backends import create_backend
+from startup import StartupPipeline, load_cogs
+from persistence import save_json
+from response_index import normalize_input
+from pipeline_pool import PipelinePool
+from response_cache import ResponseCache
+from chat_ingest import ChatIngestor
+import timer_metrics
 
 # Define allowed channel ID (GLOBAL CONSTANT)
 ALLOWED_CHANNEL_ID = 1353429400460198032  # The specific channel where Aarohi should respond
@@ -40,8 +51,16 @@ print("\nThis version of Aarohi has a completely overhauled command system.")
 print("All commands work independently and produce clean output.\n")
 print(f"BOT RESTRICTED TO CHANNEL ID: {ALLOWED_CHANNEL_ID}")
 
-# Initialize training pipeline
-training_pipeline = TrainingPipeline()
+# Taught pairs are answered from an indexed copy; the pipeline only handles what the index cannot
+RESPONSE_PAIRS_PATH = "data/response_pairs"  # response_pairs.db with the default SQLite backend
+RESPONSE_CONFIDENCE = 0.5  # minimum confidence before the bot replies to a chat message
+MATCH_TIMEOUT = 2.0  # seconds a message waits for the pipeline worker before going unanswered
+PIPELINE_FALLBACK = False  # also run the pipeline's linear search when the index has no confident answer
+# Repeated short messages ("hi", "gm", "thanks") are answered without a worker round trip
+response_cache = ResponseCache(capacity=2048, ttl=300)
+# Chat exports dropped here are read once each; the manifest records how far every file was read
+CHAT_EXPORTS_FOLDER = "chat_exports"
+CHAT_INGEST_MANIFEST = "data/chat_ingest_manifest.json"
 
 # Initialize bot with intents
 intents = discord.Intents.default()
@@ -53,13 +72,82 @@ try:
     with open('config.json', 'r') as f:
         config = json.load(f)
     prefix = config.get('prefix', '!')  # Use '!' as fallback
+    storage_config = config.get('storage', {})  # Backend per store, see storage_backends.py
 except:
     # If config loading fails, use default prefix
     prefix = '!'
+    storage_config = {}
     print("Warning: Couldn't load config.json, using default prefix '!'")
 
+class AarohiBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.startup = StartupPipeline("aarohi_bot")
+        # Which storage backend each store uses; cogs read this when they are created
+        self.storage_config = storage_config
+    
+    async def setup_hook(self):
+        # Runs once per process, before the first gateway connection.
+        # on_ready fires again on every reconnect, so nothing here may live there.
+        self.start_time = datetime.utcnow()
+        
+        # Open the state store (imports the legacy pickle files on first run)
+        await self.startup.phase("state store", state_store.open())
+        await self.startup.concurrently("state", {
+            "timezones": load_timezones(),
+            "sound_prefs": load_sound_prefs(),
+            "points": load_points(),
+            "alarms": load_alarms(),
+            "pomodoros": load_pomodoros(),
+            "leaderboards": load_leaderboards(),
+        })
+        # Sessions that ended while the bot was down are completed in one batch
+        await self.startup.phase("pomodoro catch-up", catch_up_pomodoros())
+        # The training pipeline and response index run in a worker process
+        await self.startup.phase("pipeline worker", training_pipeline.start())
+        
+        # Attempt to load cogs - with error handling to avoid issues
+        print("\nLoading cogs...")
+        results = await load_cogs(self, self.startup)
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                print(f"❌ Failed to load extension {name}.py: {result}")
+            else:
+                print(f"✅ Loaded extension: {name}.py")
+        
+        # Background schedulers; they wait for the gateway before sending anything
+        async def start_schedulers():
+            timers.start()
+            # Each guild's leaderboard is its own job; any that came due while offline only reset
+            await catch_up_leaderboards()
+            for guild_id in leaderboard_settings:
+                schedule_leaderboard(guild_id)
+            for user_id, session in active_pomodoros.items():
+                timers.schedule(("pomodoro", user_id), session["end"], complete_pomodoro, user_id)
+            for user_id in scheduled_alarms:
+                for alarm in scheduled_alarms[user_id]:
+                    schedule_alarm(user_id, alarm)
+            await chat_ingestor.start()
+            asyncio.create_task(export_timer_metrics())
+        await self.startup.phase("schedulers", start_schedulers())
+        
+        self.startup.mark_ready()
+    
+    async def close(self):
+        # Deliver notifications still waiting for their batch window
+        await notifier.close()
+        await chat_ingestor.close()
+        await super().close()
+        await timers.stop()
+        # Release the state store so its worker thread does not keep the process alive
+        await state_store.close()
+        await training_pipeline.close()
+        await response_store.close()
+
 # Create bot with COMPLETELY DISABLED help command (we'll implement our own)
-bot = commands.Bot(command_prefix=prefix, intents=intents, help_command=None)
+bot = AarohiBot(command_prefix=prefix, intents=intents, help_command=None)
+# Timer notifications that come due together are sent as one message per channel
+notifier = NotificationBatcher(bot)
 # Inject bulletproof command handling
 error_handler = inject_robust_command_handling(bot)
 logger.info("Bulletproof command handling activated")
@@ -69,18 +157,24 @@ logger.info("Bulletproof command handling activated")
 print(f"Bot initialized with command prefix: '{prefix}'")
 
 # Global storage for scheduled alarms - persistent across restarts
-# Format: {user_id: [(channel_id, datetime_obj, message), ...]}
+# Format: {user_id: [{"id": int, "channel_id": int, "time": datetime_obj, "fire_at": UTC epoch, "message": str, "repeat": rule or None}, ...]}
+# "fire_at" is what the scheduler uses; "time" keeps the user's zone for display only
+# A recurring alarm keeps only its rule and next ring time; see recurrence.py
+# The *.pkl files are the legacy storage, imported once into the state store
 ALARMS_FILE = "alarms_data.pkl"
 TIMEZONES_FILE = "user_timezones.pkl"
 POINTS_FILE = "user_points.pkl"
-scheduled_alarms: Dict[int, List[Tuple[int, datetime, str]]] = {}
-alarm_tasks = {}  # Store tasks by user_id for management
+scheduled_alarms: Dict[int, List[Dict]] = {}
+timers = TimingWheel("timers")  # One timing wheel of alarm and pomodoro deadlines shared by every user
+alarm_ids = itertools.count(1)  # Scheduler keys; only need to be unique within this process
 user_timezones: Dict[int, str] = {}  # Store user timezone info
+tz_cache: Dict[int, object] = {}  # user_id -> pytz timezone, rebuilt when a user's zone changes
 
 # Global storage for productivity points
-# Format: {user_id: {"points": int, "daily_sessions": [(duration, timestamp), ...], "last_reset": datetime}}
+# Format: {user_id: {"points": int, "daily_sessions": [(duration, timestamp), ...], "last_reset": datetime, "guild_id": int or None}}
+# A user's points count toward the leaderboard of the guild they last finished a session in
 user_points: Dict[int, Dict] = {}
-points_task = None  # Task for the daily leaderboard generation and reset
+guild_members: Dict[int, set] = {}  # guild_id -> users whose points count toward that guild
 
 # Sound notification options
 SOUND_EFFECTS = {
@@ -95,9 +189,18 @@ SOUND_EFFECTS = {
 # User sound preferences - Format: {user_id: sound_name}
 user_sound_prefs: Dict[int, str] = {}
 SOUND_PREFS_FILE = "sound_prefs.pkl"
+STATE_STORE_PATH = "aarohi_state"  # aarohi_state.db with the default SQLite backend
+response_store = create_backend(storage_config, "responses", RESPONSE_PAIRS_PATH)
+
+# Per-guild daily leaderboard - Format: {guild_id: {"channel_id": int, "time": "HH:MM", "timezone": str}}
+# Each guild has its own job on the shared timing wheel, posted at its own local time
+leaderboard_settings: Dict[int, Dict] = {}
+DEFAULT_LEADERBOARD_TIME = "23:00"
 
-# Global variable to store which channel to send the leaderboard to
-leaderboard_channel_id = None
+# Timer lag histograms are exported here for dashboards; alarms should be delivered within the SLO
+TIMER_METRICS_FILE = "data/timer_metrics.json"
+TIMER_METRICS_INTERVAL = 60  # seconds between exports
+ALARM_SLO_SECONDS = 2.0
 
 # Time zone for the bot (using UTC as default)
 BOT_TIMEZONE = pytz.timezone('UTC')
@@ -132,433 +235,496 @@ TIMEZONE_ALIASES = {
     "spain": "Europe/Madrid"
 }
 
-# Global storage for active pomodoro sessions
-# Format: {user_id: (channel_id, end_time, task_obj)}
-active_pomodoros = {}
+# Global storage for active pomodoro sessions - persistent across restarts
+# Format: {user_id: {"channel_id": int, "end": UTC epoch seconds, "minutes": int}}
+active_pomodoros: Dict[int, Dict] = {}
 
-# Load saved user timezones if available
-def load_timezones():
-    global user_timezones
+# --- Persistent state ---
+# All five maps live in one state store; every save writes only the key that changed.
+
+def _encode_alarms(alarms):
+    return [
+        {"channel_id": alarm["channel_id"], "time": alarm["time"].isoformat(), "fire_at": alarm["fire_at"],
+         "message": alarm["message"], "repeat": alarm["repeat"]}
+        for alarm in alarms
+    ]
+
+def _decode_alarms(rows):
+    alarms = []
+    for row in rows:
+        # Older entries were stored as [channel_id, time, message]
+        if isinstance(row, list):
+            row = {"channel_id": row[0], "time": row[1], "message": row[2]}
+        alarm = new_alarm(row["channel_id"], datetime.fromisoformat(row["time"]), row["message"], row.get("repeat"))
+        # Older entries have no fire_at; naive ones get it once timezones are loaded
+        alarm["fire_at"] = row.get("fire_at", alarm["fire_at"])
+        alarms.append(alarm)
+    return alarms
+
+# alarms_data.pkl holds (channel_id, time, message) tuples
+def _legacy_alarms(alarms):
+    return [alarm if isinstance(alarm, dict) else new_alarm(*alarm) for alarm in alarms]
+
+def _encode_points(record):
+    return {
+        "points": record["points"],
+        "daily_sessions": [[minutes, timestamp.isoformat()] for minutes, timestamp in record["daily_sessions"]],
+        "last_reset": record["last_reset"].isoformat(),
+        "guild_id": record.get("guild_id")
+    }
+
+def _decode_points(record):
+    return {
+        "points": record["points"],
+        "daily_sessions": [(minutes, datetime.fromisoformat(timestamp)) for minutes, timestamp in record["daily_sessions"]],
+        "last_reset": datetime.fromisoformat(record["last_reset"]),
+        "guild_id": record.get("guild_id")
+    }
+
+state_store = StateStore(create_backend(storage_config, "state", STATE_STORE_PATH), [
+    Namespace("alarms", _encode_alarms, _decode_alarms, legacy_file=ALARMS_FILE, legacy=_legacy_alarms),
+    Namespace("timezones", legacy_file=TIMEZONES_FILE),
+    Namespace("points", _encode_points, _decode_points, legacy_file=POINTS_FILE),
+    Namespace("sound_prefs", legacy_file=SOUND_PREFS_FILE),
+    Namespace("pomodoros"),
+    Namespace("leaderboards"),
+])
+
+# Write (or remove) a single entry of one of the in-memory maps
+async def save_state_key(namespace: str, data: Dict, user_id: int) -> bool:
     try:
-        if os.path.exists(TIMEZONES_FILE):
-            with open(TIMEZONES_FILE, 'rb') as f:
-                user_timezones = pickle.load(f)
-            logger.info(f"Loaded {len(user_timezones)} user timezones from storage")
-            return True
+        if user_id in data:
+            await state_store.put(namespace, user_id, data[user_id])
         else:
-            user_timezones = {}
-            logger.info("No saved user timezones found, starting fresh")
-            return False
+            await state_store.delete(namespace, user_id)
+        return True
     except Exception as e:
-        logger.error(f"Error loading user timezones: {e}")
-        user_timezones = {}
+        logger.error(f"Error saving {namespace} for user {user_id}: {e}")
         return False
 
-# Save user timezones to file
-def save_timezones():
+# Load saved user timezones if available
+async def load_timezones():
+    global user_timezones
     try:
-        with open(TIMEZONES_FILE, 'wb') as f:
-            pickle.dump(user_timezones, f)
-        logger.info(f"Saved {len(user_timezones)} user timezones to storage")
-        return True
+        user_timezones = await state_store.load("timezones")
+        tz_cache.clear()
+        logger.info(f"Loaded {len(user_timezones)} user timezones from storage")
+        return bool(user_timezones)
     except Exception as e:
-        logger.error(f"Error saving user timezones: {e}")
+        logger.error(f"Error loading user timezones: {e}")
+        user_timezones = {}
         return False
 
+# Save one user's timezone
+async def save_timezone(user_id: int) -> bool:
+    return await save_state_key("timezones", user_timezones, user_id)
+
+# Get a user's timezone object from the cache, or None if unset or invalid
+def get_user_tz(user_id: int):
+    user_tz = tz_cache.get(user_id)
+    if user_tz is None and user_id in user_timezones:
+        try:
+            user_tz = tz_cache[user_id] = pytz.timezone(user_timezones[user_id])
+        except Exception as e:
+            logger.error(f"Invalid timezone for user {user_id}: {user_timezones[user_id]} - {e}")
+    return user_tz
+
+# Change a user's timezone and rebuild their cache entry
+async def set_user_timezone(user_id: int, timezone_name: str) -> bool:
+    user_timezones[user_id] = timezone_name
+    tz_cache.pop(user_id, None)
+    get_user_tz(user_id)
+    return await save_timezone(user_id)
+
 # Load saved user points if available
-def load_points():
+async def load_points():
     global user_points
     try:
-        if os.path.exists(POINTS_FILE):
-            with open(POINTS_FILE, 'rb') as f:
-                user_points = pickle.load(f)
-            logger.info(f"Loaded {len(user_points)} user point records from storage")
-            return True
-        else:
-            user_points = {}
-            logger.info("No saved user points found, starting fresh")
-            return False
+        user_points = await state_store.load("points")
+        guild_members.clear()
+        for user_id, record in user_points.items():
+            if record.get("guild_id") is not None:
+                guild_members.setdefault(record["guild_id"], set()).add(user_id)
+        logger.info(f"Loaded {len(user_points)} user point records from storage")
+        return bool(user_points)
     except Exception as e:
         logger.error(f"Error loading user points: {e}")
         user_points = {}
         return False
 
-# Save user points to file
-def save_points():
-    try:
-        with open(POINTS_FILE, 'wb') as f:
-            pickle.dump(user_points, f)
-        logger.info(f"Saved {len(user_points)} user point records to storage")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving user points: {e}")
-        return False
+# Save one user's points record
+async def save_user_points(user_id: int) -> bool:
+    return await save_state_key("points", user_points, user_id)
 
 # Load saved sound preferences if available
-def load_sound_prefs():
+async def load_sound_prefs():
     global user_sound_prefs
     try:
-        if os.path.exists(SOUND_PREFS_FILE):
-            with open(SOUND_PREFS_FILE, 'rb') as f:
-                user_sound_prefs = pickle.load(f)
-            logger.info(f"Loaded {len(user_sound_prefs)} user sound preferences from storage")
-            return True
-        else:
-            user_sound_prefs = {}
-            logger.info("No saved sound preferences found, starting fresh")
-            return False
+        user_sound_prefs = await state_store.load("sound_prefs")
+        logger.info(f"Loaded {len(user_sound_prefs)} user sound preferences from storage")
+        return bool(user_sound_prefs)
     except Exception as e:
         logger.error(f"Error loading sound preferences: {e}")
         user_sound_prefs = {}
         return False
 
-# Save sound preferences to file
-def save_sound_prefs():
-    try:
-        with open(SOUND_PREFS_FILE, 'wb') as f:
-            pickle.dump(user_sound_prefs, f)
-        logger.info(f"Saved {len(user_sound_prefs)} user sound preferences to storage")
-        return True
-    except Exception as e:
-        logger.error(f"Error saving sound preferences: {e}")
-        return False
+# Save one user's sound preference
+async def save_sound_pref(user_id: int) -> bool:
+    return await save_state_key("sound_prefs", user_sound_prefs, user_id)
 
 # Get a user's preferred sound effect, defaulting to "default" if not set
 def get_user_sound(user_id):
     sound_name = user_sound_prefs.get(user_id, "default")
     return SOUND_EFFECTS.get(sound_name, SOUND_EFFECTS["default"])
 
-# Award points for completed Pomodoro session
-def award_points(user_id, minutes):
+# Add a completed session to a user's in-memory points record
+def credit_points(user_id, minutes, completed_at=None, guild_id=None):
+    now = completed_at or datetime.now()
+    # Initialize user's points record if it doesn't exist; last_reset is set below
+    if user_id not in user_points:
+        user_points[user_id] = {
+            "points": 0,
+            "daily_sessions": [],
+            "last_reset": None,
+            "guild_id": None
+        }
+    record = user_points[user_id]
+    
+    # The user now counts toward the leaderboard of the guild this session was in
+    if guild_id is not None and record.get("guild_id") != guild_id:
+        guild_members.get(record.get("guild_id"), set()).discard(user_id)
+        guild_members.setdefault(guild_id, set()).add(user_id)
+        record["guild_id"] = guild_id
+    
+    # The leaderboard window the session finished in starts at the post before it. Anchoring
+    # to that rather than the wall clock lets catch_up_leaderboards reset a session that
+    # finished offline before the latest post.
+    last_post, _ = leaderboard_window(record.get("guild_id"), now.astimezone(pytz.UTC))
+    window_start = datetime.fromtimestamp(last_post.timestamp())
+    if record["last_reset"] is None:
+        record["last_reset"] = window_start
+    elif record["last_reset"].timestamp() < last_post.timestamp():
+        # Reset if the guild's leaderboard was posted since the last reset (e.g. while offline)
+        record["points"] = 0
+        record["daily_sessions"] = []
+        record["last_reset"] = window_start
+    
+    # Award points (1 point per minute)
+    points_earned = minutes
+    record["points"] += points_earned
+    
+    # Record the session
+    record["daily_sessions"].append((minutes, now))
+    return points_earned, record["points"]
+
+# Load saved per-guild leaderboard settings
+async def load_leaderboards():
+    global leaderboard_settings
     try:
-        # Initialize user's points record if it doesn't exist
-        if user_id not in user_points:
-            user_points[user_id] = {
-                "points": 0,
-                "daily_sessions": [],
-                "last_reset": datetime.now()
-            }
-        
-        # Check if we need to reset (if it's a new day)
-        now = datetime.now()
-        last_reset = user_points[user_id]["last_reset"]
-        if now.date() > last_reset.date():
-            # It's a new day, reset the points but keep track of the time
-            user_points[user_id]["points"] = 0
-            user_points[user_id]["daily_sessions"] = []
-            user_points[user_id]["last_reset"] = now
-        
-        # Award points (1 point per minute)
-        points_earned = minutes
-        user_points[user_id]["points"] += points_earned
-        
-        # Record the session
-        user_points[user_id]["daily_sessions"].append((minutes, now))
-        
-        # Save the updated points
-        save_points()
-        
-        logger.info(f"Awarded {points_earned} points to user {user_id} for a {minutes}-minute session")
-        return points_earned, user_points[user_id]["points"]
-    
+        leaderboard_settings = await state_store.load("leaderboards")
+        logger.info(f"Loaded leaderboard settings for {len(leaderboard_settings)} guilds from storage")
+        return bool(leaderboard_settings)
     except Exception as e:
-        logger.error(f"Error awarding points to user {user_id}: {e}")
-        return 0, 0
+        logger.error(f"Error loading leaderboard settings: {e}")
+        leaderboard_settings = {}
+        return False
+
+# Local post time and timezone of a guild's leaderboard (11 PM UTC unless configured)
+def leaderboard_clock(guild_id):
+    settings = leaderboard_settings.get(guild_id, {})
+    hour, minute = (int(part) for part in settings.get("time", DEFAULT_LEADERBOARD_TIME).split(":"))
+    try:
+        tz = pytz.timezone(settings.get("timezone", BOT_TIMEZONE.zone))
+    except Exception:
+        tz = BOT_TIMEZONE
+    return hour, minute, tz
+
+# The guild's most recent leaderboard post at or before `now` and the next one after it
+def leaderboard_window(guild_id, now=None):
+    hour, minute, tz = leaderboard_clock(guild_id)
+    local = (now or datetime.now(pytz.UTC)).astimezone(tz).replace(tzinfo=None)
+    post = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if post > local:
+        post -= timedelta(days=1)
+    # Localized separately so a DST change between the two days is respected
+    return tz.localize(post), tz.localize(post + timedelta(days=1))
+
+# Put a guild's next leaderboard post on the shared timing wheel
+def schedule_leaderboard(guild_id):
+    _, next_post = leaderboard_window(guild_id)
+    timers.schedule(("leaderboard", guild_id), next_post.timestamp(), post_leaderboard, guild_id)
+    logger.info(f"Scheduled leaderboard for guild {guild_id} at {next_post.strftime('%Y-%m-%d %H:%M %Z')}")
+
+# Give a guild a leaderboard job the first time one of its members earns points
+async def ensure_leaderboard(guild_id, channel_id):
+    if guild_id is None or guild_id in leaderboard_settings:
+        return
+    leaderboard_settings[guild_id] = {"channel_id": channel_id, "time": DEFAULT_LEADERBOARD_TIME, "timezone": BOT_TIMEZONE.zone}
+    await save_state_key("leaderboards", leaderboard_settings, guild_id)
+    schedule_leaderboard(guild_id)
+
+# Timer callback: post a guild's leaderboard and schedule the next one
+async def post_leaderboard(guild_id):
+    try:
+        await generate_leaderboard(guild_id)
+    finally:
+        if guild_id in leaderboard_settings:
+            schedule_leaderboard(guild_id)
+
+# Reset the given users' daily points in one write
+async def reset_points(user_ids, reset_day=None):
+    reset_day = reset_day or datetime.now()
+    for user_id in user_ids:
+        user_points[user_id]["points"] = 0
+        user_points[user_id]["daily_sessions"] = []
+        user_points[user_id]["last_reset"] = reset_day
+    if user_ids:
+        await state_store.put_many("points", {user_id: user_points[user_id] for user_id in user_ids})
+
+# Reset points of users whose guild's leaderboard came due while the bot was offline
+async def catch_up_leaderboards():
+    stale = []
+    for guild_id, members in guild_members.items():
+        last_post, _ = leaderboard_window(guild_id)
+        stale.extend(
+            user_id for user_id in members
+            if user_points[user_id]["points"] > 0 and user_points[user_id]["last_reset"].timestamp() < last_post.timestamp()
+        )
+    if stale:
+        await reset_points(stale)
+        logger.info(f"Reset points for {len(stale)} users whose leaderboard was due while offline")
+
+# Rank a guild's users by today's points (every user outside a guild)
+def leaderboard_rankings(guild_id=None):
+    user_ids = guild_members.get(guild_id, ()) if guild_id is not None else user_points.keys()
+    leaderboard_data = [
+        (user_id, user_points[user_id]["points"])
+        for user_id in user_ids
+        if user_points[user_id]["points"] > 0  # Only include users who earned points today
+    ]
+    # Sort by points in descending order
+    leaderboard_data.sort(key=lambda x: x[1], reverse=True)
+    return leaderboard_data
 
-# Generate and send daily leaderboard at 11 PM
-async def generate_leaderboard():
+# Generate and send one guild's daily leaderboard, then reset only that guild's users
+async def generate_leaderboard(guild_id):
     try:
-        # Get current date for the leaderboard title
-        today = datetime.now().strftime('%Y-%m-%d')
+        await bot.wait_until_ready()
         
-        # Create a list of (user_id, points) tuples
-        leaderboard_data = []
-        for user_id, data in user_points.items():
-            if data["points"] > 0:  # Only include users who earned points today
-                leaderboard_data.append((user_id, data["points"]))
+        # Current date in the guild's leaderboard timezone for the title
+        _, _, tz = leaderboard_clock(guild_id)
+        today = datetime.now(tz).strftime('%Y-%m-%d')
         
-        # Sort by points in descending order
-        leaderboard_data.sort(key=lambda x: x[1], reverse=True)
+        leaderboard_data = leaderboard_rankings(guild_id)
         
         # If we have no data, just log it and return
         if not leaderboard_data:
-            logger.info("No points data for leaderboard today")
+            logger.info(f"No points data for guild {guild_id} leaderboard today")
             return
         
-        # Find a channel to send the leaderboard to
-        channel = None
-        if leaderboard_channel_id:
-            channel = bot.get_channel(leaderboard_channel_id)
+        # Send to the guild's leaderboard channel
+        channel = bot.get_channel(leaderboard_settings.get(guild_id, {}).get("channel_id"))
         
         if not channel:
             # Try to find an active channel from a user in the leaderboard
             for user_id, _ in leaderboard_data:
                 if user_id in active_pomodoros:
-                    channel_id = active_pomodoros[user_id][0]
+                    channel_id = active_pomodoros[user_id]["channel_id"]
                     channel = bot.get_channel(channel_id)
                     if channel:
                         break
         
-        if not channel:
-            logger.error("Could not find a channel to send the leaderboard to")
-            return
-        
-        # Generate the leaderboard message
-        embed = discord.Embed(
-            title=f"📊 Today's Productivity Leaderboard ({today})",
-            description="Here's how everyone stacked up today with their focus time!",
-            color=discord.Color.gold()
-        )
-        
-        # Format the leaderboard entries
-        leaderboard_text = ""
-        medals = ["🥇", "🥈", "🥉"]
-        
-        for i, (user_id, points) in enumerate(leaderboard_data):
-            # Try to get the user's display name
-            try:
-                user = await bot.fetch_user(user_id)
-                username = user.display_name
-            except:
-                username = f"User {user_id}"
+        if channel:
+            # Generate the leaderboard message
+            embed = discord.Embed(
+                title=f"📊 Today's Productivity Leaderboard ({today})",
+                description="Here's how everyone stacked up today with their focus time!",
+                color=discord.Color.gold()
+            )
             
-            # Add medal for top 3
-            prefix = medals[i] if i < 3 else f"{i+1}."
-            leaderboard_text += f"{prefix} **{username}** - {points} points\n"
+            # Format the leaderboard entries
+            leaderboard_text = ""
+            medals = ["🥇", "🥈", "🥉"]
             
-            # Limit to top 10 users
-            if i >= 9:
-                break
-        
-        embed.add_field(
-            name="Top Performers",
-            value=leaderboard_text or "No study sessions recorded today",
-            inline=False
-        )
-        
-        # Add a motivational message
-        if len(leaderboard_data) > 1:
-            top_points = leaderboard_data[0][1]
-            bottom_points = leaderboard_data[-1][1]
+            for i, (user_id, points) in enumerate(leaderboard_data):
+                # Try to get the user's display name
+                try:
+                    user = await bot.fetch_user(user_id)
+                    username = user.display_name
+                except:
+                    username = f"User {user_id}"
+                
+                # Add medal for top 3
+                prefix = medals[i] if i < 3 else f"{i+1}."
+                leaderboard_text += f"{prefix} **{username}** - {points} points\n"
+                
+                # Limit to top 10 users
+                if i >= 9:
+                    break
             
-            if top_points > bottom_points * 2:  # Top scorer has more than double the points of bottom scorer
-                embed.add_field(
-                    name="💪 Challenge",
-                    value="Wow! Our top performers are crushing it! Everyone else, time to step up your game!",
-                    inline=False
-                )
-            else:
-                embed.add_field(
-                    name="🔥 Great Work",
-                    value="Everyone's doing great! Keep up the momentum tomorrow!",
-                    inline=False
-                )
-        
-        # Send the leaderboard
-        await channel.send(embed=embed)
-        logger.info(f"Sent daily leaderboard to channel {channel.id}")
-        
-        # Reset points for all users after sending the leaderboard
-        reset_day = datetime.now()
-        for user_id in user_points:
-            user_points[user_id]["points"] = 0
-            user_points[user_id]["daily_sessions"] = []
-            user_points[user_id]["last_reset"] = reset_day
+            embed.add_field(
+                name="Top Performers",
+                value=leaderboard_text or "No study sessions recorded today",
+                inline=False
+            )
+            
+            # Add a motivational message
+            if len(leaderboard_data) > 1:
+                top_points = leaderboard_data[0][1]
+                bottom_points = leaderboard_data[-1][1]
+                
+                if top_points > bottom_points * 2:  # Top scorer has more than double the points of bottom scorer
+                    embed.add_field(
+                        name="💪 Challenge",
+                        value="Wow! Our top performers are crushing it! Everyone else, time to step up your game!",
+                        inline=False
+                    )
+                else:
+                    embed.add_field(
+                        name="🔥 Great Work",
+                        value="Everyone's doing great! Keep up the momentum tomorrow!",
+                        inline=False
+                    )
+            
+            # Send the leaderboard
+            await channel.send(embed=embed)
+            logger.info(f"Sent daily leaderboard for guild {guild_id} to channel {channel.id}")
+        else:
+            logger.error(f"Could not find a channel to send the guild {guild_id} leaderboard to")
         
-        save_points()
-        logger.info("Reset all user points after leaderboard")
+        # The day is over for this guild either way; other guilds keep their points
+        await reset_points([user_id for user_id, _ in leaderboard_data])
+        logger.info(f"Reset points for {len(leaderboard_data)} users in guild {guild_id} after leaderboard")
         
     except Exception as e:
-        logger.error(f"Error generating leaderboard: {e}")
-
-# Schedule the daily leaderboard task
-async def schedule_leaderboard():
-    global points_task
-    
-    # Cancel any existing task
-    if points_task and not points_task.done():
-        points_task.cancel()
-    
-    while True:
-        try:
-            # Calculate time until 11 PM today
-            now = datetime.now()
-            target_time = now.replace(hour=23, minute=0, second=0, microsecond=0)
-            
-            # If it's already past 11 PM, schedule for tomorrow
-            if now >= target_time:
-                target_time = target_time + timedelta(days=1)
-            
-            # Calculate seconds until target time
-            seconds_until_target = (target_time - now).total_seconds()
-            
-            logger.info(f"Scheduled leaderboard for {target_time.strftime('%Y-%m-%d %H:%M:%S')} "
-                       f"({seconds_until_target/3600:.2f} hours from now)")
-            
-            # Wait until 11 PM
-            await asyncio.sleep(seconds_until_target)
-            
-            # Generate and send the leaderboard
-            await generate_leaderboard()
-            
-            # Sleep a bit to avoid duplicating if this runs exactly at midnight
-            await asyncio.sleep(60)
-            
-        except asyncio.CancelledError:
-            logger.info("Leaderboard scheduler task was cancelled")
-            break
-        except Exception as e:
-            logger.error(f"Error in leaderboard scheduler: {e}")
-            # Wait a bit before retrying
-            await asyncio.sleep(3600)  # 1 hour
+        logger.error(f"Error generating leaderboard for guild {guild_id}: {e}")
 
 # Load saved alarms if available
-def load_alarms():
+async def load_alarms():
     global scheduled_alarms
     try:
-        if os.path.exists(ALARMS_FILE):
-            with open(ALARMS_FILE, 'rb') as f:
-                scheduled_alarms = pickle.load(f)
-            logger.info(f"Loaded {sum(len(alarms) for alarms in scheduled_alarms.values())} alarms from storage")
-            return True
-        else:
-            scheduled_alarms = {}
-            logger.info("No saved alarms found, starting fresh")
-            return False
+        scheduled_alarms = await state_store.load("alarms")
+        logger.info(f"Loaded {sum(len(alarms) for alarms in scheduled_alarms.values())} alarms from storage")
+        return bool(scheduled_alarms)
     except Exception as e:
         logger.error(f"Error loading alarms: {e}")
         scheduled_alarms = {}
         return False
 
-# Save alarms to file
-def save_alarms():
+# Load running pomodoro sessions if available
+async def load_pomodoros():
+    global active_pomodoros
     try:
-        with open(ALARMS_FILE, 'wb') as f:
-            pickle.dump(scheduled_alarms, f)
-        logger.info(f"Saved {sum(len(alarms) for alarms in scheduled_alarms.values())} alarms to storage")
-        return True
+        active_pomodoros = await state_store.load("pomodoros")
+        logger.info(f"Loaded {len(active_pomodoros)} running pomodoro sessions from storage")
+        return bool(active_pomodoros)
     except Exception as e:
-        logger.error(f"Error saving alarms: {e}")
+        logger.error(f"Error loading pomodoro sessions: {e}")
+        active_pomodoros = {}
         return False
 
-# Start alarm scheduler for a user
-async def start_alarm_scheduler(user_id: int):
-    global alarm_tasks
+# Save one user's pomodoro session (removes the entry once it has ended)
+async def save_pomodoro(user_id: int) -> bool:
+    return await save_state_key("pomodoros", active_pomodoros, user_id)
+
+# Save one user's alarms (removes the entry once the user has none left)
+async def save_alarms(user_id: int) -> bool:
+    return await save_state_key("alarms", scheduled_alarms, user_id)
+
+# Build an in-memory alarm record
+def new_alarm(channel_id: int, alarm_time: datetime, message: str, repeat: Optional[Dict] = None) -> Dict:
+    # Normalized to a UTC epoch once, here, so nothing localizes it again later
+    fire_at = alarm_time.timestamp() if alarm_time.tzinfo else None
+    return {"id": next(alarm_ids), "channel_id": channel_id, "time": alarm_time, "fire_at": fire_at,
+            "message": message, "repeat": repeat}
+
+# UTC epoch seconds for a naive alarm time from older storage
+def alarm_epoch(user_id: int, alarm_time: datetime) -> float:
+    # Apply user's timezone if known, otherwise use UTC
+    user_tz = get_user_tz(user_id) or pytz.UTC
+    return user_tz.localize(alarm_time).timestamp()
+
+# Put an alarm on the shared scheduler
+def schedule_alarm(user_id: int, alarm: Dict):
+    try:
+        if alarm["fire_at"] is None:
+            alarm["fire_at"] = alarm_epoch(user_id, alarm["time"])
+        timers.schedule(("alarm", alarm["id"]), alarm["fire_at"], fire_alarm, user_id, alarm["id"])
+    except Exception as e:
+        logger.error(f"Error scheduling alarm {alarm['id']} for user {user_id}: {e}")
+
+# Take an alarm off the scheduler and out of the user's list
+async def remove_alarm(user_id: int, alarm: Dict):
+    timers.cancel(("alarm", alarm["id"]))
+    alarms = scheduled_alarms.get(user_id, [])
+    if alarm in alarms:
+        alarms.remove(alarm)
+    # Remove empty user entries
+    if not alarms:
+        scheduled_alarms.pop(user_id, None)
+    await save_alarms(user_id)
+
+# Called by the scheduler when an alarm's fire time is reached
+async def fire_alarm(user_id: int, alarm_id: int):
+    alarm = next((a for a in scheduled_alarms.get(user_id, []) if a["id"] == alarm_id), None)
+    if alarm is None:
+        return
     
-    # Cancel existing task if any
-    if user_id in alarm_tasks and not alarm_tasks[user_id].done():
-        alarm_tasks[user_id].cancel()
+    alarm_time = alarm["time"]
+    message = alarm["message"]
+    try:
+        # Display in user's local timezone if available
+        user_tz = get_user_tz(user_id)
+        if user_tz:
+            local_time = alarm_time.astimezone(user_tz) if alarm_time.tzinfo else user_tz.localize(alarm_time)
+            time_display = local_time.strftime('%H:%M')
+        else:
+            time_display = alarm_time.strftime('%H:%M')
+        
+        # Get user's preferred sound notification
+        sound_effect = get_user_sound(user_id)
+            
+        embed = discord.Embed(
+            title="⏰ ALARM!",
+            description=f"<@{user_id}> Your alarm for **{time_display}** is ringing!",
+            color=discord.Color.red()
+        )
+        
+        # Add sound effect notification
+        embed.add_field(
+            name="Sound Alert",
+            value=f"{sound_effect}",
+            inline=False
+        )
+        
+        if message:
+            embed.add_field(name="Message", value=message)
+        
+        # Alarms ringing together in one channel go out as a single message
+        await notifier.notify(alarm["channel_id"], user_id, f"<@{user_id}>", embed, kind="alarm", due=alarm["fire_at"])
+        logger.info(f"Triggered alarm for user {user_id} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    except Exception as e:
+        logger.error(f"Error triggering alarm: {e}")
     
-    # Create a new task
-    alarm_tasks[user_id] = asyncio.create_task(alarm_check_loop(user_id))
-    logger.info(f"Started alarm scheduler for user {user_id}")
+    try:
+        if alarm["repeat"]:
+            await reschedule_recurring_alarm(user_id, alarm)
+        else:
+            await remove_alarm(user_id, alarm)
+    except Exception as e:
+        logger.error(f"Error saving alarms after triggering: {e}")
 
-# Main alarm checking loop for a user
-async def alarm_check_loop(user_id: int):
-    global scheduled_alarms
-    
-    logger.info(f"Alarm loop started for user {user_id}")
-    
-    while True:
-        try:
-            if user_id not in scheduled_alarms or not scheduled_alarms[user_id]:
-                # No alarms for this user, stop the loop
-                logger.info(f"No more alarms for user {user_id}, stopping scheduler")
-                return
-            
-            # Get current time in UTC
-            now_utc = datetime.now(pytz.UTC)
-            
-            # Check each alarm for this user
-            triggered_alarms = []
-            
-            for i, (channel_id, alarm_time, message) in enumerate(scheduled_alarms[user_id]):
-                try:
-                    # Convert alarm_time to UTC for comparison if it's not already
-                    if alarm_time.tzinfo is None:
-                        # Apply user's timezone if known, otherwise use UTC
-                        if user_id in user_timezones:
-                            user_tz = pytz.timezone(user_timezones[user_id])
-                            naive_alarm = alarm_time.replace(tzinfo=None)
-                            alarm_time_utc = user_tz.localize(naive_alarm).astimezone(pytz.UTC)
-                        else:
-                            alarm_time_utc = pytz.UTC.localize(alarm_time)
-                    else:
-                        alarm_time_utc = alarm_time.astimezone(pytz.UTC)
-                        
-                    if alarm_time_utc <= now_utc:
-                        # This alarm should trigger now or has passed
-                        triggered_alarms.append((i, channel_id, alarm_time, message))
-                except Exception as e:
-                    logger.error(f"Error checking alarm {i} for user {user_id}: {e}")
-                    # Skip this problematic alarm and continue with others
-                    continue
-            
-            # Process triggered alarms (in reverse to avoid index issues when removing)
-            for i, channel_id, alarm_time, message in sorted(triggered_alarms, reverse=True):
-                # Try to send notification
-                try:
-                    channel = bot.get_channel(channel_id)
-                    if channel:
-                        # Display in user's local timezone if available
-                        if user_id in user_timezones:
-                            user_tz = pytz.timezone(user_timezones[user_id])
-                            local_time = alarm_time.astimezone(user_tz) if alarm_time.tzinfo else user_tz.localize(alarm_time)
-                            time_display = local_time.strftime('%H:%M')
-                        else:
-                            time_display = alarm_time.strftime('%H:%M')
-                        
-                        # Get user's preferred sound notification
-                        sound_effect = get_user_sound(user_id)
-                            
-                        embed = discord.Embed(
-                            title="⏰ ALARM!",
-                            description=f"<@{user_id}> Your alarm for **{time_display}** is ringing!",
-                            color=discord.Color.red()
-                        )
-                        
-                        # Add sound effect notification
-                        embed.add_field(
-                            name="Sound Alert",
-                            value=f"{sound_effect}",
-                            inline=False
-                        )
-                        
-                        if message:
-                            embed.add_field(name="Message", value=message)
-                        
-                        await channel.send(f"<@{user_id}>", embed=embed)
-                        logger.info(f"Triggered alarm for user {user_id} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                    else:
-                        logger.error(f"Channel {channel_id} not found for alarm notification")
-                except Exception as e:
-                    logger.error(f"Error triggering alarm: {e}")
-                
-                try:
-                    # Remove this alarm
-                    del scheduled_alarms[user_id][i]
-                except Exception as e:
-                    logger.error(f"Error removing triggered alarm: {e}")
-            
-            # Save updated alarms if any were triggered
-            if triggered_alarms:
-                try:
-                    # Remove empty user entries
-                    if not scheduled_alarms[user_id]:
-                        del scheduled_alarms[user_id]
-                    
-                    save_alarms()
-                except Exception as e:
-                    logger.error(f"Error saving alarms after triggering: {e}")
-            
-            # Sleep for a short time (check every 10 seconds)
-            await asyncio.sleep(10)
-            
-        except Exception as e:
-            # Top-level exception handler to prevent the loop from breaking
-            logger.error(f"Critical error in alarm loop for user {user_id}: {e}")
-            # Continue the loop after a short delay
-            await asyncio.sleep(10)
+# Move a recurring alarm on to its next ring, replacing the one that just fired
+async def reschedule_recurring_alarm(user_id: int, alarm: Dict):
+    user_tz = get_user_tz(user_id) or pytz.UTC
+    alarm_time = alarm["time"]
+    if alarm_time.tzinfo is None:
+        alarm_time = user_tz.localize(alarm_time)
+    # Occurrences missed while the bot was down are skipped, not replayed
+    alarm["time"] = next_occurrence(alarm["repeat"], alarm_time, user_tz, after=datetime.now(pytz.UTC))
+    alarm["fire_at"] = alarm["time"].timestamp()
+    schedule_alarm(user_id, alarm)
+    await save_alarms(user_id)
 
 # Parse time string into datetime object
 def parse_alarm_time(time_str: str, user_id: int) -> Optional[datetime]:
@@ -597,13 +763,7 @@ def parse_alarm_time(time_str: str, user_id: int) -> Optional[datetime]:
             return None
         
         # Get user's timezone if available, otherwise use UTC
-        user_tz = None
-        if user_id in user_timezones:
-            try:
-                user_tz = pytz.timezone(user_timezones[user_id])
-            except Exception as e:
-                logger.error(f"Invalid timezone for user {user_id}: {user_timezones[user_id]} - {e}")
-                user_tz = None
+        user_tz = get_user_tz(user_id)
         
         if not user_tz:
             # Use UTC as fallback
@@ -655,64 +815,53 @@ async def detect_timezone_from_intro(message_content: str) -> Optional[str]:
     
     return None
 
-# Event: Bot is ready
+# Event: Bot is ready (fires again after every gateway reconnect)
 @bot.event
 async def on_ready():
     logger.info(f'{bot.user.name} has connected to Discord!')
     print(f"\n✅ {bot.user.name} is now online!")
     
-    # Set start time for uptime tracking
-    bot.start_time = datetime.utcnow()
     await bot.change_presence(activity=discord.Activity(
         type=discord.ActivityType.listening, 
         name=f"!help"
     ))
     
-    # Load saved user timezones
-    load_timezones()
-    
-    # Load saved sound preferences
-    load_sound_prefs()
-    
-    # Load saved points data
-    load_points()
-    
-    # Schedule daily leaderboard task
-    asyncio.create_task(schedule_leaderboard())
-    
-    # Load saved alarms and start schedulers for each user
-    load_alarms()
-    for user_id in scheduled_alarms:
-        await start_alarm_scheduler(user_id)
-    
-    # Attempt to load cogs - with error handling to avoid issues
-    print("\nLoading cogs...")
-    if os.path.exists('./cogs'):
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py') and not filename.startswith('__'):
-                try:
-                    await bot.load_extension(f'cogs.{filename[:-3]}')
-                    print(f"✅ Loaded extension: {filename}")
-                except Exception as e:
-                    print(f"❌ Failed to load extension {filename}: {e}")
-    else:
-        print("❌ No cogs directory found")
-    
     print(f"\nBot is fully ready!")
     print(f"Type !help in Discord to see the clean commands list!")
-    
-    # Start monitoring chat folder in background
-    asyncio.create_task(monitor_chat_folder())
 
-async def monitor_chat_folder():
-    """Monitor chat folder in background"""
-    while True:
-        try:
-            training_pipeline.monitor_chat_folder('chat_exports')
-            await asyncio.sleep(1)
-        except Exception as e:
-            print(f"Error monitoring chat folder: {e}")
-            await asyncio.sleep(5)
+# Every taught pair, for indexing in the pipeline worker
+async def load_response_pairs():
+    await response_store.open()
+    pairs = await response_store.scan()
+    return [(pair["input"], pair["response"]) for _, pair in sorted(pairs.items())]
+
+# Training pipeline and response index, in a worker process behind an async facade
+training_pipeline = PipelinePool(
+    load_response_pairs, threshold=RESPONSE_CONFIDENCE, timeout=MATCH_TIMEOUT, slow_fallback=PIPELINE_FALLBACK
+)
+
+# Pairs read from chat exports are stored and indexed like taught ones
+async def ingest_chat_pairs(pairs):
+    pairs = [(input_text, output_text) for input_text, output_text in pairs if normalize_input(input_text)]
+    if not pairs:
+        return
+    await response_store.batch({normalize_input(i): {"input": i, "response": o} for i, o in pairs})
+    await training_pipeline.teach_many(pairs)
+    for input_text, _ in pairs:
+        response_cache.invalidate(input_text)
+
+chat_ingestor = ChatIngestor(CHAT_EXPORTS_FOLDER, CHAT_INGEST_MANIFEST, ingest_chat_pairs)
+
+# Best (response, confidence) for a message, answered from the cache when possible
+async def find_response(text: str):
+    result = response_cache.get(text)
+    if result is None:
+        result = await training_pipeline.find_response(text, default=None)
+        if result is None:
+            # The worker timed out; don't remember that as "no answer"
+            return None, 0.0
+        response_cache.put(text, result)
+    return result
 
 @bot.command(name='teach')
 async def teach(ctx, *, content: str):
@@ -728,8 +877,10 @@ async def teach(ctx, *, content: str):
         input_text = parts[1]
         output_text = parts[3]
         
-        # Add to training pipeline
-        training_pipeline.add_training_pair(input_text, output_text)
+        # Store the pair, then add it to the worker's pipeline and response index
+        await response_store.put(normalize_input(input_text) or input_text, {"input": input_text, "response": output_text})
+        await training_pipeline.teach(input_text, output_text)
+        response_cache.invalidate(input_text)
         
         await ctx.send("I've learned that! I'll remember to respond that way.")
         
@@ -741,16 +892,77 @@ async def teach(ctx, *, content: str):
 async def stats(ctx):
     """Show training statistics"""
     try:
-        stats = training_pipeline.get_training_stats()
+        stats = await training_pipeline.training_stats()
         embed = discord.Embed(title="Aarohi's Training Statistics", color=discord.Color.blue())
         embed.add_field(name="Total Training Pairs", value=stats["total_training_pairs"])
         embed.add_field(name="Emotion Types Covered", value=stats["emotion_types_covered"])
         embed.add_field(name="Last Updated", value=stats["last_updated"])
+        embed.add_field(
+            name="Indexed Responses",
+            value=f"{stats['indexed_pairs']} ({stats['unmerged_pairs']} awaiting merge)"
+        )
+        matching = training_pipeline.stats()
+        embed.add_field(
+            name="Message Matching",
+            value=f"{matching['requests']} in {matching['batches']} batches, {matching['timeouts']} timed out"
+        )
+        cache = response_cache.stats()
+        embed.add_field(
+            name="Response Cache",
+            value=f"{cache['hit_rate'] * 100:.1f}% hits ({cache['hits']} hits, {cache['misses']} misses, {cache['size']} cached)"
+        )
+        delivery = notifier.stats()
+        embed.add_field(
+            name="Timer Notifications",
+            value=f"{delivery['delivered']} sent in {delivery['messages_sent']} messages ({delivery['api_calls_saved']} API calls saved)"
+        )
         await ctx.send(embed=embed)
     except Exception as e:
         await ctx.send("Sorry, I couldn't retrieve my training statistics right now.")
         print(f"Error in stats command: {e}")
 
+# Write the timer lag histograms to TIMER_METRICS_FILE whenever new samples came in
+async def export_timer_metrics():
+    exported_samples = 0
+    while True:
+        await asyncio.sleep(TIMER_METRICS_INTERVAL)
+        samples = sum(histogram.count for histogram in timer_metrics.metrics.histograms.values())
+        if samples == exported_samples:
+            continue
+        try:
+            await save_json(TIMER_METRICS_FILE, timer_metrics.metrics.export(ALARM_SLO_SECONDS), indent=2)
+            exported_samples = samples
+        except Exception as e:
+            logger.error(f"Error exporting timer metrics: {e}")
+
+# Show how late timers fire and deliver (admins only)
+@bot.command(name="timerstats")
+@commands.has_permissions(administrator=True)
+async def timer_stats(ctx):
+    """Show timer fire lag, send latency and delivery lag percentiles"""
+    snapshot = timer_metrics.get_metrics()
+    embed = discord.Embed(
+        title="⏱️ Timer Accuracy",
+        description=f"Latency since startup (p50 / p95 / p99). Alarm SLO: delivered within {ALARM_SLO_SECONDS:g}s.",
+        color=discord.Color.blue()
+    )
+    
+    if not snapshot:
+        embed.add_field(name="No Data Yet", value="No timers have fired since startup.", inline=False)
+    
+    for kind, stages in snapshot.items():
+        lines = [
+            f"**{stage}** ({summary['count']}): {summary['p50_ms']:g} / {summary['p95_ms']:g} / {summary['p99_ms']:g} ms, max {summary['max_ms']:g} ms"
+            for stage, summary in stages.items()
+        ]
+        delivery = timer_metrics.metrics.histogram(kind, "delivery")
+        if delivery:
+            lines.append(f"Within SLO: **{delivery.fraction_within(ALARM_SLO_SECONDS) * 100:.1f}%**")
+        embed.add_field(name=kind.capitalize(), value="\n".join(lines), inline=False)
+    
+    embed.set_footer(text=f"fire: {timer_metrics.STAGES['fire']} · send: {timer_metrics.STAGES['send']} · delivery: {timer_metrics.STAGES['delivery']}")
+    await ctx.send(embed=embed)
+
 @bot.event
 async def on_message(message):
     # Don't respond to our own messages
@@ -769,11 +981,11 @@ async def on_message(message):
     if message.content.startswith(prefix) or message.guild is None or message.author.bot:
         return
 
-    # Get response from training pipeline
-    response, confidence = training_pipeline.find_response(message.content)
+    # Get response from the cache or the worker's index
+    response, confidence = await find_response(message.content)
 
     # Only respond if confidence is high enough
-    if confidence > 0.5:
+    if confidence > RESPONSE_CONFIDENCE:
         await message.channel.send(response)
 
 # Custom help command - exactly matching the required format
@@ -825,7 +1037,8 @@ async def help_command(ctx, command: str = None):
             f"`!points` - View your productivity points\n"
             f"`!leaderboard` - See the current rankings\n"
             f"`!setsound` - Customize your notification sounds\n"
-            f"Daily leaderboard posted at 11:00 PM"
+            f"`!leaderboardtime HH:MM [timezone]` - Set when this server's leaderboard posts\n"
+            f"Daily leaderboard posted at 11:00 PM UTC unless the server sets its own time"
         ),
         inline=False
     )
@@ -963,15 +1176,12 @@ async def pomodoro(ctx, *args):
         # Check if user has an active Pomodoro session
         if user_id in active_pomodoros:
             try:
-                # Extract session data
-                channel_id, end_time, task = active_pomodoros[user_id]
-                
-                # Cancel the task if it's running
-                if not task.done():
-                    task.cancel()
+                # Take the deadline off the scheduler
+                timers.cancel(("pomodoro", user_id))
                 
                 # Remove from active pomodoros dictionary
                 del active_pomodoros[user_id]
+                await save_pomodoro(user_id)
                 
                 # Send confirmation message
                 embed = discord.Embed(
@@ -989,6 +1199,7 @@ async def pomodoro(ctx, *args):
                 # Attempt cleanup even if an error occurred
                 if user_id in active_pomodoros:
                     del active_pomodoros[user_id]
+                    await save_pomodoro(user_id)
                 
                 # Send error message
                 embed = discord.Embed(
@@ -1025,17 +1236,10 @@ async def pomodoro(ctx, *args):
     
     # Check if user already has an active pomodoro session
     if user_id in active_pomodoros:
-        # Get remaining time
-        channel_id, end_time, task = active_pomodoros[user_id]
-        
         # Calculate remaining time
-        now = datetime.now(pytz.UTC)
-        if end_time.tzinfo is None:
-            end_time = pytz.UTC.localize(end_time)
-            
-        time_diff = end_time - now
-        minutes_left = max(0, int(time_diff.total_seconds() / 60))
-        seconds_left = max(0, int(time_diff.total_seconds() % 60))
+        seconds_remaining = active_pomodoros[user_id]["end"] - time.time()
+        minutes_left = max(0, int(seconds_remaining / 60))
+        seconds_left = max(0, int(seconds_remaining % 60))
         
         embed = discord.Embed(
             title="🍅 Pomodoro Already Running",
@@ -1089,14 +1293,20 @@ async def pomodoro(ctx, *args):
     # Send confirmation message
     await ctx.send(embed=embed)
     
-    # Create and store the pomodoro task with error handling
+    # Store the session as an absolute deadline and schedule its completion
     try:
-        task = asyncio.create_task(pomodoro_timer(ctx.channel.id, user_id, minutes))
-        active_pomodoros[user_id] = (ctx.channel.id, end_time, task)
+        active_pomodoros[user_id] = {
+            "channel_id": ctx.channel.id,
+            "guild_id": ctx.guild.id if ctx.guild else None,
+            "end": end_time.timestamp(),
+            "minutes": minutes
+        }
+        await save_pomodoro(user_id)
+        timers.schedule(("pomodoro", user_id), end_time.timestamp(), complete_pomodoro, user_id)
         
         logger.info(f"Started Pomodoro timer for user {user_id} for {minutes} minutes, ending at {end_time_str}")
     except Exception as e:
-        logger.error(f"Error creating Pomodoro timer task for user {user_id}: {e}")
+        logger.error(f"Error scheduling Pomodoro timer for user {user_id}: {e}")
         embed = discord.Embed(
             title="⚠️ Error Starting Timer",
             description="There was an error starting your Pomodoro timer. Please try again.",
@@ -1104,68 +1314,62 @@ async def pomodoro(ctx, *args):
         )
         await ctx.send(embed=embed)
 
-# Pomodoro timer function
-async def pomodoro_timer(channel_id: int, user_id: int, minutes: int):
+# Called by the scheduler when a pomodoro session's deadline is reached
+async def complete_pomodoro(user_id: int):
+    session = active_pomodoros.pop(user_id, None)
+    if session is None:
+        logger.info(f"Pomodoro for user {user_id} was canceled before it ended")
+        return
+    channel_id, minutes = session["channel_id"], session["minutes"]
+    
     try:
-        # Sleep for the specified duration
-        logger.info(f"Pomodoro timer sleeping for {minutes} minutes for user {user_id}")
-        await asyncio.sleep(minutes * 60)  # Convert minutes to seconds
-        
-        # Check if the pomodoro is still active (could have been canceled)
-        if user_id not in active_pomodoros:
-            logger.info(f"Pomodoro for user {user_id} was canceled during sleep")
-            return
-            
-        # Award points for the completed session
-        points_earned, total_points = award_points(user_id, minutes)
+        # Award points for the completed session; the points and the session's removal
+        # are written together so a restart can never award the same session twice
+        points_earned, total_points = credit_points(user_id, minutes, guild_id=session.get("guild_id"))
+        await state_store.batch(puts={"points": {user_id: user_points[user_id]}}, deletes={"pomodoros": [user_id]})
+        logger.info(f"Awarded {points_earned} points to user {user_id} for a {minutes}-minute session")
+        await ensure_leaderboard(session.get("guild_id"), channel_id)
         
         # Get user's preferred sound notification
         sound_effect = get_user_sound(user_id)
         
         # Send notification when timer is up
-        channel = bot.get_channel(channel_id)
-        if channel:
-            embed = discord.Embed(
-                title="🍅 Pomodoro Complete!",
-                description=f"<@{user_id}> Your **{minutes} minute{'s' if minutes != 1 else ''}** focus session is complete!",
-                color=discord.Color.green()
-            )
-            
-            # Add sound effect notification
-            embed.add_field(
-                name="Sound Alert",
-                value=f"{sound_effect}",
-                inline=False
-            )
-            
-            # Add points information
-            embed.add_field(
-                name="🏆 Points Earned",
-                value=f"You earned **{points_earned} points** for this session!\nYour total for today: **{total_points} points**",
-                inline=False
-            )
-            
-            embed.add_field(
-                name="Take a Break",
-                value="Time for a 5-minute break before starting another session."
-            )
-            
-            embed.add_field(
-                name="Start Another",
-                value=f"Type `!pomodoro [minutes]` to start a new focus session."
-            )
-            
-            await channel.send(f"<@{user_id}>", embed=embed)
-            logger.info(f"Sent Pomodoro completion notification to user {user_id} with {points_earned} points awarded")
-        else:
-            logger.error(f"Channel {channel_id} not found for Pomodoro notification")
+        embed = discord.Embed(
+            title="🍅 Pomodoro Complete!",
+            description=f"<@{user_id}> Your **{minutes} minute{'s' if minutes != 1 else ''}** focus session is complete!",
+            color=discord.Color.green()
+        )
+        
+        # Add sound effect notification
+        embed.add_field(
+            name="Sound Alert",
+            value=f"{sound_effect}",
+            inline=False
+        )
+        
+        # Add points information
+        embed.add_field(
+            name="🏆 Points Earned",
+            value=f"You earned **{points_earned} points** for this session!\nYour total for today: **{total_points} points**",
+            inline=False
+        )
+        
+        embed.add_field(
+            name="Take a Break",
+            value="Time for a 5-minute break before starting another session."
+        )
+        
+        embed.add_field(
+            name="Start Another",
+            value=f"Type `!pomodoro [minutes]` to start a new focus session."
+        )
+        
+        # Sessions ending together in one channel go out as a single message
+        await notifier.notify(channel_id, user_id, f"<@{user_id}>", embed, kind="pomodoro", due=session["end"])
+        logger.info(f"Queued Pomodoro completion notification for user {user_id} with {points_earned} points awarded")
     
-    except asyncio.CancelledError:
-        logger.info(f"Pomodoro timer for user {user_id} was canceled")
-        # Task was canceled, clean up if needed
-        pass
     except Exception as e:
-        logger.error(f"Error in Pomodoro timer for user {user_id}: {e}")
+        logger.error(f"Error completing Pomodoro for user {user_id}: {e}")
         # Try to send error notification if possible
         try:
             channel = bot.get_channel(channel_id)
@@ -1178,11 +1382,56 @@ async def pomodoro_timer(channel_id: int, user_id: int, minutes: int):
                 await channel.send(f"<@{user_id}>", embed=embed)
         except:
             pass
-    finally:
-        # Clean up - remove from active sessions regardless of outcome
-        if user_id in active_pomodoros:
-            del active_pomodoros[user_id]
-        logger.info(f"Pomodoro timer for user {user_id} completed and cleaned up")
+
+# Complete every pomodoro session that ended while the bot was offline
+async def catch_up_pomodoros():
+    now = time.time()
+    expired = {user_id: session for user_id, session in active_pomodoros.items() if session["end"] <= now}
+    if not expired:
+        return
+    
+    earned = {}
+    for user_id, session in expired.items():
+        del active_pomodoros[user_id]
+        earned[user_id] = credit_points(
+            user_id, session["minutes"], datetime.fromtimestamp(session["end"]), session.get("guild_id")
+        )
+    
+    # One write for every award and removal, so each session is credited exactly once
+    await state_store.batch(
+        puts={"points": {user_id: user_points[user_id] for user_id in expired}},
+        deletes={"pomodoros": list(expired)}
+    )
+    logger.info(f"Completed {len(expired)} pomodoro sessions that ended while offline")
+    for session in expired.values():
+        await ensure_leaderboard(session.get("guild_id"), session["channel_id"])
+    
+    # Let each channel know once the gateway is up
+    by_channel = {}
+    for user_id, session in expired.items():
+        by_channel.setdefault(session["channel_id"], []).append(user_id)
+    
+    async def notify():
+        await bot.wait_until_ready()
+        for channel_id, user_ids in by_channel.items():
+            channel = bot.get_channel(channel_id)
+            if not channel:
+                logger.error(f"Channel {channel_id} not found for Pomodoro catch-up notification")
+                continue
+            lines = [
+                f"<@{user_id}> **{expired[user_id]['minutes']} min** session: +{earned[user_id][0]} points (today: {earned[user_id][1]})"
+                for user_id in user_ids
+            ]
+            embed = discord.Embed(
+                title="🍅 Pomodoro Complete!",
+                description="These sessions finished while I was offline:\n" + "\n".join(lines),
+                color=discord.Color.green()
+            )
+            try:
+                await channel.send(" ".join(f"<@{user_id}>" for user_id in user_ids), embed=embed)
+            except Exception as e:
+                logger.error(f"Error sending Pomodoro catch-up notification: {e}")
+    asyncio.create_task(notify())
 
 # Todo command
 @bot.command(name="todo")
@@ -1225,14 +1474,11 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
             alarms_list = []
             
             # Get user's timezone if available
-            user_tz = None
-            if user_id in user_timezones:
-                try:
-                    user_tz = pytz.timezone(user_timezones[user_id])
-                except:
-                    user_tz = None
+            user_tz = get_user_tz(user_id)
             
-            for i, (channel_id, alarm_time, alarm_msg) in enumerate(scheduled_alarms[user_id]):
+            for i, alarm in enumerate(scheduled_alarms[user_id]):
+                alarm_time, alarm_msg = alarm["time"], alarm["message"]
+                repeat_display = f" 🔁 {describe(alarm['repeat'])}" if alarm["repeat"] else ""
                 # Convert to user's local time if timezone is available
                 if user_tz and alarm_time.tzinfo:
                     local_time = alarm_time.astimezone(user_tz)
@@ -1242,7 +1488,7 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
                 
                 # Add alarm ID for reference when canceling
                 msg_display = f" - {alarm_msg}" if alarm_msg else ""
-                alarms_list.append(f"**#{i+1}** | **{time_str}**{msg_display}")
+                alarms_list.append(f"**#{i+1}** | **{time_str}**{repeat_display}{msg_display}")
             
             embed.description = "You have the following alarms set:"
             embed.add_field(name="Scheduled Alarms", value="\n".join(alarms_list) or "None")
@@ -1314,13 +1560,14 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
             return
         
         # Get the alarm details for the confirmation message
-        _, alarm_time, alarm_msg = scheduled_alarms[user_id][alarm_id]
+        alarm = scheduled_alarms[user_id][alarm_id]
+        alarm_time, alarm_msg = alarm["time"], alarm["message"]
         
         # Get user's timezone for display
         time_display = alarm_time.strftime("%H:%M")
-        if user_id in user_timezones:
+        user_tz = get_user_tz(user_id)
+        if user_tz:
             try:
-                user_tz = pytz.timezone(user_timezones[user_id])
                 if alarm_time.tzinfo:
                     local_time = alarm_time.astimezone(user_tz)
                 else:
@@ -1329,23 +1576,8 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
             except:
                 pass
         
-        # Remove the alarm
-        del scheduled_alarms[user_id][alarm_id]
-        
-        # Remove empty user entries if needed
-        if not scheduled_alarms[user_id]:
-            del scheduled_alarms[user_id]
-            
-            # Also cancel any running task
-            if user_id in alarm_tasks and not alarm_tasks[user_id].done():
-                alarm_tasks[user_id].cancel()
-                del alarm_tasks[user_id]
-        else:
-            # Restart the scheduler with updated alarms
-            await start_alarm_scheduler(user_id)
-            
-        # Save updated alarms
-        save_alarms()
+        # Remove the alarm from the schedule and save
+        await remove_alarm(user_id, alarm)
         
         # Confirmation message
         embed = discord.Embed(
@@ -1370,13 +1602,9 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
     if action_or_time.lower() in ["clear", "clearall", "all"]:
         if user_id in scheduled_alarms:
             alarm_count = len(scheduled_alarms[user_id])
-            del scheduled_alarms[user_id]
-            save_alarms()
-            
-            # Cancel any running task
-            if user_id in alarm_tasks and not alarm_tasks[user_id].done():
-                alarm_tasks[user_id].cancel()
-                del alarm_tasks[user_id]
+            for alarm in scheduled_alarms.pop(user_id):
+                timers.cancel(("alarm", alarm["id"]))
+            await save_alarms(user_id)
             
             embed = discord.Embed(
                 title="⏰ Alarms Cleared",
@@ -1412,8 +1640,10 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
     
     # Now that we know this is a time-setting operation, reorganize the parameters
     time_str = action_or_time
-    if alarm_id_or_msg and not message:
-        message = alarm_id_or_msg
+    message = f"{alarm_id_or_msg or ''} {message}".strip()
+    
+    # An optional recurrence rule comes right after the time, e.g. "every day" or "repeat mon,wed,fri"
+    repeat, message = parse_recurrence(message)
     
     # Handle setting a new alarm - parse the time
     alarm_time = parse_alarm_time(time_str, user_id)
@@ -1428,21 +1658,23 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
         await ctx.send(embed=embed)
         return
     
+    # Get user's timezone
+    user_tz = get_user_tz(user_id) or pytz.UTC
+    
+    # A recurring alarm first rings on the first day its rule allows
+    alarm_time = first_occurrence(repeat, alarm_time, user_tz)
+    
     # Add the alarm to the schedule
     if user_id not in scheduled_alarms:
         scheduled_alarms[user_id] = []
     
-    # Store alarm data: (channel_id, datetime, message)
-    scheduled_alarms[user_id].append((ctx.channel.id, alarm_time, message.strip()))
+    # Store alarm data and put it on the shared scheduler
+    new_record = new_alarm(ctx.channel.id, alarm_time, message.strip(), repeat)
+    scheduled_alarms[user_id].append(new_record)
+    schedule_alarm(user_id, new_record)
     
     # Save updated alarms
-    save_alarms()
-    
-    # Start or restart the alarm scheduler for this user
-    await start_alarm_scheduler(user_id)
-    
-    # Get user's timezone
-    user_tz = pytz.timezone(user_timezones[user_id])
+    await save_alarms(user_id)
     
     # Calculate time until alarm
     now = datetime.now(user_tz)
@@ -1466,6 +1698,9 @@ async def alarm(ctx, action_or_time: str = None, alarm_id_or_msg: str = None, *,
     if message.strip():
         embed.add_field(name="Message", value=message.strip())
     
+    if repeat:
+        embed.add_field(name="Repeats", value=f"🔁 {describe(repeat)}")
+    
     # Format the remaining time message
     if days > 0:
         time_until = f"Rings in {days} day{'s' if days > 1 else ''}, {hours} hour{'s' if hours != 1 else ''} and {minutes} minute{'s' if minutes != 1 else ''}"
@@ -1674,6 +1909,18 @@ async def guide(ctx, command: str = None):
             inline=False
         )
         
+        # Recurring alarms section
+        embed.add_field(
+            name="🔁 Recurring Alarms",
+            value=(
+                f"• Put `every` or `repeat` and a rule right after the time to repeat an alarm\n"
+                f"• `every day`, `every weekday`, `every 4h` or days like `every mon,wed,fri`\n"
+                f"  Example: `!alarm 07:00 every weekday Wake up`\n"
+                f"• Cancel it like any other alarm to stop it repeating"
+            ),
+            inline=False
+        )
+        
         # Managing alarms section
         embed.add_field(
             name="📋 Managing Alarms",
@@ -1753,7 +2000,7 @@ async def guide(ctx, command: str = None):
                 "• Each completed Pomodoro session awards 1 point per minute\n"
                 "• For example, a 25-minute session awards 25 points\n"
                 f"• View your current points with `!points`\n"
-                f"• Points reset daily at 11:00 PM when the leaderboard is posted"
+                f"• Points reset daily when your server's leaderboard is posted"
             ),
             inline=False
         )
@@ -1869,7 +2116,7 @@ async def guide(ctx, command: str = None):
                 "• You earn 1 point for every minute of completed Pomodoro time\n"
                 "• A standard 25-minute Pomodoro = 25 points\n"
                 "• Points are tracked individually for each user\n"
-                "• Points reset daily at 11:00 PM when the leaderboard is posted\n"
+                "• Points reset daily when your server's leaderboard is posted\n"
                 "• Only completed sessions award points (canceled sessions don't count)"
             ),
             inline=False
@@ -1879,7 +2126,7 @@ async def guide(ctx, command: str = None):
         embed.add_field(
             name="📊 Daily Leaderboard",
             value=(
-                "• A leaderboard of the day's productivity is posted at 11:00 PM\n"
+                "• A leaderboard of the day's productivity is posted each evening (11:00 PM UTC by default)\n"
                 "• The leaderboard ranks users by total points earned that day\n"
                 "• Top performers receive recognition with medals (🥇, 🥈, 🥉)\n"
                 "• Check the current standings anytime with `!leaderboard`\n"
@@ -1916,7 +2163,8 @@ async def guide(ctx, command: str = None):
             name="📌 Basic Usage",
             value=(
                 f"• `!leaderboard` - View the current day's rankings\n"
-                f"• `!lb` - Shorthand for the leaderboard command"
+                f"• `!lb` - Shorthand for the leaderboard command\n"
+                f"• `!leaderboardtime 21:30 Asia/Kolkata` - Post this server's leaderboard at 9:30 PM IST (Manage Server)"
             ),
             inline=False
         )
@@ -1928,7 +2176,8 @@ async def guide(ctx, command: str = None):
                 "• The leaderboard ranks users by productivity points earned today\n"
                 "• Points are earned through completed Pomodoro sessions (1 point per minute)\n"
                 "• Top 3 performers get medals: 🥇 First, 🥈 Second, 🥉 Third\n"
-                "• The leaderboard is automatically posted at 11:00 PM each day\n"
+                "• Each server's leaderboard is posted at its own time each day (11:00 PM UTC by default)\n"
+                "• You count toward the server where you last finished a Pomodoro\n"
                 "• After the daily leaderboard is posted, points reset for the next day"
             ),
             inline=False
@@ -2075,9 +2324,8 @@ async def settimezone(ctx, *, timezone_input: str = None):
     try:
         timezone = pytz.timezone(timezone_name)
         
-        # Store user timezone
-        user_timezones[user_id] = timezone_name
-        save_timezones()
+        # Store user timezone and rebuild its cached tz object
+        await set_user_timezone(user_id, timezone_name)
         
         # Get current time in that timezone
         now = datetime.now(timezone)
@@ -2196,7 +2444,7 @@ async def setsound(ctx, sound: str = None):
     sound = sound.lower()
     if sound in SOUND_EFFECTS:
         user_sound_prefs[user_id] = sound
-        save_sound_prefs()
+        await save_sound_pref(user_id)
         
         embed = discord.Embed(
             title="🔊 Sound Updated",
@@ -2315,7 +2563,7 @@ async def view_points(ctx, user: discord.Member = None):
     # Add leaderboard info
     embed.add_field(
         name="Daily Leaderboard",
-        value=f"The daily leaderboard is posted at 11:00 PM. Try to climb the ranks!",
+        value=f"The daily leaderboard is posted at {leaderboard_window(user_points.get(target_id, {}).get('guild_id'))[1].strftime('%H:%M %Z')}. Try to climb the ranks!",
         inline=False
     )
     
@@ -2325,21 +2573,22 @@ async def view_points(ctx, user: discord.Member = None):
 @bot.command(name="leaderboard", aliases=["lb"])
 async def view_leaderboard(ctx):
     """View the current productivity leaderboard"""
-    # Set this channel as the leaderboard channel
-    global leaderboard_channel_id
-    leaderboard_channel_id = ctx.channel.id
+    guild_id = ctx.guild.id if ctx.guild else None
     
-    # Get current date for the title
-    today = datetime.now().strftime('%Y-%m-%d')
+    # Set this channel as the guild's leaderboard channel
+    if guild_id is not None:
+        if guild_id in leaderboard_settings:
+            leaderboard_settings[guild_id]["channel_id"] = ctx.channel.id
+            await save_state_key("leaderboards", leaderboard_settings, guild_id)
+        else:
+            await ensure_leaderboard(guild_id, ctx.channel.id)
     
-    # Create a list of (user_id, points) tuples
-    leaderboard_data = []
-    for user_id, data in user_points.items():
-        if data["points"] > 0:  # Only include users who earned points today
-            leaderboard_data.append((user_id, data["points"]))
+    # Get current date in the leaderboard's timezone for the title
+    _, _, tz = leaderboard_clock(guild_id)
+    today = datetime.now(tz).strftime('%Y-%m-%d')
     
-    # Sort by points in descending order
-    leaderboard_data.sort(key=lambda x: x[1], reverse=True)
+    # Only this guild's users, sorted by points
+    leaderboard_data = leaderboard_rankings(guild_id)
     
     # Generate the leaderboard message
     embed = discord.Embed(
@@ -2381,14 +2630,11 @@ async def view_leaderboard(ctx):
             inline=False
         )
     
-    # Add time until reset
-    now = datetime.now()
-    target_time = now.replace(hour=23, minute=0, second=0, microsecond=0)
-    if now >= target_time:
-        target_time = target_time + timedelta(days=1)
-    
-    hours_remaining = int((target_time - now).total_seconds() // 3600)
-    minutes_remaining = int(((target_time - now).total_seconds() % 3600) // 60)
+    # Add time until this guild's reset
+    _, next_post = leaderboard_window(guild_id)
+    seconds_remaining = next_post.timestamp() - time.time()
+    hours_remaining = int(seconds_remaining // 3600)
+    minutes_remaining = int((seconds_remaining % 3600) // 60)
     
     embed.add_field(
         name="Time Remaining",
@@ -2404,6 +2650,46 @@ async def view_leaderboard(ctx):
     
     await ctx.send(embed=embed)
 
+# Set when this guild's daily leaderboard is posted
+@bot.command(name="leaderboardtime")
+@commands.guild_only()
+@commands.has_permissions(manage_guild=True)
+async def set_leaderboard_time(ctx, post_time: str = None, *, timezone_input: str = None):
+    """Set the local time (and timezone) this server's daily leaderboard is posted"""
+    guild_id = ctx.guild.id
+    
+    if not post_time:
+        hour, minute, tz = leaderboard_clock(guild_id)
+        await ctx.send(f"This server's leaderboard is posted daily at **{hour:02d}:{minute:02d} {tz.zone}**. "
+                       f"Use `!leaderboardtime HH:MM [timezone]` to change it.")
+        return
+    
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", post_time.strip())
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        await ctx.send("Please give the time as HH:MM in 24-hour format, e.g. `!leaderboardtime 21:30 US/Eastern`.")
+        return
+    
+    await ensure_leaderboard(guild_id, ctx.channel.id)
+    settings = leaderboard_settings[guild_id]
+    
+    if timezone_input:
+        timezone_name = timezone_input.strip()
+        timezone_name = TIMEZONE_ALIASES.get(timezone_name.lower(), timezone_name)
+        try:
+            pytz.timezone(timezone_name)
+        except pytz.exceptions.UnknownTimeZoneError:
+            await ctx.send(f"Unknown timezone `{timezone_input}`. Try something like `US/Eastern` or `Asia/Kolkata`.")
+            return
+        settings["timezone"] = timezone_name
+    
+    settings["time"] = f"{int(match.group(1)):02d}:{match.group(2)}"
+    await save_state_key("leaderboards", leaderboard_settings, guild_id)
+    schedule_leaderboard(guild_id)
+    
+    _, next_post = leaderboard_window(guild_id)
+    await ctx.send(f"📊 This server's leaderboard will be posted daily at **{settings['time']} {settings['timezone']}**, "
+                   f"next <t:{int(next_post.timestamp())}:R>.")
+
 # Run the bot
 
 # Run the bot
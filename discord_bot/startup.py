@@ -0,0 +1,73 @@
+import asyncio
+import os
+import time
+import logging
+
+logger = logging.getLogger("discord_bot.startup")
+
+
+class StartupPipeline:
+    """Runs the startup phases once and times each of them
+
+    Everything runs from setup_hook, which finishes before the gateway
+    connects, so no command can arrive while a phase is still pending.
+    """
+
+    def __init__(self, name="bot"):
+        self.name = name
+        self.timings = []  # (phase, seconds) in completion order
+        self._started = None
+
+    async def phase(self, name, coro):
+        """Await a single phase and record how long it took"""
+        if self._started is None:
+            self._started = time.perf_counter()
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.timings.append((name, time.perf_counter() - start))
+
+    async def concurrently(self, name, phases):
+        """Run several named phases at once; the group is timed as a whole too"""
+        results = await self.phase(name, asyncio.gather(
+            *(self.phase(f"{name}/{phase_name}", coro) for phase_name, coro in phases.items()),
+            return_exceptions=True
+        ))
+        for phase_name, result in zip(phases, results):
+            if isinstance(result, Exception):
+                logger.error(f"Startup phase {name}/{phase_name} failed: {result}")
+        return dict(zip(phases, results))
+
+    def mark_ready(self):
+        """Log the timing report"""
+        if self._started is not None:
+            self.timings.append(("total", time.perf_counter() - self._started))
+        logger.info(self.report())
+
+    def report(self):
+        """Return the per-phase timings as text"""
+        lines = [f"{self.name} startup timings:"]
+        for phase_name, seconds in self.timings:
+            lines.append(f"  {phase_name:<32} {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+async def load_cogs(bot, pipeline, directory="./cogs"):
+    """Load every cog in a directory; Config goes first because other cogs read it"""
+    if not os.path.exists(directory):
+        logger.error("No cogs directory found")
+        return {}
+
+    names = sorted(
+        filename[:-3] for filename in os.listdir(directory)
+        if filename.endswith(".py") and not filename.startswith("__")
+    )
+    loaded = {}
+    if "config" in names:
+        names.remove("config")
+        loaded.update(await pipeline.concurrently("config cog", {"config": bot.load_extension("cogs.config")}))
+    loaded.update(await pipeline.concurrently(
+        "cogs", {name: bot.load_extension(f"cogs.{name}") for name in names}
+    ))
+    return loaded
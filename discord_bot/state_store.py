@@ -0,0 +1,101 @@
+import os
+import logging
+
+from persistence import load_pickle
+
+logger = logging.getLogger("aarohi_bot.state_store")
+
+
+class Namespace:
+    """Schema for one namespace: how keys and values are stored in the backend"""
+
+    def __init__(self, name, encode=None, decode=None, key_type=int, legacy_file=None, legacy=None):
+        self.name = name
+        self.encode = encode or (lambda value: value)  # value -> JSON-serializable
+        self.decode = decode or (lambda value: value)  # JSON value -> value
+        self.key_type = key_type
+        self.legacy_file = legacy_file  # pickle file imported on first open
+        self.legacy = legacy or (lambda value: value)  # pickled value -> value, before encode
+
+
+class StateStore:
+    """Namespaced keyed store where every write touches a single `namespace:key` entry"""
+
+    def __init__(self, backend, namespaces):
+        self.backend = backend
+        self.namespaces = {ns.name: ns for ns in namespaces}
+        self._opened = False
+
+    async def open(self):
+        """Open the backend and import any legacy pickle files"""
+        if self._opened:
+            return
+        await self.backend.open()
+        self._opened = True
+        for ns in self.namespaces.values():
+            await self._import_legacy_pickle(ns)
+        logger.info(f"State store opened on {type(self.backend).__name__}")
+
+    async def close(self):
+        """Close the backend"""
+        if self._opened:
+            await self.backend.close()
+            self._opened = False
+
+    async def load(self, namespace):
+        """Return every key in a namespace as a dict"""
+        ns = self.namespaces[namespace]
+        prefix = f"{namespace}:"
+        data = {}
+        for key, value in (await self.backend.scan(prefix)).items():
+            key = key[len(prefix):]
+            try:
+                data[ns.key_type(key)] = ns.decode(value)
+            except Exception as e:
+                logger.error(f"Skipping unreadable {namespace} entry {key}: {e}")
+        return data
+
+    async def put(self, namespace, key, value):
+        """Insert or replace a single key"""
+        await self.put_many(namespace, {key: value})
+
+    async def put_many(self, namespace, items):
+        """Insert or replace several keys in one batch"""
+        ns = self.namespaces[namespace]
+        await self.backend.batch(puts={
+            f"{namespace}:{key}": ns.encode(value) for key, value in items.items()
+        })
+
+    async def delete(self, namespace, key):
+        """Remove a single key"""
+        await self.backend.delete(f"{namespace}:{key}")
+
+    async def batch(self, puts=None, deletes=None):
+        """Apply puts and deletes across namespaces together
+
+        puts is {namespace: {key: value}} and deletes is {namespace: [keys]};
+        on SQLite they commit in a single transaction.
+        """
+        encoded = {}
+        for namespace, items in (puts or {}).items():
+            ns = self.namespaces[namespace]
+            for key, value in items.items():
+                encoded[f"{namespace}:{key}"] = ns.encode(value)
+        removed = [f"{namespace}:{key}" for namespace, keys in (deletes or {}).items() for key in keys]
+        await self.backend.batch(puts=encoded, deletes=removed)
+
+    async def _import_legacy_pickle(self, ns):
+        if not ns.legacy_file or not os.path.exists(ns.legacy_file):
+            return
+        if await self.backend.scan(f"{ns.name}:"):
+            return
+
+        try:
+            data = {key: ns.legacy(value) for key, value in (await load_pickle(ns.legacy_file, {})).items()}
+            await self.put_many(ns.name, data)
+            # A backend that keeps nothing across restarts imports the file again next time
+            if self.backend.persistent:
+                os.replace(ns.legacy_file, ns.legacy_file + ".migrated")
+            logger.info(f"Imported {len(data)} {ns.name} entries from {ns.legacy_file}")
+        except Exception as e:
+            logger.error(f"Error importing {ns.legacy_file}: {e}")
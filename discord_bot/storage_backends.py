@@ -0,0 +1,199 @@
+import aiosqlite
+import copy
+import hashlib
+import json
+import os
+import logging
+from urllib.parse import quote, unquote
+
+from persistence import load_json, save_json, delete_file, run_io
+from sqlite_journal import enable_journal, JournalCompactor
+
+logger = logging.getLogger("discord_bot.storage")
+
+# Backend used for each store unless config.json's "storage" section says otherwise
+DEFAULT_STORAGE = {
+    "default": "sqlite",
+    "profiles": "json",
+}
+
+
+class StorageBackend:
+    """Key/value storage interface shared by every store
+
+    Keys are strings and values are anything JSON can represent.
+    """
+
+    persistent = True  # False if the data is gone once the process exits
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get(self, key, default=None):
+        raise NotImplementedError
+
+    async def put(self, key, value):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def scan(self, prefix=""):
+        """Return a dict of every key starting with prefix"""
+        raise NotImplementedError
+
+    async def batch(self, puts=None, deletes=()):
+        """Apply several puts and deletes together"""
+        for key, value in (puts or {}).items():
+            await self.put(key, value)
+        for key in deletes:
+            await self.delete(key)
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local backend for tests and benchmarks; nothing touches the disk"""
+
+    persistent = False
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key, default=None):
+        if key not in self.data:
+            return default
+        return copy.deepcopy(self.data[key])
+
+    async def put(self, key, value):
+        self.data[key] = copy.deepcopy(value)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def scan(self, prefix=""):
+        return {key: copy.deepcopy(value) for key, value in self.data.items() if key.startswith(prefix)}
+
+
+class JsonFileBackend(StorageBackend):
+    """One JSON file per key, spread over shard directories by key hash"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, key):
+        shard = hashlib.sha1(key.encode()).hexdigest()[:2]
+        return os.path.join(self.root, shard, f"{quote(key, safe='')}.json")
+
+    async def get(self, key, default=None):
+        return await load_json(self.path_for(key), default)
+
+    async def put(self, key, value):
+        await save_json(self.path_for(key), value, indent=4)
+
+    async def delete(self, key):
+        await delete_file(self.path_for(key))
+
+    def _list_keys(self, prefix):
+        keys = []
+        if not os.path.isdir(self.root):
+            return keys
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for filename in os.listdir(shard_dir):
+                if filename.endswith(".json"):
+                    key = unquote(filename[:-5])
+                    if key.startswith(prefix):
+                        keys.append(key)
+        return keys
+
+    async def scan(self, prefix=""):
+        result = {}
+        for key in await run_io(self._list_keys, prefix):
+            result[key] = await self.get(key)
+        return result
+
+
+class SqliteBackend(StorageBackend):
+    """Single-table SQLite backend with a compacted write-ahead journal"""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = None
+        self.compactor = None
+
+    async def open(self):
+        if self.db is not None:
+            return
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = await aiosqlite.connect(self.path)
+        await enable_journal(self.db)
+        await self.db.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        await self.db.commit()
+        self.compactor = JournalCompactor(self.db, self.path, name=os.path.basename(self.path))
+        self.compactor.start()
+
+    async def close(self):
+        if self.compactor is not None:
+            await self.compactor.stop()
+            self.compactor = None
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+
+    async def get(self, key, default=None):
+        async with self.db.execute("SELECT value FROM kv WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else default
+
+    async def put(self, key, value):
+        await self.batch(puts={key: value})
+
+    async def delete(self, key):
+        await self.batch(deletes=[key])
+
+    async def scan(self, prefix=""):
+        # Range scan on the primary key instead of LIKE, so the index is used
+        async with self.db.execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ?",
+            (prefix, prefix + "\U0010ffff")
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def batch(self, puts=None, deletes=()):
+        if puts:
+            await self.db.executemany(
+                "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in puts.items()]
+            )
+        if deletes:
+            await self.db.executemany("DELETE FROM kv WHERE key = ?", [(key,) for key in deletes])
+        await self.db.commit()
+
+
+def backend_kind(storage_config, name):
+    """Return which backend a named store should use"""
+    storage = {**DEFAULT_STORAGE, **(storage_config or {})}
+    return storage.get(name, storage["default"])
+
+
+def create_backend(storage_config, name, path):
+    """Build the backend configured for a store
+
+    `path` has no extension: SQLite uses `<path>.db`, JSON files live under `<path>/`.
+    """
+    kind = backend_kind(storage_config, name)
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "json":
+        return JsonFileBackend(path)
+    if kind == "sqlite":
+        return SqliteBackend(f"{path}.db")
+    raise ValueError(f"Unknown storage backend '{kind}' for {name}")
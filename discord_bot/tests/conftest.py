@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The bot's modules are imported as top-level modules, as when it runs from discord_bot/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
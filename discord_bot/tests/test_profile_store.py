@@ -0,0 +1,117 @@
+import asyncio
+
+from profile_store import ProfileStore
+from storage_backends import MemoryBackend
+
+
+class SlowBackend(MemoryBackend):
+    """Memory backend whose batch writes take a while, so tests can act mid-write"""
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.batches = 0
+
+    async def batch(self, puts=None, deletes=()):
+        self.batches += 1
+        await asyncio.sleep(self.delay)
+        await super().batch(puts=puts, deletes=deletes)
+
+
+def make_store(backend=None, **kwargs):
+    return ProfileStore(backend=backend or MemoryBackend(), legacy_path=None, **kwargs)
+
+
+def test_get_creates_and_caches():
+    async def run():
+        store = make_store()
+        profile = await store.get(1)
+        assert profile == {}
+        assert await store.get("1") is profile
+    asyncio.run(run())
+
+
+def test_flush_writes_dirty_profiles():
+    async def run():
+        store = make_store()
+        profile = await store.get(1)
+        profile["name"] = "Asha"
+        await store.writer.flush()
+        assert store.backend.data == {}  # never marked dirty
+
+        store.mark_dirty(1)
+        await store.writer.flush()
+        assert store.backend.data == {"1": {"name": "Asha"}}
+        assert not store.writer.dirty
+    asyncio.run(run())
+
+
+def test_close_writes_pending_profiles():
+    async def run():
+        store = make_store()
+        await store.open()
+        (await store.get(1))["mood"] = "calm"
+        store.mark_dirty(1)
+        await store.close()
+        assert store.backend.data == {"1": {"mood": "calm"}}
+    asyncio.run(run())
+
+
+def test_eviction_writes_before_dropping():
+    async def run():
+        store = make_store(capacity=2)
+        for user_id in (1, 2):
+            (await store.get(user_id))["n"] = user_id
+            store.mark_dirty(user_id)
+        await store.get(3)
+        # The least recently used profile was written, then dropped
+        assert list(store.cache) == ["2", "3"]
+        assert store.backend.data == {"1": {"n": 1}}
+        assert "1" not in store.writer.dirty
+
+        assert await store.get(1) == {"n": 1}
+        assert list(store.cache) == ["3", "1"]
+    asyncio.run(run())
+
+
+def test_failed_write_keeps_profile_cached_and_dirty():
+    class FailingBackend(MemoryBackend):
+        async def batch(self, puts=None, deletes=()):
+            raise OSError("disk full")
+
+    async def run():
+        store = make_store(backend=FailingBackend(), capacity=1)
+        (await store.get(1))["n"] = 1
+        store.mark_dirty(1)
+        await store.get(2)
+        assert "1" in store.cache
+        assert "1" in store.writer.dirty
+    asyncio.run(run())
+
+
+def test_evict_idle():
+    async def run():
+        store = make_store(idle_seconds=0)
+        (await store.get(1))["n"] = 1
+        store.mark_dirty(1)
+        await store.evict_idle()
+        assert not store.cache
+        assert store.backend.data == {"1": {"n": 1}}
+    asyncio.run(run())
+
+
+def test_profile_evicted_during_its_flush_is_not_reloaded_stale():
+    async def run():
+        store = make_store(backend=SlowBackend(), capacity=1)
+        (await store.get(1))["n"] = 1
+        store.mark_dirty(1)
+        flush = asyncio.create_task(store.writer.flush())
+        await asyncio.sleep(0.01)
+        # Clean by now, so getting another profile evicts it while its write is in flight
+        await store.get(2)
+        assert "1" not in store.cache
+        assert await store.get(1) == {"n": 1}
+        await flush
+        assert not store.writing
+        assert store.backend.data["1"] == {"n": 1}
+    asyncio.run(run())
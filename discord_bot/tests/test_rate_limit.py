@@ -0,0 +1,55 @@
+from rate_limit import RateLimiter, TokenBuckets
+
+
+def make_limiter():
+    limiter = RateLimiter(max_entries=100, sweep_interval=60)
+    limiter.configure("user", rate=1, burst=3)
+    limiter.configure("channel", rate=2, burst=5)
+    return limiter
+
+
+def test_burst_then_refill():
+    limiter = make_limiter()
+    for _ in range(3):
+        assert limiter.check(now=0, user=1) is None
+    assert limiter.check(now=0, user=1) == "user"
+    assert limiter.check(now=0.5, user=1) == "user"
+    assert limiter.check(now=1.0, user=1) is None
+    # Another user has their own bucket
+    assert limiter.check(now=1.0, user=2) is None
+    assert limiter.stats()["limited"] == {"user": 2}
+
+
+def test_refused_message_spends_nothing():
+    limiter = make_limiter()
+    for user in range(5):
+        assert limiter.check(now=0, user=user, channel="c") is None
+    assert limiter.check(now=0, user=9, channel="c") == "channel"
+    # The channel refused it, so user 9 still has a full burst elsewhere
+    for _ in range(3):
+        assert limiter.check(now=0, user=9, channel="other") is None
+
+
+def test_unconfigured_scopes_and_none_keys_are_not_limited():
+    limiter = make_limiter()
+    for _ in range(10):
+        assert limiter.check(now=0, guild="g", user=None) is None
+    limiter.configure("user", rate=0, burst=3)
+    assert "user" not in limiter.scopes
+
+
+def test_sweep_drops_full_buckets():
+    limiter = make_limiter()
+    limiter.check(now=0, user=1, channel="c")
+    limiter.check(now=2.5, user=2)
+    # user 1 is full again after 3s and channel c after 2.5s; user 2 is not
+    assert limiter.sweep(now=3.0) == 2
+    assert limiter.stats()["buckets"] == {"user": 1, "channel": 0}
+
+
+def test_buckets_are_capped():
+    buckets = TokenBuckets(rate=1, burst=2, max_entries=3)
+    for key in range(5):
+        buckets.spend(key, buckets.tokens(key, 0), 0)
+    assert list(buckets.buckets) == [2, 3, 4]
+    assert buckets.tokens(0, 0) == 2
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from recurrence import describe, first_occurrence, next_occurrence, parse_recurrence
+
+
+@pytest.mark.parametrize("text, rule, rest", [
+    ("every day Drink water", {"kind": "daily"}, "Drink water"),
+    ("every weekday Stand up", {"kind": "weekdays"}, "Stand up"),
+    ("repeat weekdays Stand up", {"kind": "weekdays"}, "Stand up"),
+    ("every 4h Stretch", {"kind": "hours", "every": 4}, "Stretch"),
+    ("every 2 hours Stretch", {"kind": "hours", "every": 2}, "Stretch"),
+    ("repeat every hour Water", {"kind": "hours", "every": 1}, "Water"),
+    ("every mon,wed,fri Gym", {"kind": "days", "days": [0, 2, 4]}, "Gym"),
+    ("every Sunday Call mom", {"kind": "days", "days": [6]}, "Call mom"),
+])
+def test_parses_rules_after_keyword(text, rule, rest):
+    assert parse_recurrence(text) == (rule, rest)
+
+
+@pytest.mark.parametrize("text", [
+    "Monday meeting at 10",
+    "daily standup",
+    "4h of study",
+    "every",
+    "every so often",
+    "every 0h nope",
+    "every 200h too long",
+])
+def test_leaves_other_messages_alone(text):
+    assert parse_recurrence(text) == (None, text)
+
+
+def test_describe():
+    assert describe(None) == "once"
+    assert describe({"kind": "hours", "every": 1}) == "every hour"
+    assert describe({"kind": "hours", "every": 6}) == "every 6 hours"
+    assert describe({"kind": "days", "days": [0, 4]}) == "Mon, Fri"
+
+
+def test_next_occurrence_skips_to_allowed_days():
+    tz = pytz.timezone("Asia/Kolkata")
+    friday = tz.localize(datetime(2024, 1, 5, 7, 0))
+    monday = next_occurrence({"kind": "weekdays"}, friday, tz)
+    assert monday == tz.localize(datetime(2024, 1, 8, 7, 0))
+    saturday = tz.localize(datetime(2024, 1, 6, 7, 0))
+    assert first_occurrence({"kind": "weekdays"}, saturday, tz) == monday
+
+
+def test_next_occurrence_keeps_wall_clock_across_dst():
+    tz = pytz.timezone("America/New_York")
+    before = tz.localize(datetime(2024, 3, 9, 7, 0))
+    after = next_occurrence({"kind": "daily"}, before, tz)
+    assert after.astimezone(tz).replace(tzinfo=None) == datetime(2024, 3, 10, 7, 0)
+
+
+def test_hourly_rule_skips_missed_periods():
+    start = pytz.UTC.localize(datetime(2024, 1, 1, 0, 0))
+    late = pytz.UTC.localize(datetime(2024, 1, 1, 9, 30))
+    assert next_occurrence({"kind": "hours", "every": 4}, start, after=late) == pytz.UTC.localize(datetime(2024, 1, 1, 12, 0))
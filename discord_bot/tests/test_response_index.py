@@ -0,0 +1,87 @@
+import math
+import random
+
+import pytest
+
+from response_index import ResponseIndex, normalize_input, text_features
+
+WORDS = "hi hello hey thanks thank you good morning night how are doing what up bye see later cool nice great food music study".split()
+
+
+def brute_force_scores(inputs, text):
+    """Cosine similarity of text against every input, using TF-IDF over all inputs"""
+    vectors = [{feature: 1 + math.log(count) for feature, count in text_features(input_text).items()}
+               for input_text in inputs]
+    frequency = {}
+    for vector in vectors:
+        for feature in vector:
+            frequency[feature] = frequency.get(feature, 0) + 1
+    total = len(inputs)
+
+    def idf(feature):
+        return math.log((1 + total) / (1 + frequency.get(feature, 0))) + 1
+
+    query = {feature: (1 + math.log(count)) * idf(feature) for feature, count in text_features(text).items()}
+    query_length = math.sqrt(sum(weight * weight for weight in query.values()))
+    scores = {}
+    for row, vector in enumerate(vectors):
+        weighted = {feature: weight * idf(feature) for feature, weight in vector.items()}
+        length = math.sqrt(sum(weight * weight for weight in weighted.values()))
+        dot = sum(query[feature] * weight for feature, weight in weighted.items() if feature in query)
+        if dot > 0:
+            scores[row] = min(1.0, dot / (query_length * length))
+    return scores
+
+
+def random_text(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+
+
+def test_normalize_input():
+    assert normalize_input("  Hello, THERE!! ") == "hello there"
+    assert normalize_input("don’t") == "don't"
+    assert normalize_input("?!") == ""
+
+
+def test_add_find_and_replace():
+    index = ResponseIndex()
+    assert index.add("Good morning!", "Morning!")
+    assert not index.add("!!!", "nothing to index")
+    assert index.find_response("good morning") == ("Morning!", pytest.approx(1.0))
+    index.add("good MORNING", "Rise and shine")
+    assert len(index) == 1
+    assert index.find_response("good morning")[0] == "Rise and shine"
+    assert index.find_response("zzz") == (None, 0.0)
+
+
+def test_matches_brute_force_after_merge():
+    rng = random.Random(3)
+    index = ResponseIndex(merge_threshold=16)
+    # Some pairs in bulk, then enough single adds to trigger background merges
+    bulk = [(random_text(rng), f"bulk {i}") for i in range(100)]
+    index.add_many(bulk)
+    for i in range(60):
+        index.add(random_text(rng), f"single {i}")
+    index.merge()
+    assert index.merges >= 2
+    assert index.stats()["delta_pairs"] == 0
+
+    inputs = index.inputs
+    for _ in range(25):
+        query = random_text(rng)
+        expected = brute_force_scores(inputs, query)
+        results = index.search(query, k=len(inputs))
+        assert {row for _, row in results} == set(expected)
+        for score, row in results:
+            assert score == pytest.approx(expected[row], rel=1e-4)
+        # Best first
+        assert [score for score, _ in results] == sorted((score for score, _ in results), reverse=True)
+
+
+def test_unmerged_pairs_are_searchable():
+    index = ResponseIndex(merge_threshold=1000)
+    index.add_many([("see you later", "bye!")])
+    index.add("what are you listening to", "lofi beats")
+    assert index.stats()["delta_pairs"] == 1
+    assert index.find_response("what are you listening to")[0] == "lofi beats"
+    assert index.find_response("see you later")[0] == "bye!"
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from storage_backends import JsonFileBackend, MemoryBackend, SqliteBackend, create_backend
+
+
+def make_backend(kind, tmp_path):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "json":
+        return JsonFileBackend(str(tmp_path / "store"))
+    return SqliteBackend(str(tmp_path / "store.db"))
+
+
+@pytest.fixture(params=["memory", "json", "sqlite"])
+def kind(request):
+    return request.param
+
+
+def test_put_get_delete(kind, tmp_path):
+    async def run():
+        backend = make_backend(kind, tmp_path)
+        await backend.open()
+        try:
+            assert await backend.get("missing") is None
+            assert await backend.get("missing", {}) == {}
+            await backend.put("user:1", {"points": 3, "tags": ["a"]})
+            assert await backend.get("user:1") == {"points": 3, "tags": ["a"]}
+            await backend.put("user:1", {"points": 4})
+            assert await backend.get("user:1") == {"points": 4}
+            await backend.delete("user:1")
+            assert await backend.get("user:1") is None
+            # Deleting a key that is not there is not an error
+            await backend.delete("user:1")
+        finally:
+            await backend.close()
+    asyncio.run(run())
+
+
+def test_scan_and_batch(kind, tmp_path):
+    async def run():
+        backend = make_backend(kind, tmp_path)
+        await backend.open()
+        try:
+            await backend.batch(puts={"focus:1": 1, "focus:2": 2, "pomodoro:1": 3, "key/with spaces": 4})
+            assert await backend.scan("focus:") == {"focus:1": 1, "focus:2": 2}
+            assert await backend.get("key/with spaces") == 4
+            await backend.batch(puts={"focus:3": 5}, deletes=["focus:1"])
+            assert await backend.scan("focus:") == {"focus:2": 2, "focus:3": 5}
+            assert len(await backend.scan()) == 4
+        finally:
+            await backend.close()
+    asyncio.run(run())
+
+
+def test_values_are_copies(kind, tmp_path):
+    async def run():
+        backend = make_backend(kind, tmp_path)
+        await backend.open()
+        try:
+            value = {"items": [1]}
+            await backend.put("k", value)
+            value["items"].append(2)
+            loaded = await backend.get("k")
+            loaded["items"].append(3)
+            assert await backend.get("k") == {"items": [1]}
+        finally:
+            await backend.close()
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_persistent_backends_survive_reopen(kind, tmp_path):
+    async def run():
+        backend = make_backend(kind, tmp_path)
+        await backend.open()
+        await backend.put("k", [1, 2])
+        await backend.close()
+
+        backend = make_backend(kind, tmp_path)
+        await backend.open()
+        try:
+            assert backend.persistent
+            assert await backend.get("k") == [1, 2]
+        finally:
+            await backend.close()
+    asyncio.run(run())
+
+
+def test_create_backend_follows_config(tmp_path):
+    path = str(tmp_path / "store")
+    assert isinstance(create_backend(None, "state", path), SqliteBackend)
+    assert isinstance(create_backend(None, "profiles", path), JsonFileBackend)
+    assert isinstance(create_backend({"default": "memory"}, "sessions", path), MemoryBackend)
+    assert not create_backend({"responses": "memory"}, "responses", path).persistent
+    assert create_backend(None, "state", path).path == path + ".db"
+    with pytest.raises(ValueError):
+        create_backend({"default": "redis"}, "state", path)
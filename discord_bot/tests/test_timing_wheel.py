@@ -0,0 +1,90 @@
+import asyncio
+import math
+import random
+import time
+
+from timing_wheel import TimingWheel
+
+
+async def _noop():
+    pass
+
+
+def make_wheel(now):
+    wheel = TimingWheel("test")
+    wheel.current = int(now)
+    return wheel
+
+
+def test_fires_on_time_not_early():
+    now = time.time()
+    wheel = make_wheel(now)
+    wheel.schedule("a", now + 5.5, _noop)
+    assert wheel.advance(now + 5) == []
+    assert [timer.key for timer in wheel.advance(now + 7)] == ["a"]
+    assert len(wheel) == 0
+
+
+def test_cancel_and_replace():
+    now = time.time()
+    wheel = make_wheel(now)
+    wheel.schedule("a", now + 10, _noop)
+    wheel.schedule("b", now + 10, _noop)
+    assert wheel.cancel("a")
+    assert not wheel.cancel("a")
+    wheel.schedule("b", now + 3600, _noop)  # replaces the earlier "b"
+    assert wheel.advance(now + 100) == []
+    assert "b" in wheel
+    assert [timer.key for timer in wheel.advance(now + 3602)] == ["b"]
+
+
+def test_next_tick_finds_the_next_occupied_slot():
+    now = time.time()
+    wheel = make_wheel(now)
+    assert wheel.next_tick() is None
+    wheel.schedule("soon", now + 30, _noop)
+    assert wheel.next_tick() == math.ceil(now + 30)
+    wheel.cancel("soon")
+    wheel.schedule("later", now + 7200, _noop)
+    # A far timer only needs a wakeup when its coarse slot cascades, never every second
+    assert wheel.current < wheel.next_tick() <= math.ceil(now + 7200)
+
+
+def test_matches_sorted_deadlines():
+    random.seed(7)
+    now = time.time()
+    for _ in range(50):
+        wheel = make_wheel(now)
+        ticks = {}
+        for key in range(30):
+            when = now + random.choice([random.uniform(0, 90), random.uniform(0, 8000), random.uniform(0, 90 * 86400)])
+            wheel.schedule(key, when, _noop)
+            ticks[key] = max(math.ceil(when), int(now) + 1)
+        clock = now
+        while ticks:
+            clock += random.choice([1, 59, 3600, 86400, random.uniform(0, 200000)])
+            due = {timer.key for timer in wheel.advance(clock)}
+            expected = {key for key, tick in ticks.items() if tick <= int(clock)}
+            assert due == expected
+            for key in expected:
+                del ticks[key]
+
+
+def test_run_loop_fires_callbacks():
+    async def run():
+        wheel = TimingWheel("test")
+        fired = []
+
+        async def callback(name):
+            fired.append(name)
+
+        wheel.start()
+        try:
+            wheel.schedule("late", time.time() + 30, callback, "late")
+            wheel.schedule("early", time.time() + 0.5, callback, "early")
+            await asyncio.sleep(2.2)
+        finally:
+            await wheel.stop()
+        assert fired == ["early"]
+        assert "late" in wheel
+    asyncio.run(run())
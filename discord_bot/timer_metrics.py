@@ -0,0 +1,126 @@
+import math
+import time
+
+# Buckets grow by 10% from 1 ms to a little over an hour, so any percentile is
+# reported to within 10% while each histogram stays a fixed ~160 counters
+BUCKET_GROWTH = 1.1
+MIN_LATENCY = 0.001
+BUCKET_COUNT = 160
+
+# Stages recorded for each fired timer
+STAGES = {
+    "fire": "scheduled time to callback start",
+    "send": "duration of the Discord send call",
+    "delivery": "scheduled time to message sent",
+}
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with constant memory"""
+
+    def __init__(self):
+        self.counts = [0] * (BUCKET_COUNT + 1)  # last bucket collects anything larger
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        seconds = max(0.0, seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if seconds <= MIN_LATENCY:
+            index = 0
+        else:
+            index = min(BUCKET_COUNT, math.ceil(math.log(seconds / MIN_LATENCY, BUCKET_GROWTH)))
+        self.counts[index] += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= rank:
+                return min(self.max, MIN_LATENCY * BUCKET_GROWTH ** index)
+        return self.max
+
+    def fraction_within(self, seconds):
+        """Share of samples at or under seconds (bucket resolution)"""
+        if not self.count:
+            return 1.0
+        limit = 0 if seconds <= MIN_LATENCY else math.floor(math.log(seconds / MIN_LATENCY, BUCKET_GROWTH))
+        return sum(self.counts[:min(limit, BUCKET_COUNT) + 1]) / self.count
+
+    def snapshot(self):
+        """Return the summary as a dict (latencies in milliseconds)"""
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class TimerMetrics:
+    """Fire lag, send latency and end-to-end delivery lag per timer kind"""
+
+    def __init__(self):
+        self.histograms = {}  # (kind, stage) -> LatencyHistogram
+        self.started = time.time()
+
+    def record(self, kind, stage, seconds):
+        histogram = self.histograms.get((kind, stage))
+        if histogram is None:
+            histogram = self.histograms[(kind, stage)] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def histogram(self, kind, stage):
+        return self.histograms.get((kind, stage))
+
+    def snapshot(self):
+        """Return {kind: {stage: summary}} for everything recorded since startup"""
+        result = {}
+        for (kind, stage), histogram in sorted(self.histograms.items()):
+            result.setdefault(kind, {})[stage] = histogram.snapshot()
+        return result
+
+    def export(self, slo_seconds=None):
+        """JSON-safe export for dashboards, with the share of deliveries inside the SLO"""
+        exported = {
+            "generated_at": time.time(),
+            "uptime_seconds": round(time.time() - self.started),
+            "timers": self.snapshot(),
+        }
+        if slo_seconds is not None:
+            exported["slo_seconds"] = slo_seconds
+            exported["within_slo"] = {
+                kind: round(histogram.fraction_within(slo_seconds), 4)
+                for (kind, stage), histogram in self.histograms.items()
+                if stage == "delivery"
+            }
+        return exported
+
+
+metrics = TimerMetrics()
+
+
+def timer_kind(key, default):
+    """Timer keys are (kind, id) tuples; anything else is reported under default"""
+    if isinstance(key, tuple) and key and isinstance(key[0], str):
+        return key[0]
+    return default
+
+
+def record(kind, stage, seconds):
+    """Record one latency sample in seconds"""
+    metrics.record(kind, stage, seconds)
+
+
+def get_metrics():
+    """Return a snapshot of the timer metrics"""
+    return metrics.snapshot()
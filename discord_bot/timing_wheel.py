@@ -0,0 +1,182 @@
+import asyncio
+import math
+import time
+import logging
+
+import timer_metrics
+
+logger = logging.getLogger("discord_bot.timing_wheel")
+
+# (slot count, seconds per slot) of each level, finest first
+LEVELS = (
+    (60, 1),  # seconds
+    (60, 60),  # minutes
+    (24, 3600),  # hours
+    (64, 86400),  # days
+)
+
+
+class _Timer:
+    __slots__ = ("when", "tick", "key", "callback", "args", "bucket")
+
+    def __init__(self, when, tick, key, callback, args):
+        self.when = when  # requested time; lag is measured against this, not the rounded tick
+        self.tick = tick
+        self.key = key
+        self.callback = callback
+        self.args = args
+        self.bucket = None
+
+
+class TimingWheel:
+    """Hierarchical timing wheel with one-second resolution
+
+    Same interface as DeadlineScheduler. A timer lives in the coarsest level
+    whose span covers its distance from now, in a dict bucket keyed by the
+    timer key, so insert and cancel are O(1). When a coarser slot comes due
+    its timers cascade down a level; timers past the day wheel wait in an
+    overflow bucket that is re-checked once a day. Ticks with no occupied
+    slot are skipped, and the wheel sleeps until the next one that has work.
+    """
+
+    def __init__(self, name="timing_wheel"):
+        self.name = name
+        self.wheels = [[{} for _ in range(slots)] for slots, _ in LEVELS]
+        self.overflow = {}
+        self.timers = {}  # key -> _Timer
+        self.current = None  # last tick processed, in epoch seconds
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._firing = set()  # running callbacks, referenced until they finish
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def schedule(self, key, when, callback, *args):
+        """Run `await callback(*args)` at epoch time `when`, replacing any timer under key"""
+        self.cancel(key)
+        if self.current is None or not self.timers:
+            # Nothing is pending, so the wheel can jump to now instead of walking idle ticks
+            self.current = int(time.time())
+        # Rounded up so a timer never fires early
+        timer = _Timer(when, max(math.ceil(when), self.current + 1), key, callback, args)
+        self.timers[key] = timer
+        self._place(timer)
+        self._wakeup.set()
+
+    def cancel(self, key):
+        """Drop the timer under key; returns False if there was none"""
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return False
+        del timer.bucket[key]
+        return True
+
+    def _place(self, timer):
+        delta = timer.tick - self.current
+        for level, (slots, width) in enumerate(LEVELS):
+            if delta < slots * width:
+                bucket = self.wheels[level][(timer.tick // width) % slots]
+                break
+        else:
+            bucket = self.overflow
+        timer.bucket = bucket
+        bucket[timer.key] = timer
+
+    def _cascade(self, level):
+        slots, width = LEVELS[level]
+        bucket = self.wheels[level][(self.current // width) % slots]
+        if bucket:
+            moved = list(bucket.values())
+            bucket.clear()
+            for timer in moved:
+                self._place(timer)
+
+    def next_tick(self):
+        """Earliest tick after the current one at which an occupied slot is processed, or None"""
+        if self.current is None or not self.timers:
+            return None
+        if self.wheels[0][(self.current + 1) % LEVELS[0][0]]:
+            return self.current + 1  # busy wheel: skip the full scan
+        ticks = []
+        for level, (slots, width) in enumerate(LEVELS):
+            first = self.current // width + 1
+            for index, bucket in enumerate(self.wheels[level]):
+                if bucket:
+                    # The slot's next turn is the first multiple of width past now that maps to it
+                    ticks.append((first + (index - first) % slots) * width)
+        if self.overflow:
+            day = LEVELS[3][1]
+            ticks.append((self.current // day + 1) * day)
+        return min(ticks)
+
+    def advance(self, now):
+        """Process every tick up to `now` and return the timers that came due"""
+        due = []
+        target = int(now)
+        while self.current is not None and self.current < target and self.timers:
+            # Jump straight to the next tick with work; the ones in between are empty
+            nearest = self.next_tick()
+            if nearest > target:
+                self.current = target
+                break
+            self.current = nearest
+            # Coarser levels cascade first so their timers land in the slots checked below
+            if self.current % LEVELS[3][1] == 0 and self.overflow:
+                pending = list(self.overflow.values())
+                self.overflow.clear()
+                for timer in pending:
+                    self._place(timer)
+            for level in range(len(LEVELS) - 1, 0, -1):
+                if self.current % LEVELS[level][1] == 0:
+                    self._cascade(level)
+
+            bucket = self.wheels[0][self.current % LEVELS[0][0]]
+            if bucket:
+                for timer in list(bucket.values()):
+                    if timer.tick <= self.current:
+                        del bucket[timer.key]
+                        del self.timers[timer.key]
+                        due.append(timer)
+        return due
+
+    async def _fire(self, timer):
+        timer_metrics.record(timer_metrics.timer_kind(timer.key, self.name), "fire", time.time() - timer.when)
+        try:
+            await timer.callback(*timer.args)
+        except Exception as e:
+            logger.error(f"Error firing {self.name} timer {timer.key}: {e}")
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            for timer in self.advance(time.time()):
+                # Each callback runs on its own so a slow one never delays the next tick
+                task = asyncio.create_task(self._fire(timer))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+
+            if not self.timers:
+                await self._wakeup.wait()
+                continue
+            # Sleep until the next occupied slot; scheduling an earlier timer wakes us sooner
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0, self.next_tick() - time.time()))
+            except asyncio.TimeoutError:
+                pass
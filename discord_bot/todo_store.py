@@ -0,0 +1,171 @@
+import aiosqlite
+import os
+import logging
+from datetime import datetime
+
+from persistence import load_json
+from sqlite_journal import enable_journal, JournalCompactor
+
+logger = logging.getLogger("discord_bot.todo_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todo_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    completed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_todo_items_user ON todo_items (user_id, id);
+"""
+
+
+class TodoStore:
+    """SQLite-backed to-do storage with one row per task"""
+
+    def __init__(self, path="data/todo.db", legacy_path="data/todo_lists.json"):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.db = None
+        self.compactor = None
+
+    async def open(self):
+        """Open the database, create the schema and import the legacy JSON file"""
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = await aiosqlite.connect(self.path)
+        self.db.row_factory = aiosqlite.Row
+        await enable_journal(self.db)
+        await self.db.executescript(SCHEMA)
+        await self.db.commit()
+        await self.import_legacy_json()
+        self.compactor = JournalCompactor(self.db, self.path, name="todo_store")
+        self.compactor.start()
+        logger.info(f"Todo store opened at {self.path}")
+
+    async def close(self):
+        """Compact the journal and close the database connection"""
+        if self.compactor is not None:
+            await self.compactor.stop()
+            self.compactor = None
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+            logger.info("Todo store closed")
+
+    async def import_legacy_json(self):
+        """Move items from the old todo_lists.json file into the database once"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+
+        try:
+            todo_lists = await load_json(self.legacy_path, {})
+        except Exception as e:
+            logger.error(f"Error reading legacy todo lists: {e}")
+            return
+
+        rows = []
+        for user_id, tasks in todo_lists.items():
+            for task in tasks:
+                rows.append((
+                    str(user_id),
+                    task["task"],
+                    int(bool(task.get("completed"))),
+                    task.get("created_at") or datetime.now().isoformat(),
+                    task.get("completed_at")
+                ))
+
+        await self.db.executemany(
+            "INSERT INTO todo_items (user_id, task, completed, created_at, completed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        await self.db.commit()
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        logger.info(f"Imported {len(rows)} todo items from {self.legacy_path}")
+
+    async def get_items(self, user_id):
+        """Return a user's tasks in the order they were added"""
+        async with self.db.execute(
+            "SELECT id, task, completed, created_at, completed_at FROM todo_items "
+            "WHERE user_id = ? ORDER BY id",
+            (str(user_id),)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return [self._row_to_item(row) for row in rows]
+
+    async def get_item(self, user_id, position):
+        """Return the task at a 1-based position in a user's list, or None"""
+        if position < 1:
+            return None
+        async with self.db.execute(
+            "SELECT id, task, completed, created_at, completed_at FROM todo_items "
+            "WHERE user_id = ? ORDER BY id LIMIT 1 OFFSET ?",
+            (str(user_id), position - 1)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return self._row_to_item(row) if row else None
+
+    async def count_items(self, user_id):
+        """Return how many tasks a user has"""
+        async with self.db.execute(
+            "SELECT COUNT(*) FROM todo_items WHERE user_id = ?",
+            (str(user_id),)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def add_item(self, user_id, task):
+        """Insert a single task for a user"""
+        created_at = datetime.now().isoformat()
+        cursor = await self.db.execute(
+            "INSERT INTO todo_items (user_id, task, completed, created_at) VALUES (?, ?, 0, ?)",
+            (str(user_id), task, created_at)
+        )
+        await self.db.commit()
+        return {
+            "id": cursor.lastrowid,
+            "task": task,
+            "completed": False,
+            "created_at": created_at,
+            "completed_at": None
+        }
+
+    async def mark_completed(self, item_id):
+        """Mark a single task as completed"""
+        await self.db.execute(
+            "UPDATE todo_items SET completed = 1, completed_at = ? WHERE id = ?",
+            (datetime.now().isoformat(), item_id)
+        )
+        await self.db.commit()
+
+    async def delete_item(self, item_id):
+        """Delete a single task"""
+        await self.db.execute("DELETE FROM todo_items WHERE id = ?", (item_id,))
+        await self.db.commit()
+
+    async def clear(self, user_id, completed_only=False):
+        """Delete all of a user's tasks, or only the completed ones, and return the count"""
+        if completed_only:
+            cursor = await self.db.execute(
+                "DELETE FROM todo_items WHERE user_id = ? AND completed = 1",
+                (str(user_id),)
+            )
+        else:
+            cursor = await self.db.execute(
+                "DELETE FROM todo_items WHERE user_id = ?",
+                (str(user_id),)
+            )
+        await self.db.commit()
+        return cursor.rowcount
+
+    @staticmethod
+    def _row_to_item(row):
+        return {
+            "id": row["id"],
+            "task": row["task"],
+            "completed": bool(row["completed"]),
+            "created_at": row["created_at"],
+            "completed_at": row["completed_at"]
+        }
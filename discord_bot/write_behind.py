@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+logger = logging.getLogger("discord_bot.write_behind")
+
+
+class WriteBehindBuffer:
+    """Collects dirty keys and hands them to a flush callback in batches
+
+    A flush happens every `interval` seconds, as soon as `max_dirty` keys are
+    pending, or when `flush()`/`stop()` is awaited explicitly.
+    """
+
+    def __init__(self, flush_callback, interval=30, max_dirty=50, name="write-behind"):
+        self.flush_callback = flush_callback  # async callable taking a set of keys
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.name = name
+        self.dirty = set()
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        """Start the background flush loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and flush anything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def mark_dirty(self, key):
+        """Record that a key changed and needs to be written"""
+        self.dirty.add(key)
+        if len(self.dirty) >= self.max_dirty:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Write all pending keys now"""
+        async with self._lock:
+            if not self.dirty:
+                return
+            keys, self.dirty = self.dirty, set()
+            try:
+                await self.flush_callback(keys)
+                logger.debug(f"{self.name}: flushed {len(keys)} keys")
+            except Exception as e:
+                # Keep the keys so the next flush retries them
+                self.dirty |= keys
+                logger.error(f"{self.name}: error flushing {len(keys)} keys: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()